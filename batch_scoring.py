@@ -0,0 +1,122 @@
+"""
+Пакетный пересчёт результатов диагностики на NumPy
+
+Нужен для аналитики: при подборе TWIST_THRESHOLD, ZONE_MAX или ZONE_PRIORITY
+пересчитываются сотни тысяч прошлых прохождений. Результаты совпадают
+с scoring.compute_result, включая тай-брейк по ZONE_PRIORITY.
+
+Требует numpy (requirements-analytics.txt), боту не нужен.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+import config
+from config import Zone
+from scoring import AnswersState, pick_perceived_fallback
+
+# Порядок столбцов матрицы баллов
+ZONES: Tuple[Zone, ...] = tuple(config.ZONE_MAX)
+
+# Индекс зоны в ZONES; -1 — perceived не определён
+ZONE_INDEX: Dict[Zone, int] = {zone: index for index, zone in enumerate(ZONES)}
+NO_ZONE = -1
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """Результаты N прохождений; зоны — индексы в ZONES"""
+    bottleneck: np.ndarray   # (N,) int — главный похититель
+    perceived: np.ndarray    # (N,) int — что человек думает, NO_ZONE если неизвестно
+    twist: np.ndarray        # (N,) bool — показывать ли твист
+    norm_scores: np.ndarray  # (N, 5) float — нормализованные баллы
+
+    def bottleneck_zones(self) -> np.ndarray:
+        """Главный похититель названиями зон"""
+        return np.array(ZONES, dtype=object)[self.bottleneck]
+
+
+def encode_perceived(zones: Iterable[Optional[Zone]]) -> np.ndarray:
+    """Зоны perceived (или None) -> индексы в ZONES"""
+    return np.fromiter(
+        (NO_ZONE if zone is None else ZONE_INDEX[zone] for zone in zones),
+        dtype=np.int64,
+    )
+
+
+def states_to_arrays(states: Iterable[AnswersState]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    AnswersState -> (матрица баллов N×5, perceived)
+
+    perceived уже с fallback по complaint_best, как в compute_result.
+    """
+    scores = []
+    perceived = []
+    for state in states:
+        scores.append([state.scores[zone] for zone in ZONES])
+        perceived.append(state.perceived_zone or pick_perceived_fallback(state))
+
+    return np.array(scores, dtype=np.int64).reshape(-1, len(ZONES)), encode_perceived(perceived)
+
+
+def score_batch(
+    scores: np.ndarray,
+    perceived: Optional[np.ndarray] = None,
+    *,
+    zone_max: Optional[Dict[Zone, int]] = None,
+    zone_priority: Optional[Sequence[Zone]] = None,
+    twist_threshold: Optional[float] = None,
+) -> BatchResult:
+    """
+    Вычислить результаты для матрицы баллов
+
+    Args:
+        scores: сырые баллы N×5, столбцы в порядке ZONES
+        perceived: индексы perceived зон (encode_perceived), по умолчанию нет ни у кого
+        zone_max, zone_priority, twist_threshold: замена значений из config
+            для подбора параметров
+
+    Returns:
+        BatchResult
+    """
+    # Из config на момент вызова — как compute_result, если настройки подменили
+    zone_max = zone_max or config.ZONE_MAX
+    zone_priority = zone_priority or config.ZONE_PRIORITY
+    twist_threshold = config.TWIST_THRESHOLD if twist_threshold is None else twist_threshold
+
+    scores = np.asarray(scores)
+    if scores.ndim != 2 or scores.shape[1] != len(ZONES):
+        raise ValueError(f"Ожидается матрица N×{len(ZONES)}, получено {scores.shape}")
+
+    count = scores.shape[0]
+    if perceived is None:
+        perceived = np.full(count, NO_ZONE, dtype=np.int64)
+    else:
+        perceived = np.asarray(perceived, dtype=np.int64)
+        if perceived.shape != (count,):
+            raise ValueError(f"perceived: ожидается {count} значений, получено {perceived.shape}")
+
+    # 1. Нормализуем: то же деление в float64, что и в normalize_scores
+    maxes = np.array([zone_max[zone] for zone in ZONES], dtype=np.float64)
+    norm_scores = scores.astype(np.float64) / maxes
+
+    # 2. Bottleneck: argmax по столбцам в порядке приоритета отдаёт
+    # первый из равных, то есть тай-брейк pick_max_zone
+    order = np.array([ZONE_INDEX[zone] for zone in zone_priority], dtype=np.int64)
+    bottleneck = order[np.argmax(norm_scores[:, order], axis=1)]
+
+    # 3. Твист: perceived есть, не совпадает и отстаёт не меньше порога
+    rows = np.arange(count)
+    has_perceived = perceived != NO_ZONE
+    perceived_score = norm_scores[rows, np.where(has_perceived, perceived, 0)]
+    diff = norm_scores[rows, bottleneck] - perceived_score
+    twist = has_perceived & (perceived != bottleneck) & (diff >= twist_threshold)
+
+    return BatchResult(
+        bottleneck=bottleneck,
+        perceived=perceived,
+        twist=twist,
+        norm_scores=norm_scores,
+    )
@@ -0,0 +1,65 @@
+"""
+Бенчмарк пересчёта результатов: цикл compute_result против score_batch
+
+Баллы случайные в пределах ZONE_MAX (много равенств — проверяется тай-брейк),
+perceived задан у части прохождений, у части берётся из complaint_best.
+Перед замером результаты сверяются с compute_result поштучно.
+
+Запуск: python -m benchmarks.bench_batch_scoring [N]
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from config import ZONE_MAX
+from scoring import AnswersState, compute_result
+from batch_scoring import ZONES, score_batch, states_to_arrays
+
+
+def random_states(count: int, seed: int = 2025) -> list:
+    rng = random.Random(seed)
+    states = []
+    for _ in range(count):
+        scores = {zone: rng.randint(0, ZONE_MAX[zone]) for zone in ZONES}
+        perceived = rng.choice((None, *ZONES))
+        complaint_best = None
+        if perceived is None and rng.random() < 0.7:
+            complaint_best = (rng.choice(ZONES), rng.randint(1, 3))
+        states.append(AnswersState(scores=scores, perceived_zone=perceived, complaint_best=complaint_best))
+    return states
+
+
+def main(count: int = 200000) -> None:
+    states = random_states(count)
+
+    started = time.perf_counter()
+    scalar = [compute_result(state) for state in states]
+    scalar_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scores, perceived = states_to_arrays(states)
+    convert_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = score_batch(scores, perceived)
+    batch_time = time.perf_counter() - started
+
+    # Сверка с compute_result
+    bottlenecks = batch.bottleneck_zones()
+    for i, result in enumerate(scalar):
+        assert bottlenecks[i] == result.bottleneck, (i, states[i])
+        assert bool(batch.twist[i]) == result.twist, (i, states[i])
+        assert list(batch.norm_scores[i]) == [result.norm_scores[zone] for zone in ZONES]
+
+    print(f"Прохождений: {count}")
+    print(f"Цикл compute_result: {scalar_time * 1000:.0f} мс")
+    print(f"score_batch:         {batch_time * 1000:.1f} мс (+ {convert_time * 1000:.0f} мс на сборку матрицы)")
+    print(f"Ускорение: {scalar_time / batch_time:.0f}x")
+    print(f"Твистов: {int(np.count_nonzero(batch.twist))}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
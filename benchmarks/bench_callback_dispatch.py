@@ -0,0 +1,73 @@
+"""
+Бенчмарк маршрутизации callback: цепочка фильтров против хэш-индекса
+
+Цепочка повторяет то, как aiogram перебирает обработчики роутера:
+проверяет фильтры по очереди до первого совпадения. Для честности
+фильтры — обычные функции (magic-filter F.data в aiogram ещё дороже).
+Число обработчиков растёт, нажимается кнопка из конца списка.
+
+Запуск: python -m benchmarks.bench_callback_dispatch
+"""
+
+import timeit
+
+from callback_index import CallbackIndex
+
+
+def build_filter_chain(handlers: int) -> list:
+    """Фильтры в стиле F.data == ..., F.data.in_(...), F.data.startswith(...)"""
+    chain = []
+    for i in range(handlers):
+        kind = i % 3
+        if kind == 0:
+            value = f"btn_{i}"
+            chain.append((lambda data, value=value: data == value, i))
+        elif kind == 1:
+            values = frozenset(f"q{i}_{option}" for option in range(3))
+            chain.append((lambda data, values=values: data in values, i))
+        else:
+            prefix = f"pref{i}_"
+            chain.append((lambda data, prefix=prefix: data.startswith(prefix), i))
+    return chain
+
+
+def filter_chain_route(chain: list, data: str) -> int:
+    for check, handler in chain:
+        if check(data):
+            return handler
+    return -1
+
+
+def build_index(handlers: int) -> CallbackIndex:
+    index = CallbackIndex()
+    for i in range(handlers):
+        async def handler(callback, arg):
+            pass
+        index.route(f"r{i}")(handler)
+    return index
+
+
+def index_route(index: CallbackIndex, data: str):
+    name, arg = index.parse(data)
+    return index._routes.get(name)
+
+
+def main(number: int = 100000) -> None:
+    print(f"{'обработчиков':>13} {'фильтры, мкс':>14} {'индекс, мкс':>12}")
+    for handlers in (15, 50, 200, 1000):
+        chain = build_filter_chain(handlers)
+        index = build_index(handlers)
+
+        last = handlers - 1
+        chain_data = f"q{last}_1" if last % 3 == 1 else (f"btn_{last}" if last % 3 == 0 else f"pref{last}_x")
+        index_data = CallbackIndex.pack(f"r{last}", "x")
+        assert filter_chain_route(chain, chain_data) == last
+        assert index_route(index, index_data) is not None
+
+        chain_time = timeit.timeit(lambda: filter_chain_route(chain, chain_data), number=number)
+        index_time = timeit.timeit(lambda: index_route(index, index_data), number=number)
+        print(f"{handlers:>13} {chain_time / number * 1e6:>14.2f} {index_time / number * 1e6:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Бенчмарк журнала событий: цена события в хендлере, запись и чтение через mmap
+
+Генерирует N прохождений квиза (переходы + ответы + результат), пишет
+их через EventLog с мелкими сегментами и читает обратно: funnel_timing
+и option_popularity. Сегменты читаются через mmap кусками — в памяти
+только последнее событие каждого пользователя и длительности шагов.
+
+Запуск: python -m benchmarks.bench_event_log [N]
+"""
+
+import asyncio
+import random
+import resource
+import sys
+import tempfile
+import time
+import timeit
+
+from database.event_log import EventLog, funnel_timing, option_popularity, segment_paths
+from quiz_graph import QUIZ_GRAPH
+from scoring import get_result_table
+from session_codec import QuizSession
+from handlers.start import session_result
+
+
+async def write(directory: str, users: int) -> int:
+    log = EventLog(directory, segment_bytes=4 * 1024 * 1024, flush_interval=0.05)
+    await log.start()
+    rng = random.Random(1)
+    get_result_table()
+
+    # Цена одного события для хендлера
+    question = QUIZ_GRAPH.first
+    option = question.options[0]
+    number = 200000
+    answer_time = timeit.timeit(lambda: log.on_answer(1, question, option), number=number)
+    state_time = timeit.timeit(lambda: log.on_transition(1, None, "QuizStates:question_1"), number=number)
+    print(f"on_answer: {answer_time / number * 1e9:.0f} нс, on_transition: {state_time / number * 1e9:.0f} нс")
+    await log.flush()
+
+    started = time.perf_counter()
+    for user_id in range(users):
+        session = QuizSession()
+        log.on_start(user_id)
+        log.on_transition(user_id, None, "QuizStates:waiting_for_name")
+        log.on_transition(user_id, "QuizStates:waiting_for_name", "QuizStates:waiting_for_niche")
+
+        for question in QUIZ_GRAPH:
+            option = rng.choice(question.options)
+            session.answer(question, option)
+            log.on_transition(user_id, None, f"QuizStates:{question.state}")
+            log.on_answer(user_id, question, option)
+
+        log.on_result(user_id, session_result(session))
+        log.on_lead(user_id, "consult" if user_id % 5 == 0 else "self")
+
+        if user_id % 1000 == 0:
+            # Даём фоновой записи поработать, как между апдейтами
+            await asyncio.sleep(0)
+
+    await log.stop()
+    elapsed = time.perf_counter() - started
+    print(f"Событий: {log.events}, запись с генерацией {elapsed:.2f} с")
+    return log.events - 2 * number
+
+
+def main(users: int = 100000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        events = asyncio.run(write(directory, users))
+        print(f"Сегментов: {len(segment_paths(directory))}")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        popularity = option_popularity(directory)
+        funnel = funnel_timing(directory)
+        elapsed = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # Минус события из замера цены (user 1)
+        answers = sum(sum(counts.values()) for counts in popularity.values())
+        assert answers == users * len(tuple(QUIZ_GRAPH)) + 200000
+        assert dict((step, reached) for step, reached, _ in funnel)["start"] == users
+
+        print(f"Анализ (2 прохода): {elapsed:.2f} с, {2 * events / elapsed / 1e6:.1f} млн событий/с")
+        print(f"Прирост пиковой памяти при чтении: {(rss_after - rss_before) / 1024:.1f} МБ")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,129 @@
+"""
+Бенчмарк выгрузки: строк в секунду и пиковая память
+
+Сравнивается выгрузка «как в плане» (fetchall + CSV в StringIO)
+с потоковой выгрузкой database/export.py в CSV и Parquet.
+Каждый вариант запускается в отдельном процессе, пик RSS считается
+от памяти процесса до начала выгрузки.
+
+Запуск: python -m benchmarks.bench_export [N]
+"""
+
+import csv
+import io
+import importlib.util
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import time
+
+from config import ZONE_MAX
+from database.export import ExportRequest, export_to_file
+from database.recorder import INSERT_COMPLETION, SCHEMA
+from quiz_graph import QUIZ_GRAPH
+from session_codec import QuizSession
+
+
+def random_answers(rng: random.Random) -> int:
+    session = QuizSession()
+    for question in QUIZ_GRAPH:
+        session.answer(question, rng.choice(question.options))
+    return session.answers
+
+
+def fill(path: str, rows: int) -> None:
+    rng = random.Random(2025)
+    zones = list(ZONE_MAX)
+    started = time.time() - rows
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany(INSERT_COMPLETION, (
+            (100000 + i, f"user{i}", "Анна", "инфопродуктах", random_answers(rng),
+             rng.choice(zones), rng.choice(zones), rng.random() < 0.5,
+             rng.randint(0, 2), rng.randint(0, 2), rng.randint(0, 4), rng.randint(0, 3), rng.randint(0, 3),
+             started + i)
+            for i in range(rows)
+        ))
+    connection.close()
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def naive_export(path: str, request: ExportRequest):
+    """Всё в память: fetchall + StringIO, как в development_plan.md"""
+    connection = sqlite3.connect(path)
+    sql, params = request.query()
+    rows = connection.execute(sql, params).fetchall()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(request.columns)
+    writer.writerows(rows)
+    data = output.getvalue().encode("utf-8")
+    connection.close()
+    return len(rows), len(data)
+
+
+def run(variant: str, path: str, request: ExportRequest, results) -> None:
+    baseline = rss_kb()
+    started = time.perf_counter()
+    if variant == "naive":
+        rows, _ = naive_export(path, request)
+    else:
+        out, rows = export_to_file(path, request)
+        os.unlink(out)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((rows, elapsed, peak - baseline))
+
+
+def measure(variant: str, path: str, request: ExportRequest):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run, args=(variant, path, request, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{variant}: процесс завершился с кодом {process.exitcode}")
+    outcome = results.get()
+    return outcome
+
+
+def main(rows: int = 300000) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "export.db")
+        fill(path, rows)
+
+        variants = [
+            ("fetchall + StringIO", "naive", ExportRequest(table="completions")),
+            ("поток, CSV", "stream", ExportRequest(table="completions")),
+        ]
+        if importlib.util.find_spec("pyarrow") is not None:
+            variants.append(("поток, Parquet", "stream", ExportRequest(format="parquet", table="completions")))
+        else:
+            print("pyarrow не установлен — Parquet пропущен")
+
+        print(f"Строк в таблице: {rows}")
+        print(f"{'вариант':<22} {'строк/с':>10} {'пик RSS, МБ':>12}")
+        for title, variant, request in variants:
+            count, elapsed, peak_kb = measure(variant, path, request)
+            assert count == rows
+            print(f"{title:<22} {count / elapsed:>10.0f} {peak_kb / 1024:>12.1f}")
+
+        # Фильтр уходит в WHERE: выгрузка одной зоны за последнюю треть времени
+        request = ExportRequest.parse(f"completions zone=sales from={time.strftime('%Y-%m-%d')}")
+        count, elapsed, _ = measure("stream", path, request)
+        print(f"С фильтром ({request.zone}, с {request.date_from}): {count} строк за {elapsed * 1000:.0f} мс")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300000)
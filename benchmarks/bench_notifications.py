@@ -0,0 +1,91 @@
+"""
+Сколько сообщений получает владелец во время всплеска заявок
+
+Поток заявок: сначала редкие (каждая должна уйти сразу), затем всплеск.
+Время сжато: окно — доли секунды. Бот подменён заглушкой, которая
+считает отправки. В конце — «падение» до отправки и подъём из журнала.
+
+Запуск: python -m benchmarks.bench_notifications
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from utils.notifications import LeadNotifier
+
+ZONES = ("product", "traffic", "content", "sales", "system")
+
+
+class CountingBot:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.messages.append((time.monotonic(), text))
+
+
+def event(i: int) -> dict:
+    return {
+        "user_id": 100000 + i, "username": f"user{i}", "name": "Анна", "niche": "инфопродуктах",
+        "bottleneck": ZONES[i % len(ZONES)], "perceived": "traffic", "at": time.time(),
+    }
+
+
+async def simulate(path: str, window: float, quiet: int, spike: int, spike_rate: float) -> None:
+    bot = CountingBot()
+    notifier = LeadNotifier([1], path, window=window, max_batch=50)
+    await notifier.start(bot)
+
+    # Редкие заявки: реже окна — каждая уходит сразу
+    latencies = []
+    for i in range(quiet):
+        sent_before = len(bot.messages)
+        started = time.monotonic()
+        notifier.notify(event(i))
+        while len(bot.messages) == sent_before:
+            await asyncio.sleep(0.001)
+        latencies.append(bot.messages[-1][0] - started)
+        await asyncio.sleep(window * 1.5)
+
+    quiet_messages = len(bot.messages)
+
+    # Всплеск: spike_rate заявок в секунду
+    for i in range(spike):
+        notifier.notify(event(quiet + i))
+        await asyncio.sleep(1 / spike_rate)
+    await notifier.stop()
+
+    spike_messages = len(bot.messages) - quiet_messages
+    print(f"Редкие заявки: {quiet} -> сообщений {quiet_messages}, задержка до {max(latencies) * 1000:.1f} мс")
+    print(f"Всплеск: {spike} заявок ({spike_rate:.0f}/с) -> сообщений {spike_messages} (по одной было бы {spike})")
+    assert notifier.sent_leads == quiet + spike
+
+
+async def restart(path: str) -> None:
+    # Заявки записаны, но бот «упал» до отправки
+    notifier = LeadNotifier([1], path, window=60)
+    for i in range(7):
+        notifier.notify(event(i))
+    notifier._journal.close()
+
+    bot = CountingBot()
+    restored = LeadNotifier([1], path, window=60)
+    print(f"После перезапуска в журнале: {restored.pending}")
+    await restored.start(bot)
+    await asyncio.sleep(0.05)
+    await restored.stop()
+    assert restored.sent_leads == 7 and len(bot.messages) == 1
+    print(f"Отправлено сводкой: {restored.sent_leads} заявок одним сообщением\n")
+    print(bot.messages[0][1])
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await simulate(os.path.join(directory, "spike.jsonl"), window=0.2, quiet=5, spike=1000, spike_rate=2000)
+        await restart(os.path.join(directory, "restart.jsonl"))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
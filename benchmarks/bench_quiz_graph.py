@@ -0,0 +1,71 @@
+"""
+Бенчмарк обработки ответа: старый хендлер (словари и клавиатура на каждый вызов)
+против поиска по графу с заранее собранными клавиатурами
+
+Меряется только CPU-часть хендлера (без FSM и отправки).
+Запуск: python -m benchmarks.bench_quiz_graph
+"""
+
+import timeit
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from handlers.start import QUESTION_KEYBOARDS
+from quiz_graph import QUIZ_GRAPH
+
+
+def old_handle_question_4(callback_data: str, data: dict) -> tuple:
+    """Тело handle_question_4 до перехода на граф"""
+    product_pain = data.get('product_pain', 0)
+    pain_points = {"q4_clear": 0, "q4_medium": 1, "q4_chaos": 2}
+    product_pain += pain_points[callback_data]
+    complaint_levels = {"q4_clear": 0, "q4_medium": 1, "q4_chaos": 2}
+    update = {}
+    complaint = complaint_levels[callback_data]
+    complaint_best = data.get('complaint_best')
+    if not complaint_best or complaint > complaint_best[1]:
+        update['complaint_best'] = ("product", complaint)
+    answer_text = {
+        "q4_clear": "Да, у меня есть понятное предложение",
+        "q4_medium": "Примерно могу, но запинаюсь",
+        "q4_chaos": "Нет, у меня миллион идей и форматов",
+    }
+    update.update(question_4=answer_text[callback_data], product_pain=product_pain)
+    keyboard_q5 = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Новые люди стабильно приходят каждую неделю", callback_data="q5_stable")],
+            [InlineKeyboardButton(text="🤷 Иногда прибавляется кто-то, иногда тишина", callback_data="q5_unstable")],
+            [InlineKeyboardButton(text="😞 Практически одни и те же лица везде, никого нового", callback_data="q5_stagnant")],
+        ]
+    )
+    return update, keyboard_q5
+
+
+def new_handle_answer(callback_data: str, data: dict) -> tuple:
+    """Тело handle_answer: поиск по графу"""
+    question, option = QUIZ_GRAPH.answers[callback_data]
+    update = {question.answer_key: option.answer}
+    pain_key = f"{question.zone}_pain"
+    update[pain_key] = data.get(pain_key, 0) + option.pain
+    complaint_best = data.get('complaint_best')
+    if not complaint_best or option.complaint > complaint_best[1]:
+        update['complaint_best'] = (question.zone, option.complaint)
+    next_question = QUIZ_GRAPH.next_question(question)
+    return update, QUESTION_KEYBOARDS[next_question.id]
+
+
+def main(number: int = 50000) -> None:
+    data = {'complaint_best': ("product", 1), 'product_pain': 0}
+
+    assert old_handle_question_4("q4_chaos", data)[0] == new_handle_answer("q4_chaos", data)[0]
+
+    old = timeit.timeit(lambda: old_handle_question_4("q4_chaos", data), number=number)
+    new = timeit.timeit(lambda: new_handle_answer("q4_chaos", data), number=number)
+
+    print(f"Старый хендлер: {old / number * 1e6:.2f} мкс/ответ")
+    print(f"Граф:           {new / number * 1e6:.2f} мкс/ответ")
+    print(f"Ускорение: x{old / new:.1f}")
+
+
+if __name__ == '__main__':
+    main()
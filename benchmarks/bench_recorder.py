@@ -0,0 +1,82 @@
+"""
+Бенчмарк записи завершённых квизов в SQLite
+
+Сравнивается запись «как в лоб» (INSERT + commit на каждое завершение,
+хендлер ждёт диск) с QuizRecorder: очередь + фоновый поток + executemany.
+Для рекордера отдельно меряется, сколько стоит постановка в очередь —
+это всё, что платит хендлер.
+
+Запуск: python -m benchmarks.bench_recorder [N]
+"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from database.recorder import INSERT_COMPLETION, SCHEMA, Completion, QuizRecorder
+
+
+def sample(i: int) -> Completion:
+    return Completion(
+        100000 + i, f"user{i}", "Анна", "инфопродуктах", 0x1234567,
+        "sales", "traffic", True, 1, 1, 2, 3, 0, time.time(),
+    )
+
+
+def naive(path: str, rows: list) -> float:
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    started = time.perf_counter()
+    for row in rows:
+        connection.execute(INSERT_COMPLETION, row)
+        connection.commit()
+    elapsed = time.perf_counter() - started
+    connection.close()
+    return elapsed
+
+
+async def write_behind(path: str, rows: list):
+    recorder = QuizRecorder(path)
+    await recorder.start()
+
+    started = time.perf_counter()
+    for row in rows:
+        recorder.record_completion(row)
+    enqueue = time.perf_counter() - started
+
+    await recorder.stop()
+    total = time.perf_counter() - started
+    return enqueue, total, recorder.stats
+
+
+def count(path: str) -> int:
+    connection = sqlite3.connect(path)
+    rows = connection.execute("SELECT COUNT(*) FROM completions").fetchone()[0]
+    connection.close()
+    return rows
+
+
+def main(number: int = 100000) -> None:
+    rows = [sample(i) for i in range(number)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        naive_rows = rows[:min(number, 5000)]
+        naive_time = naive(os.path.join(directory, "naive.db"), naive_rows)
+
+        path = os.path.join(directory, "recorder.db")
+        enqueue, total, stats = asyncio.run(write_behind(path, rows))
+        assert count(path) == number, "записаны не все строки"
+
+    print(f"INSERT + commit на запись: {len(naive_rows) / naive_time:>10.0f} строк/с, "
+          f"хендлер ждёт {naive_time / len(naive_rows) * 1e6:.0f} мкс")
+    print(f"QuizRecorder:              {number / total:>10.0f} строк/с, "
+          f"хендлер ждёт {enqueue / number * 1e6:.2f} мкс")
+    print(f"Пачек: {stats.batches}, макс. пачка: {stats.max_batch}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,59 @@
+"""
+Бенчмарк рендера результата: подстановки на каждый вызов vs готовая таблица
+
+Запуск: python -m benchmarks.bench_render
+"""
+
+import timeit
+
+from config import DEFAULT_TEMPLATE, ZONE_PRIORITY
+from scoring import (
+    DiagnosticResult,
+    build_final_message,
+    _render_buttons,
+    get_compiled_template,
+    render_result,
+)
+
+
+def _sample_results() -> list:
+    """Все варианты результата: confirmation и twist для каждой зоны"""
+    results = []
+    for bottleneck in ZONE_PRIORITY:
+        results.append(DiagnosticResult(bottleneck, bottleneck, False, {}, {}))
+        for perceived in ZONE_PRIORITY:
+            if perceived != bottleneck:
+                results.append(DiagnosticResult(bottleneck, perceived, True, {}, {}))
+    return results
+
+
+def main(number: int = 20000) -> None:
+    results = _sample_results()
+
+    # Проверяем, что таблица отдаёт те же тексты
+    for result in results:
+        assert render_result(result).text == build_final_message(result)
+
+    def old_path():
+        for result in results:
+            build_final_message(result, DEFAULT_TEMPLATE)
+            _render_buttons(result.bottleneck, DEFAULT_TEMPLATE)
+
+    def new_path():
+        for result in results:
+            render_result(result, DEFAULT_TEMPLATE)
+
+    get_compiled_template(DEFAULT_TEMPLATE)
+
+    calls = number * len(results)
+    old = timeit.timeit(old_path, number=number)
+    new = timeit.timeit(new_path, number=number)
+
+    print(f"Вариантов результата: {len(results)}, вызовов: {calls}")
+    print(f"build_final_message + кнопки: {old / calls * 1e6:.2f} мкс/вызов")
+    print(f"render_result (таблица):      {new / calls * 1e6:.2f} мкс/вызов")
+    print(f"Ускорение: x{old / new:.1f}")
+
+
+if __name__ == '__main__':
+    main()
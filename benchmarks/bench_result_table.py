@@ -0,0 +1,48 @@
+"""
+Бенчмарк завершения квиза: compute_result против таблицы всех ответов
+
+Запуск: python -m benchmarks.bench_result_table
+"""
+
+import time
+import timeit
+
+from scoring import ResultTable, compute_result, get_result_table
+from quiz_graph import QUIZ_GRAPH
+
+
+def main(number: int = 200000) -> None:
+    started = time.perf_counter()
+    table = ResultTable(QUIZ_GRAPH)
+    build_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    checked = table.verify()
+    verify_time = time.perf_counter() - started
+
+    # Самый «дорогой» ключ: perceived задан, все ответы последние
+    table = get_result_table()
+    perceived = table.perceived[-1]
+    option_ids = tuple(question.options[-1].id for question in table.questions)
+    state = table.state_for(perceived, [question.options[-1] for question in table.questions])
+    options = dict(zip((question.id for question in table.questions), option_ids))
+
+    def scalar():
+        return compute_result(state)
+
+    def lookup():
+        return table.get(perceived, tuple(options.get(question.id) for question in table.questions))
+
+    assert lookup() == scalar()
+
+    scalar_time = timeit.timeit(scalar, number=number)
+    lookup_time = timeit.timeit(lookup, number=number)
+
+    print(f"Записей: {checked}, сборка {build_time * 1000:.1f} мс, сверка {verify_time * 1000:.1f} мс")
+    print(f"compute_result: {scalar_time / number * 1e6:.2f} мкс")
+    print(f"таблица:        {lookup_time / number * 1e6:.2f} мкс")
+    print(f"Ускорение: {scalar_time / lookup_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
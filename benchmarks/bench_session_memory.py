@@ -0,0 +1,104 @@
+"""
+Память на сессию: данные FSM старого формата против QuizSession
+
+Симулируется N пользователей, прошедших квиз со случайными ответами.
+Старый формат — словарь, который копил handle_answer (тексты ответов,
+счётчики *_pain, complaint_best, perceived_zone, options). Замеряется
+tracemalloc для двух случаев: строки общие с questions.py (MemoryStorage)
+и строки свои у каждой сессии (после JSON — Redis, сброс на диск).
+Плюс размер JSON, который уходит в Redis.
+
+Запуск: python -m benchmarks.bench_session_memory [N]
+"""
+
+import json
+import random
+import sys
+import tracemalloc
+
+from config import ZONE_MAX
+from quiz_graph import QUIZ_GRAPH
+from session_codec import QuizSession
+
+NICHES = ("инфопродуктах", "консалтинге", "продажах", "бизнесе", "в сфере фитнеса")
+NAMES = ("Анна", "Мария", "Елена", "Ольга", "Дмитрий", "Александр")
+
+
+def random_answers(rng: random.Random) -> list:
+    return [(question, rng.choice(question.options)) for question in QUIZ_GRAPH]
+
+
+def legacy_data(name: str, niche: str, answers: list) -> dict:
+    """Словарь FSM так, как его собирал handle_answer до session_codec"""
+    data = {"name": name, "niche": niche}
+    for question, option in answers:
+        if question.answer_key:
+            data[question.answer_key] = option.answer
+        if question.reset_scores:
+            data.update({f"{zone}_pain": 0 for zone in ZONE_MAX})
+            data["options"] = {}
+        if option.perceived:
+            data["perceived_zone"] = option.perceived
+        if question.zone:
+            pain_key = f"{question.zone}_pain"
+            data[pain_key] = data.get(pain_key, 0) + option.pain
+            complaint_best = data.get("complaint_best")
+            if not complaint_best or option.complaint > complaint_best[1]:
+                data["complaint_best"] = (question.zone, option.complaint)
+            data["options"] = {**data.get("options", {}), question.id: option.id}
+    return data
+
+
+def compact_session(name: str, niche: str, answers: list) -> QuizSession:
+    session = QuizSession(name, niche)
+    for question, option in answers:
+        session.answer(question, option)
+    return session
+
+
+def measure(build) -> int:
+    """Сколько байт занимают объекты, созданные build()"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+
+def main(users: int = 100000) -> None:
+    rng = random.Random(2025)
+    people = [
+        (rng.choice(NAMES), rng.choice(NICHES), random_answers(rng))
+        for _ in range(users)
+    ]
+
+    # Сессии совпадают по смыслу: результат считается одинаково
+    for name, niche, answers in people[:1000]:
+        old = legacy_data(name, niche, answers)
+        new = QuizSession.from_data(json.loads(json.dumps(compact_session(name, niche, answers).to_data())))
+        assert QuizSession.from_data(old).answers == new.answers
+        assert new.answers_state().scores == {zone: old.get(f"{zone}_pain", 0) for zone in ZONE_MAX}
+
+    rows = [
+        ("старый dict, общие строки", lambda: [legacy_data(*p) for p in people]),
+        ("старый dict после JSON", lambda: [json.loads(json.dumps(legacy_data(*p), ensure_ascii=False)) for p in people]),
+        ("QuizSession", lambda: [compact_session(*p) for p in people]),
+        ("dict QuizSession после JSON", lambda: [json.loads(json.dumps(compact_session(*p).to_data(), ensure_ascii=False)) for p in people]),
+    ]
+
+    print(f"Пользователей: {users}")
+    print(f"{'формат':<30} {'байт на сессию':>15} {'всего, МБ':>10}")
+    for title, build in rows:
+        total = measure(build)
+        print(f"{title:<30} {total / users:>15.0f} {total / 2**20:>10.1f}")
+
+    name, niche, answers = people[0]
+    old_json = json.dumps(legacy_data(name, niche, answers), ensure_ascii=False).encode()
+    new_json = json.dumps(compact_session(name, niche, answers).to_data(), ensure_ascii=False).encode()
+    print(f"JSON в Redis: {len(old_json)} -> {len(new_json)} байт")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,76 @@
+"""
+Бенчмарк сериализации одной отправки: сколько стоит SendMessage до сети
+
+Сравниваются три варианта отправки вопроса о нише (5 кнопок):
+клавиатура собирается на каждый вызов (как было в хендлерах),
+готовая клавиатура из static_messages.py и готовый JSON (STATIC_FAST_PATH=1).
+Считается сборка SendMessage и form data сессией aiogram — ровно то,
+что делает bot(...) перед HTTP-запросом.
+
+Запуск: python -m benchmarks.bench_static_send
+"""
+
+import json
+import timeit
+
+from aiogram import Bot
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+import static_messages
+from static_messages import ASK_NICHE, NICHES, enable_fast_path
+
+CHAT_ID = 123456789
+
+
+def fresh_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура ниш, собранная заново — как в хендлере до static_messages"""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text=label, callback_data=static_messages.pack("n", code))]
+            for code, (label, _) in NICHES.items()
+        ]
+    )
+
+
+def send_fresh(bot: Bot):
+    method = SendMessage(chat_id=CHAT_ID, text=ASK_NICHE.text, reply_markup=fresh_keyboard(), parse_mode="HTML")
+    return bot.session.build_form_data(bot, method)
+
+
+def send_static(bot: Bot):
+    return bot.session.build_form_data(bot, ASK_NICHE.method(CHAT_ID))
+
+
+def form_fields(form) -> dict:
+    """Поля FormData: имя -> значение (reply_markup разбирается из JSON)"""
+    fields = {options["name"]: value for options, _, value in form._fields}
+    if "reply_markup" in fields:
+        fields["reply_markup"] = json.loads(fields["reply_markup"])
+    return fields
+
+
+def main(number: int = 20000) -> None:
+    bot = Bot(token="42:BENCHMARK")
+
+    enable_fast_path(False)
+    reference = form_fields(send_fresh(bot))
+    assert form_fields(send_static(bot)) == reference
+
+    fresh_time = timeit.timeit(lambda: send_fresh(bot), number=number)
+    static_time = timeit.timeit(lambda: send_static(bot), number=number)
+
+    enable_fast_path(True)
+    assert form_fields(send_static(bot)) == reference, "готовый JSON отличается от сериализации aiogram"
+    fast_time = timeit.timeit(lambda: send_static(bot), number=number)
+    enable_fast_path(False)
+
+    print(f"{'вариант':<28} {'мкс на отправку':>16}")
+    print(f"{'клавиатура на каждый вызов':<28} {fresh_time / number * 1e6:>16.1f}")
+    print(f"{'готовая клавиатура':<28} {static_time / number * 1e6:>16.1f}")
+    print(f"{'готовый JSON':<28} {fast_time / number * 1e6:>16.1f}")
+    print(f"Ускорение: {fresh_time / fast_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
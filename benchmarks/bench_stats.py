@@ -0,0 +1,43 @@
+"""
+Бенчмарк /stats: время ответа от числа прохождений
+
+Счётчики наполняются N результатами (случайные зоны и ниши), затем
+замеряется format_stats. Время не должно расти с N.
+
+Запуск: python -m benchmarks.bench_stats
+"""
+
+import random
+import timeit
+
+from config import ZONE_PRIORITY
+from scoring import DiagnosticResult
+from utils.analytics import FUNNEL_STEPS, FunnelStats, format_stats
+
+NICHES = ("инфопродуктах", "консалтинге", "продажах", "бизнесе")
+
+
+def filled(results: int, seed: int = 2025) -> FunnelStats:
+    rng = random.Random(seed)
+    stats = FunnelStats(known_niches=NICHES)
+    for step in FUNNEL_STEPS:
+        stats.reached[step] = results * 2
+    for _ in range(results):
+        bottleneck, perceived = rng.choice(ZONE_PRIORITY), rng.choice(ZONE_PRIORITY)
+        result = DiagnosticResult(bottleneck, perceived, bottleneck != perceived, {}, {})
+        stats.on_result(result, rng.choice(NICHES + ("в сфере фитнеса",)))
+        if rng.random() < 0.3:
+            stats.on_lead("consult")
+    return stats
+
+
+def main(number: int = 2000) -> None:
+    print(f"{'прохождений':>12} {'/stats, мкс':>12}")
+    for results in (1000, 10000, 100000, 1000000):
+        stats = filled(results)
+        elapsed = timeit.timeit(lambda: format_stats(stats), number=number)
+        print(f"{results:>12} {elapsed / number * 1e6:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
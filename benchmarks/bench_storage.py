@@ -0,0 +1,76 @@
+"""
+Бенчмарк FSM-хранилищ: задержка на один апдейт
+
+Сравниваются MemoryStorage и QuizRedisStorage (через FakeRedisServer
+в этом же процессе, т.е. с реальным сетевым round-trip по loopback)
+в двух режимах:
+  - как раньше: get_state, get_data, update_data x2, set_state
+  - через StateTransaction: get_state, get_data, одна запись
+
+Запуск: python -m benchmarks.bench_storage
+"""
+
+import asyncio
+import time
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from handlers.states import QuizStates
+from middlewares.state_tx import StateTransaction
+from storage.fake_redis import FakeRedisServer
+from storage.redis_storage import QuizRedisStorage
+
+
+async def old_update(storage: BaseStorage, key: StorageKey) -> None:
+    """Апдейт в стиле handle_question_4 до транзакций"""
+    context = FSMContext(storage=storage, key=key)
+    await context.get_state()
+    data = await context.get_data()
+    await context.update_data(complaint_best=("product", 2))
+    await context.update_data(question_4="Нет, у меня миллион идей и форматов",
+                              product_pain=data.get('product_pain', 0) + 2)
+    await context.set_state(QuizStates.question_5)
+
+
+async def tx_update(storage: BaseStorage, key: StorageKey) -> None:
+    """Тот же апдейт через StateTransaction"""
+    context = FSMContext(storage=storage, key=key)
+    tx = StateTransaction(context, await context.get_state())
+    data = await tx.get_data()
+    await tx.update_data(complaint_best=("product", 2))
+    await tx.update_data(question_4="Нет, у меня миллион идей и форматов",
+                         product_pain=data.get('product_pain', 0) + 2)
+    await tx.set_state(QuizStates.question_5)
+    await tx.flush()
+
+
+async def measure(storage: BaseStorage, update, users: int = 200, rounds: int = 5) -> float:
+    """Средняя задержка апдейта в микросекундах"""
+    keys = [StorageKey(bot_id=1, chat_id=user, user_id=user) for user in range(users)]
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for key in keys:
+            await update(storage, key)
+    return (time.perf_counter() - started) / (users * rounds) * 1e6
+
+
+async def main() -> None:
+    server = FakeRedisServer()
+    await server.start()
+
+    redis_storage = QuizRedisStorage.from_url(server.url, ttl=3600)
+    storages = [("memory", MemoryStorage()), ("redis", redis_storage)]
+
+    for name, storage in storages:
+        old = await measure(storage, old_update)
+        new = await measure(storage, tx_update)
+        print(f"{name:>6}: как раньше {old:8.1f} мкс/апдейт, транзакция {new:8.1f} мкс/апдейт")
+
+    await redis_storage.close()
+    await server.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
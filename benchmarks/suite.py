@@ -0,0 +1,460 @@
+"""
+Набор микробенчмарков с порогом регрессии
+
+Горячие функции scoring.py, сборка сообщений и клавиатур квиза и по одному
+полному апдейту на каждый хендлер handlers/start.py (через dp.feed_update,
+со всеми middleware роутера; Bot API подменён сессией без сети).
+
+Время сравнивается не в микросекундах, а в долях эталонной нагрузки
+(чистый Python, меряется тут же) — так базовые значения из
+benchmarks/baseline.json переносимы между машинами. Если бенчмарк стал
+медленнее базы больше чем на tolerance, набор завершается с кодом 1.
+
+Запуск:
+    python -m benchmarks.suite                  # сравнить с baseline.json
+    python -m benchmarks.suite --update         # записать новую базу
+    python -m benchmarks.suite -k handler_ --tolerance 0.5
+"""
+
+import argparse
+import asyncio
+import gc
+import inspect
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response
+from aiogram.types import Update
+
+from callback_index import CallbackIndex
+from config import DEFAULT_TEMPLATE
+from delayed import DelayedScheduler
+from handlers import start
+from handlers.states import QuizStates
+from quiz_graph import QUIZ_GRAPH
+from scoring import (
+    AnswersState,
+    build_final_message,
+    compute_result,
+    get_result_buttons,
+    normalize_scores,
+    pick_max_zone,
+)
+from session_codec import QuizSession
+from static_messages import ASK_NICHE, QUESTION_MESSAGES, StaticMessage
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Сколько секунд минимум длится один замер
+MIN_TIME = 0.2
+
+Bench = Union[Callable[[], Any], Callable[[], Awaitable[Any]]]
+
+# имя -> функция подготовки, которая возвращает замеряемый вызов
+BENCHMARKS: Dict[str, Callable[[], Bench]] = {}
+
+
+def benchmark(name: str):
+    """Зарегистрировать бенчмарк: декорируемая функция готовит данные и возвращает вызов"""
+    def decorator(setup: Callable[[], Bench]) -> Callable[[], Bench]:
+        if name in BENCHMARKS:
+            raise ValueError(f"Бенчмарк {name} уже есть")
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+# ========================================
+# SCORING
+# ========================================
+
+# Типичные ответы: боль в продажах и системе, человек думает про трафик
+SCORES = {"product": 1, "traffic": 2, "content": 1, "sales": 3, "system": 2}
+STATE = AnswersState(scores=dict(SCORES), perceived_zone="traffic", complaint_best=("sales", 3))
+RESULT = compute_result(STATE)
+
+
+@benchmark("normalize_scores")
+def _normalize():
+    return lambda: normalize_scores(SCORES)
+
+
+@benchmark("pick_max_zone")
+def _pick_max():
+    norm = normalize_scores(SCORES)
+    return lambda: pick_max_zone(norm)
+
+
+@benchmark("compute_result")
+def _compute():
+    return lambda: compute_result(STATE)
+
+
+@benchmark("build_final_message")
+def _final_message():
+    return lambda: build_final_message(RESULT, DEFAULT_TEMPLATE)
+
+
+@benchmark("get_result_buttons")
+def _result_buttons():
+    return lambda: get_result_buttons(RESULT, DEFAULT_TEMPLATE)
+
+
+@benchmark("result_lookup")
+def _result_lookup():
+    session = _full_session()
+    return lambda: start.session_result(session)
+
+
+# ========================================
+# СООБЩЕНИЯ И КЛАВИАТУРЫ КВИЗА
+# ========================================
+
+@benchmark("question_keyboard_build")
+def _keyboard_build():
+    message = QUESTION_MESSAGES[QUIZ_GRAPH.first.id]
+    # Новый объект — клавиатура собирается заново (cached_property)
+    return lambda: StaticMessage(message.text, message.buttons).keyboard
+
+
+@benchmark("question_message")
+def _question_message():
+    message = QUESTION_MESSAGES[QUIZ_GRAPH.first.id]
+    return lambda: message.method(100500)
+
+
+@benchmark("niche_message")
+def _niche_message():
+    return lambda: ASK_NICHE.method(100500)
+
+
+@benchmark("first_question_text")
+def _first_question_text():
+    message = QUESTION_MESSAGES[QUIZ_GRAPH.first.id]
+
+    name, niche = "Анна", "инфопродуктах"
+
+    def build():
+        # Как в process_niche_choice: текст с именем и нишей + готовая клавиатура
+        text = (
+            f"Отлично, <b>{name}</b>!\n\n"
+            "Сейчас я задам тебе несколько вопросов. Это займёт всего 2 минуты.\n\n"
+            "🎯 <b>Начнём с честной точки А.</b> Без чувства вины, просто факт.\n\n"
+            f"<b>Вопрос 1:</b> Как ты оцениваешь свой 2025 по деньгам/результатам в <b>{niche}</b>?"
+        )
+        return message.method(100500, text)
+    return build
+
+
+# ========================================
+# ХЕНДЛЕРЫ: ПОЛНЫЙ АПДЕЙТ
+# ========================================
+
+class NullSession(BaseSession):
+    """Сессия без сети: отвечает на методы Bot API сразу"""
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout: Optional[int] = None) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is not None:
+            result = {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "text": getattr(method, "text", None) or "",
+            }
+        else:
+            result = True
+        response = Response[method.__returning__].model_validate({"ok": True, "result": result}, context={"bot": bot})
+        return response.result
+
+    async def stream_content(self, *args: Any, **kwargs: Any):
+        raise NotImplementedError
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+USER_ID = 100500
+_handler_env: Optional[Tuple[Bot, Dispatcher]] = None
+
+
+def _handler_dispatcher() -> Tuple[Bot, Dispatcher]:
+    """Диспетчер с роутером квиза (один на процесс — роутер подключается один раз)"""
+    global _handler_env
+    if _handler_env is None:
+        bot = Bot("123456:SUITE", session=NullSession())
+        dp = Dispatcher(storage=MemoryStorage())
+        dp.include_router(start.router)
+        _handler_env = bot, dp
+    return _handler_env
+
+
+def _last_question():
+    question = QUIZ_GRAPH.first
+    while QUIZ_GRAPH.next_question(question) is not None:
+        question = QUIZ_GRAPH.next_question(question)
+    return question
+
+
+def _full_session(skip_last: bool = False) -> QuizSession:
+    """Сессия с ответом на каждый вопрос (кроме последнего, если skip_last)"""
+    session = QuizSession("Анна", "инфопродуктах")
+    last = _last_question()
+    for question in QUIZ_GRAPH:
+        if skip_last and question is last:
+            continue
+        session.answer(question, question.options[-1])
+    return session
+
+
+def _message_update(text: str) -> Dict[str, Any]:
+    message = {
+        "message_id": 1, "date": 0, "text": text,
+        "chat": {"id": USER_ID, "type": "private"},
+        "from": {"id": USER_ID, "is_bot": False, "first_name": "Анна"},
+    }
+    if text.startswith("/"):
+        message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": 1, "message": message}
+
+
+def _callback_update(data: str) -> Dict[str, Any]:
+    return {"update_id": 1, "callback_query": {
+        "id": "1", "chat_instance": "1", "data": data,
+        "from": {"id": USER_ID, "is_bot": False, "first_name": "Анна"},
+        "message": {"message_id": 1, "date": 0, "text": "", "chat": {"id": USER_ID, "type": "private"}},
+    }}
+
+
+def _handler_bench(raw: Dict[str, Any], state=None, data: Optional[Dict[str, Any]] = None) -> Bench:
+    """Апдейт через dp.feed_update; перед каждым — исходное состояние пользователя"""
+    bot, dp = _handler_dispatcher()
+    update = Update.model_validate(raw, context={"bot": bot})
+    key = StorageKey(bot_id=bot.id, chat_id=USER_ID, user_id=USER_ID)
+    state = state.state if state is not None else None
+    data = data or {}
+    storage = dp.storage
+    # Свой планировщик: отложенные доставки прошлых бенчмарков не копятся
+    dp["delayed"] = DelayedScheduler(None)
+
+    async def run():
+        await storage.set_state(key, state)
+        await storage.set_data(key, data)
+        await dp.feed_update(bot, update)
+    return run
+
+
+@benchmark("handler_cmd_start")
+def _cmd_start():
+    return _handler_bench(_message_update("/start"))
+
+
+@benchmark("handler_start_quiz")
+def _start_quiz():
+    return _handler_bench(_callback_update(CallbackIndex.pack("st")))
+
+
+@benchmark("handler_process_name")
+def _process_name():
+    return _handler_bench(_message_update("Анна"), QuizStates.waiting_for_name)
+
+
+@benchmark("handler_process_niche_choice")
+def _niche_choice():
+    return _handler_bench(_callback_update(CallbackIndex.pack("n", "infoproducts")), QuizStates.waiting_for_niche, {"name": "Анна"})
+
+
+@benchmark("handler_process_custom_niche")
+def _custom_niche():
+    return _handler_bench(_message_update("фитнес"), QuizStates.waiting_for_niche, {"name": "Анна"})
+
+
+@benchmark("handler_handle_answer")
+def _answer():
+    question = QUIZ_GRAPH.next_question(QUIZ_GRAPH.first)
+    session = QuizSession("Анна", "инфопродуктах")
+    session.answer(QUIZ_GRAPH.first, QUIZ_GRAPH.first.options[0])
+    return _handler_bench(
+        _callback_update(CallbackIndex.pack("a", question.options[0].id)),
+        getattr(QuizStates, question.state), session.to_data(),
+    )
+
+
+@benchmark("handler_show_result")
+def _show_result():
+    last = _last_question()
+    return _handler_bench(
+        _callback_update(CallbackIndex.pack("a", last.options[-1].id)),
+        getattr(QuizStates, last.state), _full_session(skip_last=True).to_data(),
+    )
+
+
+@benchmark("handler_to_consult")
+def _to_consult():
+    return _handler_bench(_callback_update(CallbackIndex.pack("rc")), QuizStates.show_result, _full_session().to_data())
+
+
+@benchmark("handler_to_self")
+def _to_self():
+    return _handler_bench(_callback_update(CallbackIndex.pack("rs")), QuizStates.show_result, _full_session().to_data())
+
+
+# ========================================
+# ЗАМЕР
+# ========================================
+
+def _calibration() -> int:
+    """Эталонная нагрузка: словари, строки и арифметика чистого Python"""
+    total = 0
+    values = {}
+    for i in range(200):
+        values[i] = str(i)
+        total += len(values[i]) * i
+    return total
+
+
+async def _per_call(fn: Bench, is_async: bool, number: int) -> float:
+    """Среднее время вызова за number вызовов подряд"""
+    started = time.perf_counter()
+    if is_async:
+        for _ in range(number):
+            await fn()
+    else:
+        for _ in range(number):
+            fn()
+    return (time.perf_counter() - started) / number
+
+
+async def _calibrate_number(fn: Bench, is_async: bool) -> int:
+    """Сколько вызовов нужно, чтобы замер длился не меньше MIN_TIME"""
+    number = 1
+    while await _per_call(fn, is_async, number) * number < MIN_TIME:
+        number *= 2
+    return number
+
+
+async def _measure(fn: Bench, repeat: int) -> Tuple[float, float]:
+    """
+    (лучшее время вызова, лучшее время эталона)
+
+    Эталон меряется вперемешку с бенчмарком: если частота процессора
+    или соседи по машине меняются во время прогона, это задевает оба
+    замера одинаково и сокращается в отношении.
+    """
+    is_async = inspect.iscoroutinefunction(fn)
+    number = await _calibrate_number(fn, is_async)
+    reference = await _calibrate_number(_calibration, False)
+
+    best, best_reference = float("inf"), float("inf")
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            best_reference = min(best_reference, await _per_call(_calibration, False, reference))
+            best = min(best, await _per_call(fn, is_async, number))
+    finally:
+        gc.enable()
+    return best, best_reference
+
+
+def run(names: List[str], repeat: int) -> Dict[str, Tuple[float, float]]:
+    """Имя -> (время вызова, время эталона), секунды"""
+    async def measure_all() -> Dict[str, Tuple[float, float]]:
+        return {name: await _measure(BENCHMARKS[name](), repeat) for name in names}
+
+    return asyncio.run(measure_all())
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["benchmarks"]
+
+
+def save_baseline(ratios: Dict[str, float], path: str = BASELINE_PATH) -> None:
+    baseline = load_baseline(path)
+    baseline.update(ratios)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "note": "время вызова в долях эталонной нагрузки (benchmarks/suite.py: _calibration)",
+            "updated": datetime.now().strftime("%Y-%m-%d"),
+            "python": sys.version.split()[0],
+            "benchmarks": dict(sorted(baseline.items())),
+        }, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Микробенчмарки с порогом регрессии")
+    parser.add_argument("-k", dest="pattern", default="", help="только бенчмарки, в имени которых есть строка")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="допустимое замедление (0.25 = +25%%)")
+    parser.add_argument("--repeat", type=int, default=5, help="замеров на бенчмарк (берётся лучший)")
+    parser.add_argument("--retries", type=int, default=2, help="перепроверок вышедших за допуск (и доп. прогонов для --update)")
+    parser.add_argument("--update", action="store_true", help="записать результаты в baseline.json")
+    args = parser.parse_args()
+
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    results = run(names, args.repeat)
+    ratios = {name: seconds / reference for name, (seconds, reference) in results.items()}
+    baseline = load_baseline()
+
+    def slower(name: str) -> bool:
+        base = baseline.get(name)
+        return bool(base) and ratios[name] > base * (1 + args.tolerance)
+
+    # Одиночный выброс (соседний процесс, GC) — не регрессия: выход
+    # за допуск перемеряем и берём лучшее
+    for _ in range(args.retries):
+        suspects = [name for name in names if slower(name)]
+        if args.update or not suspects:
+            break
+        for name, (seconds, reference) in run(suspects, args.repeat).items():
+            if seconds / reference < ratios[name]:
+                ratios[name] = seconds / reference
+                results[name] = seconds, reference
+
+    if args.update:
+        # База — медиана нескольких прогонов, а не случайно удачный
+        rounds = [ratios] + [
+            {name: seconds / reference for name, (seconds, reference) in run(names, args.repeat).items()}
+            for _ in range(args.retries)
+        ]
+        save_baseline({name: statistics.median(r[name] for r in rounds) for name in names})
+        print(f"База обновлена: {len(ratios)} бенчмарков -> {BASELINE_PATH}")
+        return 0
+
+    print(f"Допуск +{args.tolerance:.0%}")
+    print(f"{'бенчмарк':<30}{'мкс':>10}{'доля':>9}{'база':>9}{'изм.':>8}")
+
+    regressions = []
+    for name in names:
+        ratio = ratios[name]
+        base = baseline.get(name)
+        change = f"{ratio / base - 1:+.0%}" if base else "нет"
+        mark = ""
+        if slower(name):
+            regressions.append(name)
+            mark = "  ❌"
+        base_text = f"{base:.3f}" if base else "—"
+        print(f"{name:<30}{results[name][0] * 1e6:>10.2f}{ratio:>9.3f}{base_text:>9}{change:>8}{mark}")
+
+    if regressions:
+        print(f"\nМедленнее базы: {', '.join(regressions)}")
+        return 1
+    print("\nРегрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
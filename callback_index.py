@@ -0,0 +1,104 @@
+"""
+Маршрутизация callback-кнопок через хэш-индекс
+
+Вместо цепочки фильтров F.data == ... / F.data.in_(...) / startswith,
+которые aiogram проверяет по очереди на каждое нажатие, callback_data
+разбирается один раз и обработчик находится одним поиском в словаре.
+
+Формат callback_data: "<версия>:<маршрут>:<аргумент>", например "1:a:q4_clear".
+Старые строки (кнопки, уже отправленные в чаты до смены формата,
+и id кнопок результата из config.py) принимаются как legacy-алиасы.
+"""
+
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+from aiogram.types import CallbackQuery
+
+CALLBACK_VERSION = "1"
+
+CallbackHandler = Callable[..., Awaitable[Any]]
+
+
+class CallbackIndex:
+    """Индекс маршрут -> обработчик"""
+
+    def __init__(self):
+        # маршрут -> (обработчик, имена принимаемых аргументов или None = все)
+        self._routes: Dict[str, Tuple[CallbackHandler, Optional[frozenset]]] = {}
+        # старая callback_data -> (маршрут, аргумент)
+        self._legacy: Dict[str, Tuple[str, str]] = {}
+
+    def route(self, name: str, legacy: Optional[Mapping[str, str]] = None):
+        """
+        Зарегистрировать обработчик маршрута
+
+        Args:
+            name: Короткое имя маршрута (входит в callback_data)
+            legacy: Старые callback_data -> аргумент для этого маршрута
+
+        Обработчик вызывается как handler(callback, arg, **нужные_данные_aiogram)
+        """
+        def decorator(handler: CallbackHandler) -> CallbackHandler:
+            if name in self._routes:
+                raise ValueError(f"Маршрут {name} уже зарегистрирован")
+
+            params = inspect.signature(handler).parameters
+            if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values()):
+                accepted = None
+            else:
+                accepted = frozenset(list(params)[2:])
+
+            self._routes[name] = (handler, accepted)
+            for data, arg in (legacy or {}).items():
+                self._legacy[data] = (name, arg)
+            return handler
+
+        return decorator
+
+    @staticmethod
+    def pack(name: str, arg: str = "") -> str:
+        """callback_data для кнопки"""
+        return f"{CALLBACK_VERSION}:{name}:{arg}"
+
+    def parse(self, data: Optional[str]) -> Optional[Tuple[str, str]]:
+        """callback_data -> (маршрут, аргумент) или None"""
+        if not data:
+            return None
+
+        legacy = self._legacy.get(data)
+        if legacy is not None:
+            return legacy
+
+        version, _, rest = data.partition(":")
+        if version != CALLBACK_VERSION:
+            return None
+        name, _, arg = rest.partition(":")
+        return name, arg
+
+    def route_name(self, data: Optional[str]) -> Optional[str]:
+        """Имя маршрута (для логов и метрик)"""
+        parsed = self.parse(data)
+        return parsed[0] if parsed else None
+
+    def handler_name(self, data: Optional[str]) -> Optional[str]:
+        """Имя функции-обработчика (для метрик и профилирования)"""
+        name = self.route_name(data)
+        entry = self._routes.get(name) if name else None
+        return entry[0].__name__ if entry else None
+
+    async def dispatch(self, callback: CallbackQuery, data: Dict[str, Any]) -> Any:
+        """Вызвать обработчик для callback; False — если маршрут неизвестен"""
+        parsed = self.parse(callback.data)
+        if parsed is None:
+            return False
+
+        name, arg = parsed
+        entry = self._routes.get(name)
+        if entry is None:
+            return False
+
+        handler, accepted = entry
+        if accepted is not None:
+            data = {key: value for key, value in data.items() if key in accepted}
+        return await handler(callback, arg, **data)
@@ -0,0 +1,261 @@
+"""
+Контент квиза, собранный заранее в один бинарный файл
+
+Сборка (python -m content_bundle) рендерит тексты и кнопки результатов
+из RESULT_SERIES_MAP для DEFAULT_TEMPLATE, тексты после результата
+и таблицу результатов на все комбинации ответов, сверяет всё
+с compute_result и пишет в content.bundle:
+
+    MAGIC | длина заголовка (u32) | заголовок | записи
+
+Заголовок — версия формата, хэш исходников, из которых собран контент,
+отпечаток настроек подсчёта (scoring._config_fingerprint) и оглавление
+{запись: (смещение, длина)}; заголовок и записи — marshal.
+При старте файл открывается через mmap и читается только заголовок,
+запись декодируется при первом обращении. Воркеры supervisor читают
+одни и те же страницы из page cache.
+
+Если исходники (config.py, questions.py, ...) поменялись после сборки,
+бандл не используется — бот считает всё при старте, как без него.
+"""
+
+import argparse
+import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import config
+import questions
+import quiz_graph
+import scoring
+from config import DEFAULT_TEMPLATE, TemplateVars
+from scoring import CompiledTemplate, RenderedResult, ResultTable, compile_template
+from tenants import Tenants
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"QZB1"
+FORMAT_VERSION = 2
+HEADER_SIZE = struct.Struct("<I")
+
+# Файлы, от которых зависит содержимое бандла
+SOURCES = (config.__file__, questions.__file__, quiz_graph.__file__, scoring.__file__, __file__)
+
+# Telegram не принимает callback_data длиннее 64 байт
+MAX_CALLBACK_BYTES = 64
+
+DEFAULT_PATH = "content.bundle"
+
+
+def source_hash() -> str:
+    """Хэш исходников контента, версии формата и marshal"""
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{marshal.version}:{sys.version_info[:2]}".encode())
+    for source in SOURCES:
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def template_entry(template_vars: TemplateVars) -> str:
+    """Имя записи с текстами эксперта"""
+    key = "\x1f".join(template_vars.__dict__.values())
+    return "template:" + hashlib.sha1(key.encode()).hexdigest()
+
+
+# ========================================
+# ЧТЕНИЕ
+# ========================================
+
+class ContentBundle:
+    """
+    Открытый бандл: заголовок прочитан, записи декодируются по запросу
+
+    Лучше открывать через load(): он не бросает исключений и проверяет хэш.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: не бандл контента")
+        start = len(MAGIC) + HEADER_SIZE.size
+        (header_len,) = HEADER_SIZE.unpack_from(self._mm, len(MAGIC))
+        header = marshal.loads(self._mm[start:start + header_len])
+
+        self.version: int = header["version"]
+        self.source_hash: str = header["source_hash"]
+        self.built_at: float = header["built_at"]
+        # ZONE_MAX, ZONE_PRIORITY и TWIST_THRESHOLD, под которые посчитана таблица
+        self.fingerprint: Optional[tuple] = header.get("fingerprint")
+        self._entries: Dict[str, Tuple[int, int]] = header["entries"]
+        self._base = start + header_len
+        self._decoded: Dict[str, Any] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str, cache: bool = True) -> Any:
+        """Запись по имени (KeyError, если её нет); cache=False — не держать декодированной"""
+        value = self._decoded.get(name)
+        if value is None:
+            offset, length = self._entries[name]
+            start = self._base + offset
+            value = marshal.loads(self._mm[start:start + length])
+            if cache:
+                self._decoded[name] = value
+        return value
+
+    def result_rows(self) -> Optional[tuple]:
+        """Записи таблицы результатов для ResultTable"""
+        return self.get("result_table") if "result_table" in self else None
+
+    def template(self, template_vars: TemplateVars) -> Optional[CompiledTemplate]:
+        """Скомпилированные тексты эксперта или None, если его нет в бандле"""
+        name = template_entry(template_vars)
+        if name not in self:
+            return None
+        # Готовые тексты держит LRU-кэш scoring.get_compiled_template — здесь не копим
+        data = self.get(name, cache=False)
+        return CompiledTemplate(
+            results={key: RenderedResult(text, buttons) for key, (text, buttons) in data["results"]},
+            consult_text=data["consult_text"],
+            consult_button=data["consult_button"],
+            self_text=data["self_text"],
+        )
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+def load(path: str) -> Optional[ContentBundle]:
+    """Бандл, если он есть и собран из текущих исходников; иначе None"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        bundle = ContentBundle(path)
+    except (OSError, ValueError, EOFError, KeyError, TypeError, struct.error) as e:
+        logger.warning(f"⚠️ Бандл контента {path} не читается, считаю контент при старте: {e}")
+        return None
+
+    if bundle.version != FORMAT_VERSION or bundle.source_hash != source_hash():
+        logger.warning(f"⚠️ Бандл контента {path} устарел (python -m content_bundle), считаю контент при старте")
+        bundle.close()
+        return None
+    return bundle
+
+
+# ========================================
+# СБОРКА
+# ========================================
+
+def _template_data(compiled: CompiledTemplate) -> Dict[str, Any]:
+    return {
+        "results": tuple((key, (r.text, r.buttons)) for key, r in compiled.results.items()),
+        "consult_text": compiled.consult_text,
+        "consult_button": compiled.consult_button,
+        "self_text": compiled.self_text,
+    }
+
+
+def _validate(compiled: CompiledTemplate) -> None:
+    """Проверки, которые иначе всплыли бы только на отправке в Telegram"""
+    for key, rendered in compiled.results.items():
+        if not rendered.text or rendered.text.startswith("⚠️"):
+            raise ValueError(f"Нет текста результата для {key}")
+        for text, callback_data in rendered.buttons:
+            if len(callback_data.encode()) > MAX_CALLBACK_BYTES:
+                raise ValueError(f"callback_data длиннее {MAX_CALLBACK_BYTES} байт: {callback_data}")
+        # Клавиатура собирается aiogram-моделями — ошибки в кнопках видны сейчас
+        rendered.keyboard
+    compiled.consult_keyboard
+
+
+def build(path: str = DEFAULT_PATH, *template_vars: TemplateVars) -> Dict[str, int]:
+    """
+    Собрать бандл (атомарно: через временный файл)
+
+    Returns:
+        {запись: размер в байтах}
+    """
+    table = ResultTable(quiz_graph.QUIZ_GRAPH)
+    table.verify()
+    entries: Dict[str, bytes] = {"result_table": marshal.dumps(table.rows())}
+
+    for vars in template_vars or (DEFAULT_TEMPLATE,):
+        compiled = compile_template(vars)
+        _validate(compiled)
+        entries[template_entry(vars)] = marshal.dumps(_template_data(compiled))
+
+    index: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for name, blob in entries.items():
+        index[name] = (offset, len(blob))
+        offset += len(blob)
+    header = marshal.dumps({
+        "version": FORMAT_VERSION,
+        "source_hash": source_hash(),
+        "built_at": time.time(),
+        "fingerprint": table.fingerprint,
+        "entries": index,
+    })
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(HEADER_SIZE.pack(len(header)))
+        f.write(header)
+        for blob in entries.values():
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    # Прочитать обратно то, что записали, и сравнить с посчитанным
+    bundle = ContentBundle(path)
+    try:
+        if ResultTable(quiz_graph.QUIZ_GRAPH, bundle.result_rows()).results != table.results:
+            raise ValueError("Таблица результатов в бандле не совпадает с посчитанной")
+        for vars in template_vars or (DEFAULT_TEMPLATE,):
+            if bundle.template(vars) != compile_template(vars):
+                raise ValueError(f"Тексты {vars.expert_username} в бандле не совпадают с посчитанными")
+    finally:
+        bundle.close()
+
+    return {name: len(blob) for name, blob in entries.items()}
+
+
+def ensure(path: str = DEFAULT_PATH) -> bool:
+    """Пересобрать бандл, если его нет или он устарел; True — если собирали"""
+    bundle = load(path)
+    if bundle is not None:
+        bundle.close()
+        return False
+    build(path)
+    return True
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Собрать бандл контента квиза")
+    parser.add_argument("path", nargs="?", default=os.getenv('CONTENT_BUNDLE', DEFAULT_PATH))
+    parser.add_argument("--tenants", default=os.getenv('TENANTS_PATH', ''), help="добавить тексты экспертов из файла")
+    args = parser.parse_args()
+    path = args.path
+
+    templates = [DEFAULT_TEMPLATE]
+    if args.tenants:
+        templates += [tenant.template for tenant in Tenants.load(args.tenants)]
+    # Одинаковые наборы переменных — одна запись
+    templates = list({template_entry(vars): vars for vars in templates}.values())
+
+    started = time.perf_counter()
+    sizes = build(path, *templates)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"📦 {path}: {sum(sizes.values())} байт, записей {len(sizes)}, собран за {elapsed:.0f} мс")
+    for name, size in sizes.items():
+        print(f"  {name}: {size} байт")
@@ -0,0 +1,425 @@
+"""
+Журнал событий квиза: записи фиксированной длины в append-only сегментах
+
+Каждое событие — 20 байт (struct "<dqHH"): время, user_id, код события
+и аргумент (состояние, вариант ответа, результат или выбор после него).
+Хендлер только дописывает байты в буфер в памяти; фоновый таск раз
+в flush_interval отдаёт накопленное потоку записи. Когда сегмент
+дорастает до segment_bytes, начинается следующий файл.
+
+Коды зависят от графа квиза, поэтому сегменты помечены id схемы:
+events-<id>-000001.log, а рядом schema-<id>.json — что означают коды.
+Если граф изменился, журнал начинает новый набор сегментов с новым id;
+старые остаются и читаются по своей схеме. (Журналы, записанные до
+появления id, — schema.json и events-000001.log — читаются так же.)
+
+Офлайн-анализ читает сегменты через mmap кусками, не загружая журнал
+в память, длительности копит в гистограмме фиксированного размера:
+
+    python -m database.event_log events
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config import ZONE_PRIORITY
+from handlers.states import QuizStates
+from questions import Option, Question
+from quiz_graph import QUIZ_GRAPH
+from session_codec import BITS_PER_QUESTION
+
+logger = logging.getLogger(__name__)
+
+# время (unix), user_id, код события, аргумент
+RECORD = struct.Struct("<dqHH")
+
+# Коды событий
+EVENT_START = 1         # /start, аргумент 0
+EVENT_STATE = 2         # переход, аргумент — номер состояния в STATES + 1 (0 — состояние сброшено)
+EVENT_ANSWER = 3        # ответ, аргумент — номер вопроса << BITS_PER_QUESTION | номер варианта + 1
+EVENT_RESULT = 4        # результат, аргумент — зона + 1 | (perceived + 1) << 4 | twist << 8
+EVENT_LEAD = 5          # кнопка после результата, аргумент — номер в LEADS + 1
+
+STATES: Tuple[str, ...] = tuple(state.state.rpartition(":")[2] for state in QuizStates.__all_states__)
+LEADS: Tuple[str, ...] = ("consult", "self")
+
+_STATE_CODES = {name: index + 1 for index, name in enumerate(STATES)}
+_QUESTION_INDEX = {question.id: index for index, question in enumerate(QUIZ_GRAPH)}
+_ZONE_CODES = {zone: index + 1 for index, zone in enumerate(ZONE_PRIORITY)}
+_LEAD_CODES = {choice: index + 1 for index, choice in enumerate(LEADS)}
+
+SCHEMA_PREFIX = "schema-"
+SCHEMA_SUFFIX = ".json"
+# Схема журналов без id (сегменты events-000001.log)
+LEGACY_SCHEMA_FILE = "schema.json"
+SEGMENT_PREFIX = "events-"
+SEGMENT_SUFFIX = ".log"
+
+
+def current_schema() -> Dict[str, Any]:
+    """Расшифровка кодов для текущего графа квиза"""
+    return {
+        "record": RECORD.format,
+        "states": list(STATES),
+        "questions": [[question.id, [option.id for option in question.options]] for question in QUIZ_GRAPH],
+        "zones": list(ZONE_PRIORITY),
+        "leads": list(LEADS),
+        "option_bits": BITS_PER_QUESTION,
+    }
+
+
+def schema_id(schema: Dict[str, Any]) -> str:
+    """Короткий id схемы: хэш её канонического JSON"""
+    canonical = json.dumps(schema, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:8]
+
+
+def _schema_path(directory: str, id: str) -> str:
+    if not id:
+        return os.path.join(directory, LEGACY_SCHEMA_FILE)
+    return os.path.join(directory, f"{SCHEMA_PREFIX}{id}{SCHEMA_SUFFIX}")
+
+
+def _segment_path(directory: str, id: str, number: int) -> str:
+    tag = f"{id}-" if id else ""
+    return os.path.join(directory, f"{SEGMENT_PREFIX}{tag}{number:06d}{SEGMENT_SUFFIX}")
+
+
+def _parse_segment(name: str) -> Optional[Tuple[str, int]]:
+    """(id схемы, номер) по имени сегмента; id "" — журнал без id"""
+    if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+        return None
+    id, _, number = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].rpartition("-")
+    return (id, int(number)) if number.isdigit() else None
+
+
+def load_schema(directory: str, id: str = "") -> Dict[str, Any]:
+    with open(_schema_path(directory, id), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def schema_ids(directory: str) -> List[str]:
+    """Id наборов сегментов в порядке появления (журнал без id — первым)"""
+    if not os.path.isdir(directory):
+        return []
+    created = {}
+    for name in os.listdir(directory):
+        if name == LEGACY_SCHEMA_FILE:
+            created[""] = 0.0
+        elif name.startswith(SCHEMA_PREFIX) and name.endswith(SCHEMA_SUFFIX):
+            id = name[len(SCHEMA_PREFIX):-len(SCHEMA_SUFFIX)]
+            created[id] = load_schema(directory, id).get("created", 0.0)
+    return sorted(created, key=lambda id: (created[id], id))
+
+
+def segment_paths(directory: str, id: Optional[str] = None) -> List[str]:
+    """Сегменты схемы id по порядку; id=None — все наборы, от старых к новым"""
+    if not os.path.isdir(directory):
+        return []
+    ids = schema_ids(directory) if id is None else [id]
+    segments = [parsed + (name,) for name in os.listdir(directory) if (parsed := _parse_segment(name))]
+    return [
+        os.path.join(directory, name)
+        for current in ids
+        for _, _, name in sorted(segment for segment in segments if segment[0] == current)
+    ]
+
+
+# ========================================
+# ЗАПИСЬ
+# ========================================
+
+class EventLog:
+    """
+    Буферизованная запись событий
+
+    Args:
+        directory: каталог сегментов
+        segment_bytes: размер сегмента (округляется до целого числа записей)
+        flush_interval: раз во сколько секунд сбрасывать буфер на диск
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, flush_interval: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = max(1, segment_bytes // RECORD.size) * RECORD.size
+        self.flush_interval = flush_interval
+        self.events = 0
+
+        self._buffer = bytearray()
+        self._file = None
+        self._segment = 0
+        self._segment_size = 0
+        self._task: Optional[asyncio.Task] = None
+        # Один поток — куски пишутся строго по порядку
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-log")
+
+        os.makedirs(directory, exist_ok=True)
+        self.schema_id = self._use_schema()
+        self._open_last_segment()
+
+    def _use_schema(self) -> str:
+        """Id набора сегментов для текущего графа (новый, если граф изменился)"""
+        schema = current_schema()
+        id = schema_id(schema)
+        path = _schema_path(self.directory, id)
+        if not os.path.exists(path):
+            previous = schema_ids(self.directory)
+            latest = load_schema(self.directory, previous[-1]) if previous else None
+            if latest is not None:
+                latest.pop("created", None)
+            if latest is not None and latest != schema:
+                logger.info(
+                    f"🧾 Граф квиза изменился: журнал {self.directory} продолжается с новой схемой {id}, "
+                    f"прежние сегменты читаются по своей"
+                )
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({**schema, "created": time.time()}, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, path)
+        return id
+
+    def _open_last_segment(self) -> None:
+        paths = segment_paths(self.directory, self.schema_id)
+        if paths:
+            path = paths[-1]
+            self._segment = _parse_segment(os.path.basename(path))[1]
+        else:
+            self._segment = 1
+            path = _segment_path(self.directory, self.schema_id, self._segment)
+
+        self._file = open(path, "ab")
+        size = self._file.tell()
+        if size % RECORD.size:
+            # Обрыв посреди записи (процесс убили): отрезаем неполный хвост
+            size -= size % RECORD.size
+            self._file.truncate(size)
+            logger.warning(f"⚠️ Журнал событий: обрезан неполный хвост {path}")
+        self._segment_size = size
+
+    # ---------- события (горячий путь: только байты в буфер) ----------
+
+    def append(self, user_id: int, event: int, arg: int = 0) -> None:
+        self._buffer += RECORD.pack(time.time(), user_id, event, arg)
+        self.events += 1
+
+    def on_start(self, user_id: int) -> None:
+        self.append(user_id, EVENT_START)
+
+    def on_transition(self, user_id: int, previous: Optional[str], state: Optional[str]) -> None:
+        """Слушатель StateTransactionMiddleware"""
+        code = _STATE_CODES.get(state.rpartition(":")[2], 0) if state else 0
+        self.append(user_id, EVENT_STATE, code)
+
+    def on_answer(self, user_id: int, question: Question, option: Option) -> None:
+        code = question.options.index(option) + 1
+        self.append(user_id, EVENT_ANSWER, _QUESTION_INDEX[question.id] << BITS_PER_QUESTION | code)
+
+    def on_result(self, user_id: int, result: Any) -> None:
+        """Результат диагностики (DiagnosticResult)"""
+        arg = _ZONE_CODES[result.bottleneck] | _ZONE_CODES.get(result.perceived, 0) << 4 | result.twist << 8
+        self.append(user_id, EVENT_RESULT, arg)
+
+    def on_lead(self, user_id: int, choice: str) -> None:
+        self.append(user_id, EVENT_LEAD, _LEAD_CODES[choice])
+
+    # ---------- фоновая запись ----------
+
+    def _write(self, chunk: bytes) -> None:
+        """Дописать кусок (в потоке записи), переходя в новый сегмент по размеру"""
+        view = memoryview(chunk)
+        while view:
+            room = self.segment_bytes - self._segment_size
+            if room <= 0:
+                self._file.close()
+                self._segment += 1
+                self._file = open(_segment_path(self.directory, self.schema_id, self._segment), "ab")
+                self._segment_size = 0
+                continue
+            part = view[:room]
+            self._file.write(part)
+            self._segment_size += len(part)
+            view = view[room:]
+        self._file.flush()
+
+    async def flush(self) -> None:
+        """Отдать накопленный буфер потоку записи"""
+        if not self._buffer:
+            return
+        chunk, self._buffer = bytes(self._buffer), bytearray()
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._write, chunk)
+        except OSError as e:
+            logger.error(f"❌ Не удалось записать {len(chunk) // RECORD.size} событий: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---------- жизненный цикл (startup/shutdown диспетчера) ----------
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+            logger.info(f"🧾 Журнал событий: {self.directory}")
+
+    async def stop(self) -> None:
+        """Дописать буфер и закрыть сегмент"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ========================================
+# ЧТЕНИЕ И АНАЛИЗ (офлайн)
+# ========================================
+
+# Сколько байт сегмента разбирать за раз (целое число записей)
+READ_CHUNK = RECORD.size * 65536
+
+
+def iter_records(directory: str, id: Optional[str] = None) -> Iterator[Tuple[float, int, int, int]]:
+    """Записи схемы id (None — все) по порядку: (время, user_id, событие, аргумент)"""
+    for path in segment_paths(directory, id):
+        size = os.path.getsize(path)
+        size -= size % RECORD.size
+        if not size:
+            continue
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in range(0, size, READ_CHUNK):
+                yield from RECORD.iter_unpack(mm[offset:min(offset + READ_CHUNK, size)])
+
+
+class DurationHistogram:
+    """
+    Длительности в логарифмических корзинах: квантиль с точностью ~2.5%,
+    память — несколько сотен счётчиков при любом числе событий
+    """
+
+    GROWTH = 1.05
+    MIN_SECONDS = 0.001
+
+    def __init__(self):
+        self.buckets: Counter = Counter()
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self.buckets[math.floor(math.log(max(seconds, self.MIN_SECONDS)) / math.log(self.GROWTH))] += 1
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Квантиль q (0..1): середина корзины, в которую он попал"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return self.GROWTH ** (bucket + 0.5)
+        return self.GROWTH ** (max(self.buckets) + 0.5)
+
+
+def option_popularity(directory: str) -> Dict[str, Counter]:
+    """Вопрос -> Counter(id варианта -> сколько раз выбран), по всем схемам журнала"""
+    popularity: Dict[str, Counter] = {}
+    for id in schema_ids(directory):
+        schema = load_schema(directory, id)
+        questions = schema["questions"]
+        bits = schema["option_bits"]
+        mask = (1 << bits) - 1
+
+        codes: Counter = Counter(arg for _, _, event, arg in iter_records(directory, id) if event == EVENT_ANSWER)
+
+        for question_id, _ in questions:
+            popularity.setdefault(question_id, Counter())
+        for arg, count in codes.items():
+            question_id, option_ids = questions[arg >> bits]
+            popularity[question_id][option_ids[(arg & mask) - 1]] += count
+    return popularity
+
+
+def funnel_timing(directory: str) -> List[Tuple[str, int, Optional[float]]]:
+    """
+    Шаги воронки: (шаг, переходов, медиана секунд от предыдущего события пользователя)
+
+    В памяти — только последнее событие каждого пользователя и гистограммы
+    длительностей. Шаги — по состояниям всех схем журнала.
+    """
+    steps: Dict[str, None] = {"start": None}
+    last: Dict[int, float] = {}
+    reached: Counter = Counter()
+    durations: Dict[str, DurationHistogram] = {}
+
+    for id in schema_ids(directory):
+        states = ["start", *load_schema(directory, id)["states"]]
+        steps.update(dict.fromkeys(states))
+
+        for timestamp, user_id, event, arg in iter_records(directory, id):
+            if event == EVENT_START:
+                step = "start"
+            elif event == EVENT_STATE and arg:
+                step = states[arg]
+            else:
+                continue
+
+            reached[step] += 1
+            previous = last.get(user_id)
+            if previous is not None and step != "start":
+                histogram = durations.get(step)
+                if histogram is None:
+                    histogram = durations[step] = DurationHistogram()
+                histogram.add(timestamp - previous)
+            last[user_id] = timestamp
+
+    return [
+        (step, reached[step], durations[step].quantile(0.5) if step in durations else None)
+        for step in steps
+    ]
+
+
+def report(directories: Sequence[str]) -> str:
+    """Текстовый отчёт по одному или нескольким каталогам (по одному на воркер)"""
+    lines = []
+    for directory in directories:
+        records = sum(os.path.getsize(path) // RECORD.size for path in segment_paths(directory))
+        lines += [f"== {directory}: событий {records}", "", "Воронка (переходов, медиана от прошлого шага):"]
+        for step, reached, median in funnel_timing(directory):
+            timing = f", {median:.1f} с" if median is not None else ""
+            lines.append(f"  {step}: {reached}{timing}")
+
+        lines += ["", "Популярность вариантов:"]
+        for question_id, counts in option_popularity(directory).items():
+            total = sum(counts.values())
+            if not total:
+                continue
+            top = ", ".join(f"{option_id} {count / total:.0%}" for option_id, count in counts.most_common())
+            lines.append(f"  {question_id} ({total}): {top}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Анализ журнала событий квиза")
+    parser.add_argument("directories", nargs="+", help="каталоги EVENTS_DIR")
+    print(report(parser.parse_args().directories))
@@ -0,0 +1,209 @@
+"""
+Потоковая выгрузка заявок и прохождений в CSV или Parquet
+
+Строки читаются из SQLite пачками (fetchmany) через генератор и сразу
+пишутся во временный файл, поэтому память не зависит от размера таблицы.
+Фильтры по дате и зоне уходят в WHERE и используют индексы по времени.
+Parquet требует pyarrow (requirements-analytics.txt).
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from config import ZONE_MAX
+from quiz_graph import QUIZ_GRAPH
+from session_codec import QuizSession
+
+CHUNK_SIZE = 5000
+
+FORMATS = ("csv", "parquet")
+
+# Таблица -> (колонки SELECT, колонка времени)
+TABLES = {
+    "leads": (
+        ("id", "user_id", "username", "name", "bottleneck", "choice", "created_at"),
+        "created_at",
+    ),
+    "completions": (
+        ("id", "user_id", "username", "name", "niche", "answers", "bottleneck", "perceived", "twist",
+         *ZONE_MAX, "completed_at"),
+        "completed_at",
+    ),
+}
+
+# Тексты ответов декодируются из answers только при выгрузке прохождений
+ANSWER_COLUMNS = tuple(question.answer_key for question in QUIZ_GRAPH if question.answer_key)
+
+
+@dataclass(frozen=True)
+class ExportRequest:
+    """Что выгружать: /export [csv|parquet] [leads|completions] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [zone=...]"""
+    format: str = "csv"
+    table: str = "leads"
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None      # включительно
+    zone: Optional[str] = None
+
+    @classmethod
+    def parse(cls, args: Optional[str]) -> "ExportRequest":
+        """
+        Разобрать аргументы команды
+
+        Raises:
+            ValueError: неизвестный аргумент, формат даты или зона
+        """
+        fields = {}
+        for token in (args or "").split():
+            key, _, value = token.partition("=")
+            if not value:
+                if key in FORMATS:
+                    fields["format"] = key
+                elif key in TABLES:
+                    fields["table"] = key
+                else:
+                    raise ValueError(f"Непонятный аргумент: {token}")
+            elif key == "from":
+                fields["date_from"] = date.fromisoformat(value)
+            elif key == "to":
+                fields["date_to"] = date.fromisoformat(value)
+            elif key == "zone":
+                if value not in ZONE_MAX:
+                    raise ValueError(f"Нет такой зоны: {value} (есть: {', '.join(ZONE_MAX)})")
+                fields["zone"] = value
+            else:
+                raise ValueError(f"Непонятный аргумент: {token}")
+        return cls(**fields)
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        """Колонки файла"""
+        columns = TABLES[self.table][0]
+        if self.table == "completions":
+            columns += ANSWER_COLUMNS
+        return columns
+
+    def query(self) -> Tuple[str, List]:
+        """SELECT с фильтрами в WHERE"""
+        columns, time_column = TABLES[self.table]
+        where = []
+        params: List = []
+
+        if self.date_from:
+            where.append(f"{time_column} >= ?")
+            params.append(datetime.combine(self.date_from, datetime.min.time()).timestamp())
+        if self.date_to:
+            where.append(f"{time_column} < ?")
+            params.append(datetime.combine(self.date_to + timedelta(days=1), datetime.min.time()).timestamp())
+        if self.zone:
+            where.append("bottleneck = ?")
+            params.append(self.zone)
+
+        sql = f"SELECT {', '.join(columns)} FROM {self.table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return sql + " ORDER BY id", params
+
+
+def iter_chunks(db_path: str, request: ExportRequest, chunk_size: int = CHUNK_SIZE) -> Iterator[List[tuple]]:
+    """Строки выгрузки пачками по chunk_size"""
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        sql, params = request.query()
+        cursor = connection.execute(sql, params)
+        decode = request.table == "completions"
+        answers_index = TABLES["completions"][0].index("answers")
+
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if decode:
+                rows = [row + _answer_labels(row[answers_index]) for row in rows]
+            yield rows
+    finally:
+        connection.close()
+
+
+@lru_cache(maxsize=65536)
+def _answer_labels(answers: int) -> tuple:
+    """Тексты ответов; комбинаций ответов немного, поэтому кэшируются"""
+    labels = QuizSession(answers=answers).labels()
+    return tuple(labels.get(column) for column in ANSWER_COLUMNS)
+
+
+def write_csv(chunks: Iterator[List[tuple]], columns: Sequence[str], path: str) -> int:
+    """CSV (UTF-8 с BOM — чтобы Excel понял кириллицу); возвращает число строк"""
+    rows = 0
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+# Типы колонок для Parquet (остальные — строки)
+INTEGER_COLUMNS = frozenset(("id", "user_id", "answers", "twist", *ZONE_MAX))
+REAL_COLUMNS = frozenset(("created_at", "completed_at"))
+
+
+def _parquet_schema(columns: Sequence[str]):
+    import pyarrow as pa
+
+    def column_type(column: str):
+        if column in INTEGER_COLUMNS:
+            return pa.int64()
+        if column in REAL_COLUMNS:
+            return pa.float64()
+        return pa.string()
+
+    return pa.schema([(column, column_type(column)) for column in columns])
+
+
+def write_parquet(chunks: Iterator[List[tuple]], columns: Sequence[str], path: str) -> int:
+    """Parquet: каждая пачка — отдельная row group; возвращает число строк"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для Parquet нужен pyarrow: pip install -r requirements-analytics.txt")
+
+    schema = _parquet_schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            arrays = [
+                pa.array(values, type=field.type)
+                for values, field in zip(zip(*chunk), schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+
+    return rows
+
+
+def export_to_file(db_path: str, request: ExportRequest, directory: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Выгрузить во временный файл (синхронно — запускать в executor)
+
+    Returns:
+        (путь к файлу, число строк); файл удаляет вызывающий
+    """
+    fd, path = tempfile.mkstemp(suffix=f".{request.format}", dir=directory)
+    os.close(fd)
+
+    writer = write_parquet if request.format == "parquet" else write_csv
+    try:
+        rows = writer(iter_chunks(db_path, request), request.columns, path)
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    return path, rows
@@ -0,0 +1,240 @@
+"""
+Запись завершённых квизов и заявок в SQLite без ожидания диска в хендлере
+
+Хендлер кладёт запись в очередь (queue.SimpleQueue — без await и без
+блокировок) и идёт дальше. Фоновый поток забирает записи пачками
+и пишет их одной транзакцией через executemany: SQL-строки постоянные,
+поэтому sqlite3 готовит каждый запрос один раз и берёт его из кэша.
+База в режиме WAL — чтение (экспорт, статистика) не мешает записи.
+
+При остановке бота очередь дописывается до конца (stop()).
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    name TEXT,
+    niche TEXT,
+    answers INTEGER NOT NULL,       -- упакованные коды вариантов (session_codec.py)
+    bottleneck TEXT NOT NULL,
+    perceived TEXT,
+    twist INTEGER NOT NULL,
+    product INTEGER NOT NULL,
+    traffic INTEGER NOT NULL,
+    content INTEGER NOT NULL,
+    sales INTEGER NOT NULL,
+    system INTEGER NOT NULL,
+    completed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_completed_at ON completions (completed_at);
+
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    username TEXT,
+    name TEXT,
+    bottleneck TEXT,
+    choice TEXT NOT NULL,           -- consult | self
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leads_created_at ON leads (created_at);
+"""
+
+
+class Completion(NamedTuple):
+    """Строка таблицы completions"""
+    user_id: int
+    username: Optional[str]
+    name: Optional[str]
+    niche: Optional[str]
+    answers: int
+    bottleneck: str
+    perceived: Optional[str]
+    twist: bool
+    product: int
+    traffic: int
+    content: int
+    sales: int
+    system: int
+    completed_at: float
+
+    @classmethod
+    def from_result(cls, user_id: int, username: Optional[str], session, result) -> "Completion":
+        """Строка из QuizSession и DiagnosticResult"""
+        scores = result.raw_scores
+        return cls(
+            user_id, username, session.name, session.niche, session.answers,
+            result.bottleneck, result.perceived, result.twist,
+            scores["product"], scores["traffic"], scores["content"], scores["sales"], scores["system"],
+            time.time(),
+        )
+
+
+class Lead(NamedTuple):
+    """Строка таблицы leads"""
+    user_id: int
+    username: Optional[str]
+    name: Optional[str]
+    bottleneck: Optional[str]
+    choice: str
+    created_at: float
+
+
+INSERT_COMPLETION = (
+    f"INSERT INTO completions ({', '.join(Completion._fields)}) "
+    f"VALUES ({', '.join('?' * len(Completion._fields))})"
+)
+INSERT_LEAD = (
+    f"INSERT INTO leads ({', '.join(Lead._fields)}) "
+    f"VALUES ({', '.join('?' * len(Lead._fields))})"
+)
+
+_STOP = object()
+
+
+@dataclass
+class RecorderStats:
+    """Счётчики записи"""
+    queued: int = 0
+    written: int = 0
+    batches: int = 0
+    errors: int = 0
+    max_batch: int = 0
+
+    @property
+    def backlog(self) -> int:
+        return self.queued - self.written - self.errors
+
+    def __str__(self) -> str:
+        return (
+            f"записано: {self.written}, пачек: {self.batches} (макс. {self.max_batch}), "
+            f"в очереди: {self.backlog}, ошибок: {self.errors}"
+        )
+
+
+class QuizRecorder:
+    """
+    Write-behind запись в SQLite
+
+    Args:
+        path: файл базы
+        batch_size: максимум записей в одной транзакции
+        flush_interval: сколько секунд копить пачку, если записей мало
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, flush_interval: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = RecorderStats()
+
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+
+        # Схема создаётся сразу: ошибка в пути видна при старте, а не в потоке
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        connection.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # ---------- API для хендлеров ----------
+
+    def record_completion(self, completion: Completion) -> None:
+        """Поставить завершённый квиз в очередь записи"""
+        self.stats.queued += 1
+        self._queue.put(completion)
+
+    def record_lead(self, lead: Lead) -> None:
+        """Поставить заявку в очередь записи"""
+        self.stats.queued += 1
+        self._queue.put(lead)
+
+    # ---------- жизненный цикл ----------
+
+    async def start(self) -> None:
+        """Запустить поток записи (dp.startup)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="quiz-recorder", daemon=True)
+            self._thread.start()
+            logger.info(f"🗃 Запись в SQLite: {self.path}")
+
+    async def stop(self) -> None:
+        """Дописать очередь и остановить поток (dp.shutdown)"""
+        if self._thread is None:
+            return
+
+        self._queue.put(_STOP)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self._thread = None
+        logger.info(f"🗃 SQLite: {self.stats}")
+
+    # ---------- фоновый поток ----------
+
+    def _run(self) -> None:
+        connection = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                batch, stopping = self._collect()
+                if batch:
+                    self._write(connection, batch)
+        finally:
+            connection.close()
+
+    def _collect(self):
+        """Пачка записей: ждём первую, затем добираем до batch_size или flush_interval"""
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Всё, что положили до остановки, уже в очереди перед _STOP
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _write(self, connection: sqlite3.Connection, batch: List[tuple]) -> None:
+        completions = [item for item in batch if isinstance(item, Completion)]
+        leads = [item for item in batch if isinstance(item, Lead)]
+
+        try:
+            with connection:
+                if completions:
+                    connection.executemany(INSERT_COMPLETION, completions)
+                if leads:
+                    connection.executemany(INSERT_LEAD, leads)
+        except sqlite3.Error as e:
+            self.stats.errors += len(batch)
+            logger.error(f"❌ Не удалось записать {len(batch)} записей в SQLite: {e}")
+            return
+
+        self.stats.written += len(batch)
+        self.stats.batches += 1
+        self.stats.max_batch = max(self.stats.max_batch, len(batch))
@@ -0,0 +1,244 @@
+"""
+Отложенная отправка сообщений без asyncio.sleep в хендлере
+
+Хендлер ставит доставку в очередь и сразу завершается. Один фоновый
+таск держит кучу таймеров (heapq) и будит себя к ближайшему сроку —
+десятки тысяч ожидающих доставок стоят по одной записи в куче.
+Очередь журналируется в локальный файл (каждая запись — с fsync) и
+переживает перезапуск и падение машины: запись удаляется из журнала
+только после доставки. Строка, оборванная падением посреди записи,
+пропускается при загрузке. Неудачная доставка
+повторяется через RETRY_DELAY (до MAX_ATTEMPTS попыток), а не начатые
+или не успевшие к остановке — уходят после следующего старта.
+
+Если в процессе несколько ботов (tenants.py), доставка уходит тем ботом,
+которым её поставили (bot_id в записи).
+
+Виды доставок регистрируются декоратором:
+    @delivery("result")
+    async def deliver_result(bot: Bot, chat_id: int, payload: dict): ...
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+logger = logging.getLogger(__name__)
+
+# Повтор неудавшейся доставки: пауза (секунды) и предел попыток
+RETRY_DELAY = 30.0
+MAX_ATTEMPTS = 5
+
+# Повтор не поможет: бот заблокирован или запрос некорректен
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+DeliveryCallback = Callable[[Bot, int, Dict[str, Any]], Awaitable[Any]]
+
+# kind -> функция доставки
+DELIVERIES: Dict[str, DeliveryCallback] = {}
+
+
+def delivery(kind: str) -> Callable[[DeliveryCallback], DeliveryCallback]:
+    """Зарегистрировать функцию доставки для вида kind"""
+    def decorator(callback: DeliveryCallback) -> DeliveryCallback:
+        DELIVERIES[kind] = callback
+        return callback
+    return decorator
+
+
+class DelayedScheduler:
+    """
+    Очередь отложенных доставок с журналом на диске
+
+    Журнал — JSON-строки {"op": "add", ...} / {"op": "done", "id": ...};
+    при старте незавершённые доставки поднимаются, просроченные уходят сразу.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # (due — unix time, id)
+        self._heap: List[Tuple[float, int]] = []
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._done_since_compact = 0
+
+        self._journal = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: set = set()
+        self._bot: Optional[Bot] = None
+        self._bots: Dict[int, Bot] = {}
+
+        if path:
+            self._load(path)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # ---------- журнал ----------
+
+    def _load(self, path: str) -> None:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"⚠️ {path}: повреждённая строка {number} пропущена")
+                        continue
+                    if record["op"] == "add":
+                        self._pending[record["id"]] = record
+                    else:
+                        self._pending.pop(record["id"], None)
+
+        for record in self._pending.values():
+            heapq.heappush(self._heap, (record["due"], record["id"]))
+        self._ids = itertools.count(max(self._pending, default=0) + 1)
+
+        # Переписываем журнал только с ожидающими доставками
+        self._compact()
+        if self._pending:
+            logger.info(f"⏰ Восстановлено отложенных доставок: {len(self._pending)}")
+
+    def _compact(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._pending.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._journal = open(self.path, "a", encoding="utf-8")
+        self._done_since_compact = 0
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._journal is not None:
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    # ---------- планирование ----------
+
+    def schedule(
+        self,
+        delay: float,
+        kind: str,
+        chat_id: int,
+        payload: Optional[Dict[str, Any]] = None,
+        bot_id: Optional[int] = None,
+    ) -> int:
+        """Доставить kind в chat_id через delay секунд (ботом bot_id, если ботов несколько)"""
+        if kind not in DELIVERIES:
+            raise ValueError(f"Неизвестный вид доставки: {kind}")
+
+        record = {
+            "op": "add",
+            "id": next(self._ids),
+            "due": time.time() + delay,
+            "kind": kind,
+            "chat_id": chat_id,
+            "payload": payload or {},
+        }
+        if bot_id is not None:
+            record["bot_id"] = bot_id
+        self._enqueue(record)
+        return record["id"]
+
+    def _enqueue(self, record: Dict[str, Any]) -> None:
+        # Повторная запись с тем же id заменяет прежнюю (и в журнале)
+        self._pending[record["id"]] = record
+        self._write(record)
+
+        heapq.heappush(self._heap, (record["due"], record["id"]))
+        if self._heap[0][1] == record["id"]:
+            # Новая доставка раньше всех — будим таймер
+            self._wakeup.set()
+
+    def _finish(self, delivery_id: int) -> None:
+        self._pending.pop(delivery_id, None)
+        self._write({"op": "done", "id": delivery_id})
+        self._done_since_compact += 1
+        if self._journal is not None and self._done_since_compact > 1000 + len(self._pending):
+            self._compact()
+
+    async def _deliver(self, record: Dict[str, Any]) -> None:
+        # Отмена (stop) сюда не попадает: запись остаётся в журнале до следующего старта
+        try:
+            bot = self._bots.get(record.get("bot_id"), self._bot)
+            await DELIVERIES[record["kind"]](bot, record["chat_id"], record["payload"])
+        except PERMANENT_ERRORS as e:
+            logger.warning(f"⚠️ {record['kind']} в чат {record['chat_id']} не доставить: {e}")
+        except Exception:
+            attempt = record.get("attempt", 1)
+            if attempt < MAX_ATTEMPTS:
+                logger.exception(
+                    f"Не удалось доставить {record['kind']} в чат {record['chat_id']} "
+                    f"(попытка {attempt}), повтор через {RETRY_DELAY:.0f} с"
+                )
+                self._enqueue({**record, "due": time.time() + RETRY_DELAY, "attempt": attempt + 1})
+                return
+            logger.exception(f"Не удалось доставить {record['kind']} в чат {record['chat_id']} за {attempt} попыток")
+        self._finish(record["id"])
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, delivery_id = self._heap[0]
+            delay = due - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            record = self._pending.get(delivery_id)
+            if record is not None:
+                task = asyncio.create_task(self._deliver(record))
+                self._deliveries.add(task)
+                task.add_done_callback(self._deliveries.discard)
+
+    # ---------- жизненный цикл (startup/shutdown диспетчера) ----------
+
+    async def start(self, bot: Bot, bots: Optional[Sequence[Bot]] = None) -> None:
+        """bots — все боты процесса (aiogram передаёт их в startup при polling)"""
+        self._bot = bot
+        self._bots = {b.id: b for b in bots or (bot,)}
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дождаться начатых доставок (не дольше timeout), остальные — после перезапуска"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._deliveries:
+            _, unfinished = await asyncio.wait(set(self._deliveries), timeout=timeout)
+            # Отменённые доставки остаются в журнале
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
@@ -0,0 +1,118 @@
+import asyncio
+import html
+import os
+from datetime import datetime
+from typing import FrozenSet, Optional
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import FSInputFile, Message
+
+from database.export import ExportRequest, export_to_file
+from database.recorder import QuizRecorder
+from utils.analytics import FunnelStats, format_stats
+from utils.profiling import Profiler
+
+router = Router()
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, admin_ids: FrozenSet[int], funnel: Optional[FunnelStats] = None):
+    """Статистика для владельца: собирается из счётчиков, без обхода базы"""
+    if message.from_user.id not in admin_ids:
+        return
+
+    if funnel is None:
+        await message.answer("Статистика отключена")
+        return
+
+    await message.answer(format_stats(funnel.combined()), parse_mode='HTML')
+
+
+@router.message(Command("export"))
+async def cmd_export(
+    message: Message,
+    command: CommandObject,
+    admin_ids: FrozenSet[int],
+    recorder: Optional[QuizRecorder] = None,
+):
+    """
+    Выгрузка заявок/прохождений файлом
+
+    /export [csv|parquet] [leads|completions] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [zone=sales]
+    """
+    if message.from_user.id not in admin_ids:
+        return
+
+    if recorder is None:
+        await message.answer("База отключена (DATABASE_PATH пуст) — выгружать нечего")
+        return
+
+    try:
+        request = ExportRequest.parse(command.args)
+    except ValueError as e:
+        await message.answer(f"⚠️ {e}\n\n{ExportRequest.__doc__}")
+        return
+
+    # Чтение и запись файла — в отдельном потоке, бот в это время отвечает другим
+    loop = asyncio.get_running_loop()
+    try:
+        path, rows = await loop.run_in_executor(None, export_to_file, recorder.path, request)
+    except RuntimeError as e:
+        await message.answer(f"⚠️ {e}")
+        return
+
+    try:
+        filename = f"{request.table}_{datetime.now().strftime('%Y%m%d')}.{request.format}"
+        await message.answer_document(
+            FSInputFile(path, filename=filename),
+            caption=f"📊 Экспорт: {request.table}, строк: {rows}"
+        )
+    finally:
+        os.unlink(path)
+
+
+# Больше апдейтов под cProfile — заметно медленнее весь бот
+MAX_PROFILE_UPDATES = 10000
+
+PROFILE_USAGE = (
+    "/profile — среднее время хендлеров: Bot API, FSM, CPU\n"
+    "/profile N — cProfile на следующие N апдейтов, отчёт придёт файлом\n"
+    "/profile off — отменить"
+)
+
+
+@router.message(Command("profile"))
+async def cmd_profile(
+    message: Message,
+    command: CommandObject,
+    admin_ids: FrozenSet[int],
+    profiler: Optional[Profiler] = None,
+):
+    """Профилирование хендлеров квиза (см. PROFILE_USAGE)"""
+    if message.from_user.id not in admin_ids:
+        return
+
+    if profiler is None:
+        await message.answer("Профилирование отключено")
+        return
+
+    args = (command.args or "").strip()
+    if not args:
+        await message.answer(
+            "⏱ <b>Хендлеры квиза</b>, мс на вызов:\n<pre>" + html.escape(profiler.format_split()) + "</pre>",
+            parse_mode='HTML',
+        )
+        return
+
+    if args == "off":
+        profiler.cancel()
+        await message.answer("🔬 Профилирование отменено")
+        return
+
+    if not args.isdigit() or not 0 < int(args) <= MAX_PROFILE_UPDATES:
+        await message.answer(f"⚠️ Нужно число апдейтов от 1 до {MAX_PROFILE_UPDATES}\n\n{PROFILE_USAGE}")
+        return
+
+    profiler.arm(int(args), message.chat.id)
+    await message.answer(f"🔬 cProfile включится на следующие {args} апдейтов квиза, отчёт пришлю файлом")
@@ -1,177 +1,147 @@
-from aiogram import Router, F
+import logging
+import time
+from typing import Optional
+
+from aiogram import Bot, Router
 from aiogram.filters import CommandStart
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
-from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, CallbackQuery
 from .states import QuizStates
+from middlewares.state_tx import StateTransaction, StateTransactionMiddleware
+from middlewares.metrics import HandlerMetricsMiddleware
+from middlewares.profiling import ProfilingMiddleware
+from utils.profiling import Profiler
+from outbound import Priority, send_priority
+from delayed import DelayedScheduler, delivery
+from quiz_graph import QUIZ_GRAPH
+from scoring import compute_result, get_result_table, render_by_key, render_key
+from tenants import Tenant, tenant_for
+from callback_index import CallbackIndex
+from session_codec import QuizSession
+from database.recorder import Completion, Lead, QuizRecorder
+from database.event_log import EventLog
+from utils.analytics import FunnelStats
+from utils.notifications import LeadNotifier, lead_event
+from static_messages import (
+    WELCOME,
+    ASK_NAME,
+    DECLINE,
+    NAME_INVALID,
+    NICHES,
+    ASK_NICHE,
+    ASK_CUSTOM_NICHE,
+    NICHE_INVALID,
+    QUESTION_MESSAGES,
+    ANALYSING,
+)
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
+# Все callback-кнопки маршрутизируются через индекс (см. callback_index.py)
+callbacks = CallbackIndex()
+
+# Время хендлеров для /metrics; подключается первым — снаружи записи FSM
+handler_metrics = HandlerMetricsMiddleware(callbacks)
+router.message.middleware(handler_metrics)
+router.callback_query.middleware(handler_metrics)
+
+# Разбивка времени хендлеров (API / FSM / CPU) и cProfile по /profile N
+profiler = Profiler()
+profiling = ProfilingMiddleware(profiler, callbacks)
+router.message.middleware(profiling)
+router.callback_query.middleware(profiling)
+
+# Одно чтение и одна запись FSM на апдейт (см. middlewares/state_tx.py)
+state_tx = StateTransactionMiddleware()
+router.message.middleware(state_tx)
+router.callback_query.middleware(state_tx)
+
+# Состояния вопросов; тексты и клавиатуры собраны в static_messages.py
+QUESTION_STATES = {question.id: getattr(QuizStates, question.state) for question in QUIZ_GRAPH}
+
 
 @router.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(
+    message: Message,
+    bot: Bot,
+    funnel: Optional[FunnelStats] = None,
+    events: Optional[EventLog] = None,
+):
     """Обработчик команды /start"""
-    
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Да, хочу расследование",
-                callback_data="start_quiz"
-            )],
-            [InlineKeyboardButton(
-                text="❌ Нет, потом как-нибудь",
-                callback_data="decline_quiz"
-            )]
-        ]
-    )
-    
-    text = (
-        "👋 Привет, друг!\n\n"
-        "<b>Твой личный детектив по итогам года готов к расследованию!</b>\n\n"
-        "Если 2025 по доходу/результатам тебя не радует, давай устроим маленькое расследование: "
-        "кто съедает твой рост и почему ты до сих пор не там, где мог(ла) быть.\n\n"
-        "За 2–3 минуты ты увидишь своё узкое место и поймёшь, что с этим делать в 2026. Поехали?"
-    )
-    
-    await message.answer(text, reply_markup=keyboard, parse_mode='HTML')
+    if funnel is not None:
+        funnel.on_start()
+    if events is not None:
+        events.on_start(message.from_user.id)
+    # У эксперта может быть своё приветствие (кнопки те же)
+    await bot(WELCOME.method(message.chat.id, tenant_for(bot.id).text("welcome")))
 
 
-@router.callback_query(F.data == "start_quiz")
-async def start_quiz(callback: CallbackQuery, state: FSMContext):
+@callbacks.route("st", legacy={"start_quiz": ""})
+async def start_quiz(callback: CallbackQuery, arg: str, tx: StateTransaction, bot: Bot):
     """Обработчик нажатия на кнопку 'Да'"""
     
     await callback.answer()
-    
-    text = (
-        "Отлично! Прежде чем начнём расследование, представьтесь:\n\n"
-        "<b>Как вас зовут?</b>"
-    )
-    
-    await callback.message.answer(text, parse_mode='HTML')
-    await state.set_state(QuizStates.waiting_for_name)
+    await bot(ASK_NAME.method(callback.message.chat.id))
+    await tx.set_state(QuizStates.waiting_for_name)
 
 
-@router.callback_query(F.data == "decline_quiz")
-async def decline_quiz(callback: CallbackQuery):
+@callbacks.route("dc", legacy={"decline_quiz": ""})
+async def decline_quiz(callback: CallbackQuery, arg: str, bot: Bot):
     """Обработчик нажатия на кнопку 'Нет'"""
     
     await callback.answer()
-    
-    text = (
-        "Понимаю! 😊\n\n"
-        "Когда будешь готов к расследованию — просто напиши /start\n\n"
-        "Я буду ждать! 🕵️"
-    )
-    
-    await callback.message.answer(text, parse_mode='HTML')
+    await bot(DECLINE.method(callback.message.chat.id))
 
 
 @router.message(QuizStates.waiting_for_name)
-async def process_name(message: Message, state: FSMContext):
+async def process_name(message: Message, tx: StateTransaction, bot: Bot):
     """Обработка ввода имени пользователя"""
     
     name = message.text.strip()
     
     # Проверка: имя не должно быть пустым
     if not name or len(name) < 2:
-        await message.answer(
-            "Пожалуйста, введите корректное имя (минимум 2 символа):",
-            parse_mode='HTML'
-        )
+        await bot(NAME_INVALID.method(message.chat.id))
         return
     
     # Сохраняем имя в состояние
-    await state.update_data(name=name)
+    await tx.update_data(name=name)
     
     # Ответ пользователю
     text = f"Приятно познакомиться, <b>{name}</b>! 👋"
     await message.answer(text, parse_mode='HTML')
     
     # Переходим к выбору ниши
-    await state.set_state(QuizStates.waiting_for_niche)
+    await tx.set_state(QuizStates.waiting_for_niche)
     
     # Кнопки с выбором ниши
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="💼 Инфопродукты",
-                callback_data="niche_infoproducts"
-            )],
-            [InlineKeyboardButton(
-                text="📊 Консалтинг",
-                callback_data="niche_consulting"
-            )],
-            [InlineKeyboardButton(
-                text="🚀 Продажи",
-                callback_data="niche_sales"
-            )],
-            [InlineKeyboardButton(
-                text="💰 Бизнес",
-                callback_data="niche_business"
-            )],
-            [InlineKeyboardButton(
-                text="✍️ Другое (напишу сам)",
-                callback_data="niche_custom"
-            )]
-        ]
-    )
-    
-    await message.answer(
-        "Теперь подскажи, в какой сфере ты работаешь?",
-        reply_markup=keyboard,
-        parse_mode='HTML'
-    )
+    await bot(ASK_NICHE.method(message.chat.id))
 
 
-@router.callback_query(F.data.startswith("niche_"))
-async def process_niche_choice(callback: CallbackQuery, state: FSMContext):
+@callbacks.route("n", legacy={f"niche_{code}": code for code in NICHES})
+async def process_niche_choice(callback: CallbackQuery, arg: str, tx: StateTransaction, bot: Bot):
     """Обработка выбора ниши из кнопок"""
     
     await callback.answer()
     
     # Если выбрал "Другое" - просим написать
-    if callback.data == "niche_custom":
-        await callback.message.answer(
-            "Напиши свою сферу деятельности:",
-            parse_mode='HTML'
-        )
+    if arg == "custom":
+        await bot(ASK_CUSTOM_NICHE.method(callback.message.chat.id))
         return
     
     # Сохраняем нишу
-    niches = {
-        "niche_infoproducts": "инфопродуктах",
-        "niche_consulting": "консалтинге",
-        "niche_sales": "продажах",
-        "niche_business": "бизнесе"
-    }
-    
-    niche = niches.get(callback.data, "бизнесе")
-    await state.update_data(niche=niche)
+    niche = NICHES.get(arg, NICHES["business"])[1]
+    await tx.update_data(niche=niche)
     
     # Переходим к первому вопросу
-    await state.set_state(QuizStates.question_1)
+    await tx.set_state(QUESTION_STATES[QUIZ_GRAPH.first.id])
     
     # Получаем имя из состояния
-    data = await state.get_data()
+    data = await tx.get_data()
     name = data.get('name', 'друг')
     
     # Задаём первый вопрос с подстановкой ниши
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="📈 Лучше, чем предыдущие годы",
-                callback_data="q1_better"
-            )],
-            [InlineKeyboardButton(
-                text="➡️ Примерно на том же уровне",
-                callback_data="q1_same"
-            )],
-            [InlineKeyboardButton(
-                text="📉 Хуже, чем хотелось бы",
-                callback_data="q1_worse"
-            )]
-        ]
-    )
-    
     question_text = (
         f"Отлично, <b>{name}</b>!\n\n"
         "Сейчас я задам тебе несколько вопросов. Это займёт всего 2 минуты.\n\n"
@@ -179,50 +149,33 @@ async def process_niche_choice(callback: CallbackQuery, state: FSMContext):
         f"<b>Вопрос 1:</b> Как ты оцениваешь свой 2025 по деньгам/результатам в <b>{niche}</b>?"
     )
     
-    await callback.message.answer(question_text, reply_markup=keyboard, parse_mode='HTML')
+    await bot(QUESTION_MESSAGES[QUIZ_GRAPH.first.id].method(callback.message.chat.id, question_text))
 
 
 @router.message(QuizStates.waiting_for_niche)
-async def process_custom_niche(message: Message, state: FSMContext):
+async def process_custom_niche(message: Message, tx: StateTransaction, bot: Bot):
     """Обработка кастомной ниши (когда пользователь сам пишет)"""
     
     niche = message.text.strip().lower()
     
     if not niche or len(niche) < 3:
-        await message.answer("Пожалуйста, напиши сферу деятельности (минимум 3 символа):")
+        await bot(NICHE_INVALID.method(message.chat.id))
         return
     
     # Добавляем предлог, если нужно
     if not niche.startswith(('в ', 'в')):
         niche = f"в сфере {niche}"
     
-    await state.update_data(niche=niche)
+    await tx.update_data(niche=niche)
     
     # Переходим к первому вопросу
-    await state.set_state(QuizStates.question_1)
+    await tx.set_state(QUESTION_STATES[QUIZ_GRAPH.first.id])
     
     # Получаем имя
-    data = await state.get_data()
+    data = await tx.get_data()
     name = data.get('name', 'друг')
     
     # Задаём первый вопрос
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="📈 Лучше, чем предыдущие годы",
-                callback_data="q1_better"
-            )],
-            [InlineKeyboardButton(
-                text="➡️ Примерно на том же уровне",
-                callback_data="q1_same"
-            )],
-            [InlineKeyboardButton(
-                text="📉 Хуже, чем хотелось бы",
-                callback_data="q1_worse"
-            )]
-        ]
-    )
-    
     question_text = (
         f"Отлично, <b>{name}</b>!\n\n"
         "Сейчас я задам тебе несколько вопросов. Это займёт всего 2 минуты.\n\n"
@@ -230,735 +183,212 @@ async def process_custom_niche(message: Message, state: FSMContext):
         f"<b>Вопрос 1:</b> Как ты оцениваешь свой 2025 по деньгам/результатам <b>{niche}</b>?"
     )
     
-    await message.answer(question_text, reply_markup=keyboard, parse_mode='HTML')
-
-
-@router.callback_query(F.data.in_(["q1_better", "q1_same", "q1_worse"]))
-async def handle_question_1(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 1"""
-
-    await callback.answer()
-
-    # Сохраняем ответ
-    answer_text = {
-        "q1_better": "Лучше, чем предыдущие годы",
-        "q1_same": "Примерно на том же уровне",
-        "q1_worse": "Хуже, чем хотелось бы"
-    }
-
-    await state.update_data(question_1=answer_text[callback.data])
-
-    # Переходим ко второму вопросу
-    await state.set_state(QuizStates.question_2)
-
-    # Вопрос 2: Доход за 2025
-    keyboard_q2 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="💵 До 50 000 в месяц",
-                callback_data="q2_under50"
-            )],
-            [InlineKeyboardButton(
-                text="💰 50–100 000",
-                callback_data="q2_50to100"
-            )],
-            [InlineKeyboardButton(
-                text="💎 100–300 000",
-                callback_data="q2_100to300"
-            )],
-            [InlineKeyboardButton(
-                text="🚀 300 000+",
-                callback_data="q2_over300"
-            )]
-        ]
-    )
-
-    question_2_text = (
-        "✅ Принято!\n\n"
-        "Для начала зафиксируем, с чем ты входишь в 2026.\n"
-        "Мне не нужны точные цифры, главное — порядок.\n\n"
-        "<b>Вопрос 2. Доход за 2025</b>\n\n"
-        "Примерно какой был твой средний ежемесячный доход в 2025?\n"
-        "На каком уровне ты сейчас?"
-    )
-
-    await callback.message.answer(
-        question_2_text,
-        reply_markup=keyboard_q2,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q2_under50", "q2_50to100", "q2_100to300", "q2_over300"]))
-async def handle_question_2(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 2 - Доход"""
-
-    await callback.answer()
-
-    # Сохраняем ответ
-    answer_text = {
-        "q2_under50": "До 50 000 в месяц",
-        "q2_50to100": "50–100 000",
-        "q2_100to300": "100–300 000",
-        "q2_over300": "300 000+"
-    }
-
-    await state.update_data(question_2=answer_text[callback.data])
-
-    # Переходим к третьему вопросу
-    await state.set_state(QuizStates.question_3)
-
-    # Вопрос 3: Цели по доходу на 2026
-    keyboard_q3 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="📊 Стабильно x2–x3 от того, что есть сейчас",
-                callback_data="q3_x2x3"
-            )],
-            [InlineKeyboardButton(
-                text="🚀 Резкий рывок x5–x10, готов(а) вкалывать, даже если страшно",
-                callback_data="q3_x5x10"
-            )],
-            [InlineKeyboardButton(
-                text="💎 Мечтаю про x100, но не понимаю \"как\"",
-                callback_data="q3_x100"
-            )],
-            [InlineKeyboardButton(
-                text="🌱 Хочу наконец перестать выживать и нормально жить",
-                callback_data="q3_survive"
-            )]
-        ]
-    )
-
-    question_3_text = (
-        "✅ Отлично! Зафиксировали!\n\n"
-        "📍 <b>Точка Б: куда хочешь прийти в 2026?</b>\n\n"
-        "Теперь давай зафиксируем, чего ты хочешь от 2026 года, чтобы сказать:\n"
-        "«Да, этот год я прожил(а) не зря».\n\n"
-        "<b>Вопрос 3. Цель по доходу</b>\n\n"
-        "Что для тебя про рост в 2026?"
-    )
-
-    await callback.message.answer(
-        question_3_text,
-        reply_markup=keyboard_q3,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q3_x2x3", "q3_x5x10", "q3_x100", "q3_survive"]))
-async def handle_question_3(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 3 - Цель по доходу на 2026"""
-
-    await callback.answer()
+    await bot(QUESTION_MESSAGES[QUIZ_GRAPH.first.id].method(message.chat.id, question_text))
 
-    # Сохраняем ответ
-    answer_text = {
-        "q3_x2x3": "Стабильно x2–x3 от того, что есть сейчас",
-        "q3_x5x10": "Резкий рывок x5–x10, готов(а) вкалывать",
-        "q3_x100": "Мечтаю про x100, но не понимаю \"как\"",
-        "q3_survive": "Хочу перестать выживать и нормально жить"
-    }
-
-    await state.update_data(question_3=answer_text[callback.data])
-
-    # Инициализируем счётчики боли для диагностики
-    await state.update_data(
-        product_pain=0,
-        traffic_pain=0,
-        content_pain=0,
-        sales_pain=0,
-        system_pain=0
-    )
-
-    # Переходим к вопросу perceived (что человек ДУМАЕТ, что мешает)
-    await state.set_state(QuizStates.question_perceived)
-
-    # Вопрос PERCEIVED: Что человек ДУМАЕТ, что мешает (для твиста)
-    keyboard_perceived = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="📦 Слабое предложение / не понимаю, что продавать",
-                callback_data="perceived_product"
-            )],
-            [InlineKeyboardButton(
-                text="👥 Мало новых людей, слабый трафик",
-                callback_data="perceived_traffic"
-            )],
-            [InlineKeyboardButton(
-                text="📝 Не доверяют / мало прогрева к продукту",
-                callback_data="perceived_content"
-            )],
-            [InlineKeyboardButton(
-                text="💰 Трудно продавать / стыдно / не умею",
-                callback_data="perceived_sales"
-            )],
-            [InlineKeyboardButton(
-                text="⚙️ Нет времени / сил / структуры",
-                callback_data="perceived_system"
-            )]
-        ]
-    )
-
-    perceived_text = (
-        "✅ Супер! Твоя цель зафиксирована!\n\n"
-        "🤔 <b>Давай честно:</b>\n\n"
-        "Как тебе кажется, что <b>больше всего</b> мешает росту прямо сейчас?\n\n"
-        "Выбери то, что первым приходит в голову, когда думаешь: "
-        "«Вот если бы ЭТО решить — сразу полегчало бы»."
-    )
-
-    await callback.message.answer(
-        perceived_text,
-        reply_markup=keyboard_perceived,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_([
-    "perceived_product",
-    "perceived_traffic",
-    "perceived_content",
-    "perceived_sales",
-    "perceived_system"
-]))
-async def handle_perceived(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на perceived вопрос (что человек ДУМАЕТ, что мешает)"""
-
-    await callback.answer()
-
-    # Маппинг callback_data -> зона
-    perceived_zone_map = {
-        "perceived_product": "product",
-        "perceived_traffic": "traffic",
-        "perceived_content": "content",
-        "perceived_sales": "sales",
-        "perceived_system": "system",
-    }
-
-    perceived_zone = perceived_zone_map[callback.data]
-
-    # Сохраняем perceived зону
-    await state.update_data(perceived_zone=perceived_zone)
-
-    # Переходим к диагностическим вопросам (вопрос 4)
-    await state.set_state(QuizStates.question_4)
-
-    # Вопрос 4: Диагностика - Продукт
-    keyboard_q4 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Да, у меня есть понятное предложение",
-                callback_data="q4_clear"
-            )],
-            [InlineKeyboardButton(
-                text="🤔 Примерно могу, но запинаюсь",
-                callback_data="q4_medium"
-            )],
-            [InlineKeyboardButton(
-                text="😵 Нет, у меня миллион идей и форматов, хочу всё и сразу",
-                callback_data="q4_chaos"
-            )]
-        ]
-    )
-
-    question_4_text = (
-        "✅ Супер! Твоя цель зафиксирована!\n\n"
-        "🔍 <b>Диагностика: 5 зон, где «течёт» результат</b>\n\n"
-        "Теперь проверим 5 ключевых точек, где чаще всего теряются деньги.\n"
-        "Я задам по одному вопросу на каждую зону — отвечай честно.\n\n"
-        "📦 <b>Продукт/предложение</b>\n\n"
-        "Начнём с самого очевидного вопроса: что ты продаёшь?\n\n"
-        "Представь, что я твой идеальный клиент.\n"
-        "Можешь ли ты за 1–2 предложения объяснить, что именно я у тебя могу купить? "
-        "Чем ты мне можешь помочь?"
-    )
-
-    await callback.message.answer(
-        question_4_text,
-        reply_markup=keyboard_q4,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q4_clear", "q4_medium", "q4_chaos"]))
-async def handle_question_4(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 4 - Диагностика продукта"""
-
-    await callback.answer()
-
-    # Получаем текущие данные
-    data = await state.get_data()
-    product_pain = data.get('product_pain', 0)
-
-    # Начисляем баллы боли в зависимости от ответа
-    pain_points = {
-        "q4_clear": 0,      # Понятное предложение - нет боли
-        "q4_medium": 1,     # Запинается - средняя боль
-        "q4_chaos": 2       # Каша в голове - высокая боль
-    }
-
-    product_pain += pain_points[callback.data]
-
-    # Жалобность варианта (для fallback perceived)
-    complaint_levels = {
-        "q4_clear": 0,
-        "q4_medium": 1,
-        "q4_chaos": 2
-    }
-
-    # Обновляем complaint_best если нужно
-    complaint = complaint_levels[callback.data]
-    complaint_best = data.get('complaint_best')
-    if not complaint_best or complaint > complaint_best[1]:
-        await state.update_data(complaint_best=("product", complaint))
-
-    # Сохраняем обновлённый счётчик и ответ
-    answer_text = {
-        "q4_clear": "Да, у меня есть понятное предложение",
-        "q4_medium": "Примерно могу, но запинаюсь",
-        "q4_chaos": "Нет, у меня миллион идей и форматов"
-    }
-
-    await state.update_data(
-        question_4=answer_text[callback.data],
-        product_pain=product_pain
-    )
-
-    # Переходим к пятому вопросу
-    await state.set_state(QuizStates.question_5)
-
-    # Вопрос 5: Диагностика - Трафик
-    keyboard_q5 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Новые люди стабильно приходят каждую неделю",
-                callback_data="q5_stable"
-            )],
-            [InlineKeyboardButton(
-                text="🤷 Иногда прибавляется кто-то, иногда тишина",
-                callback_data="q5_unstable"
-            )],
-            [InlineKeyboardButton(
-                text="😞 Практически одни и те же лица везде, никого нового",
-                callback_data="q5_stagnant"
-            )]
-        ]
-    )
-
-    question_5_text = (
-        "✅ Принято!\n\n"
-        "👥 <b>Поток людей (трафик)</b>\n\n"
-        "Хороший продукт без людей — это как концерт в пустом зале.\n\n"
-        "Насколько стабильно к тебе приходят новые люди?"
-    )
-
-    await callback.message.answer(
-        question_5_text,
-        reply_markup=keyboard_q5,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q5_stable", "q5_unstable", "q5_stagnant"]))
-async def handle_question_5(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 5 - Диагностика трафика"""
-
-    await callback.answer()
-
-    # Получаем текущие данные
-    data = await state.get_data()
-    traffic_pain = data.get('traffic_pain', 0)
-
-    # Начисляем баллы боли в зависимости от ответа
-    pain_points = {
-        "q5_stable": 0,      # Стабильный трафик - нет боли
-        "q5_unstable": 1,    # Нестабильный - средняя боль
-        "q5_stagnant": 2     # Нет новых людей - высокая боль
-    }
-
-    traffic_pain += pain_points[callback.data]
-
-    # Жалобность варианта (для fallback perceived)
-    complaint_levels = {
-        "q5_stable": 0,
-        "q5_unstable": 1,
-        "q5_stagnant": 2
-    }
-
-    # Обновляем complaint_best если нужно
-    complaint = complaint_levels[callback.data]
-    complaint_best = data.get('complaint_best')
-    if not complaint_best or complaint > complaint_best[1]:
-        await state.update_data(complaint_best=("traffic", complaint))
-
-    # Сохраняем обновлённый счётчик и ответ
-    answer_text = {
-        "q5_stable": "Новые люди стабильно приходят каждую неделю",
-        "q5_unstable": "Иногда прибавляется кто-то, иногда тишина",
-        "q5_stagnant": "Практически одни и те же лица везде, никого нового"
-    }
-
-    await state.update_data(
-        question_5=answer_text[callback.data],
-        traffic_pain=traffic_pain
-    )
-
-    # Переходим к шестому вопросу
-    await state.set_state(QuizStates.question_6)
-
-    # Вопрос 6: Диагностика - Контент/доверие
-    keyboard_q6 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Регулярно, с понятными темами и рубриками",
-                callback_data="q6_regular"
-            )],
-            [InlineKeyboardButton(
-                text="🎨 Пишу/выступаю когда есть вдохновение и силы, как попало",
-                callback_data="q6_irregular"
-            )],
-            [InlineKeyboardButton(
-                text="📚 Часто даю пользу, но почти не веду к продукту",
-                callback_data="q6_no_funnel"
-            )]
-        ]
-    )
-
-    # Получаем нишу пользователя для персонализации
-    data = await state.get_data()
-    niche = data.get('niche', 'соцсетях')
-
-    question_6_text = (
-        "✅ Зафиксировали!\n\n"
-        "📝 <b>Контент / доверие</b>\n\n"
-        "Люди покупают не только продукт, но и историю, в которую ты их зовёшь.\n\n"
-        "Как ты ведёшь контент в своих основных площадках?"
-    )
-
-    await callback.message.answer(
-        question_6_text,
-        reply_markup=keyboard_q6,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q6_regular", "q6_irregular", "q6_no_funnel"]))
-async def handle_question_6(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 6 - Диагностика контента/доверия"""
-
-    await callback.answer()
-
-    # Получаем текущие данные
-    data = await state.get_data()
-    content_pain = data.get('content_pain', 0)
-
-    # Начисляем баллы боли в зависимости от ответа
-    pain_points = {
-        "q6_regular": 0,       # Регулярный контент с логикой - нет боли
-        "q6_irregular": 2,     # Нерегулярно, как попало - высокая боль
-        "q6_no_funnel": 4      # Нет логики прогрева к продукту - высокая боль
-    }
-
-    content_pain += pain_points[callback.data]
-
-    # Жалобность варианта (для fallback perceived)
-    complaint_levels = {
-        "q6_regular": 0,
-        "q6_irregular": 2,
-        "q6_no_funnel": 4
-    }
-
-    # Обновляем complaint_best если нужно
-    complaint = complaint_levels[callback.data]
-    complaint_best = data.get('complaint_best')
-    if not complaint_best or complaint > complaint_best[1]:
-        await state.update_data(complaint_best=("content", complaint))
-
-    # Сохраняем обновлённый счётчик и ответ
-    answer_text = {
-        "q6_regular": "Регулярно, с понятными темами и рубриками",
-        "q6_irregular": "Пишу когда есть вдохновение, как попало",
-        "q6_no_funnel": "Часто даю пользу, но почти не веду к продукту"
-    }
-
-    await state.update_data(
-        question_6=answer_text[callback.data],
-        content_pain=content_pain
-    )
-
-    # Переходим к седьмому вопросу
-    await state.set_state(QuizStates.question_7)
-
-    # Вопрос 7: Диагностика - Продажи и офферы
-    keyboard_q7 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Регулярно, мне ок с продажами. Не стесняюсь",
-                callback_data="q7_regular"
-            )],
-            [InlineKeyboardButton(
-                text="🤔 Иногда, когда уже прижало",
-                callback_data="q7_sometimes"
-            )],
-            [InlineKeyboardButton(
-                text="😳 Стыдно продавать, надеюсь, что сами догадаются и спросят",
-                callback_data="q7_ashamed"
-            )]
-        ]
-    )
-
-    question_7_text = (
-        "✅ Понял!\n\n"
-        "💰 <b>Продажи и офферы</b>\n\n"
-        "Теперь про самое «любимое» — продажи.\n\n"
-        "Как часто ты прямо и спокойно говоришь людям:\n"
-        "«Вот мой формат работы, вот стоимость, вот как записаться»?"
-    )
-
-    await callback.message.answer(
-        question_7_text,
-        reply_markup=keyboard_q7,
-        parse_mode='HTML'
-    )
-
-
-@router.callback_query(F.data.in_(["q7_regular", "q7_sometimes", "q7_ashamed"]))
-async def handle_question_7(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 7 - Диагностика продаж"""
-
-    await callback.answer()
-
-    # Получаем текущие данные
-    data = await state.get_data()
-    sales_pain = data.get('sales_pain', 0)
-
-    # Начисляем баллы боли в зависимости от ответа
-    pain_points = {
-        "q7_regular": 0,       # Регулярно продаёт - нет боли
-        "q7_sometimes": 1,     # Иногда, когда прижало - средняя боль
-        "q7_ashamed": 3        # Стыдно продавать - ЖИРНАЯ БОЛЬ
-    }
-
-    sales_pain += pain_points[callback.data]
-
-    # Жалобность варианта (для fallback perceived)
-    complaint_levels = {
-        "q7_regular": 0,
-        "q7_sometimes": 1,
-        "q7_ashamed": 3        # САМАЯ ЖАЛОБНАЯ - стыдно продавать
-    }
-
-    # Обновляем complaint_best если нужно
-    complaint = complaint_levels[callback.data]
-    complaint_best = data.get('complaint_best')
-    if not complaint_best or complaint > complaint_best[1]:
-        await state.update_data(complaint_best=("sales", complaint))
-
-    # Сохраняем обновлённый счётчик и ответ
-    answer_text = {
-        "q7_regular": "Регулярно, мне ок с продажами. Не стесняюсь",
-        "q7_sometimes": "Иногда, когда уже прижало",
-        "q7_ashamed": "Стыдно продавать, надеюсь, что сами догадаются"
-    }
-
-    await state.update_data(
-        question_7=answer_text[callback.data],
-        sales_pain=sales_pain
-    )
-
-    # Переходим к восьмому вопросу
-    await state.set_state(QuizStates.question_8)
-
-    # Вопрос 8: Диагностика - Система/ресурс
-    keyboard_q8 = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text="✅ Распланирую и справлюсь",
-                callback_data="q8_scale"
-            )],
-            [InlineKeyboardButton(
-                text="😰 Придётся напрячься, но, наверное, как-нибудь вытяну",
-                callback_data="q8_struggle"
-            )],
-            [InlineKeyboardButton(
-                text="🔥 Сгорю, запутаюсь и начну сливать. Испорчу отношения с половиной",
-                callback_data="q8_burnout"
-            )]
-        ]
-    )
-
-    question_8_text = (
-        "✅ Зафиксировал!\n\n"
-        "⚙️ <b>Система / ресурс</b>\n\n"
-        "И ещё вопрос не про цифры, а про выживание.\n\n"
-        "Если к тебе завтра придут 20 клиентов одновременно, что произойдёт?"
-    )
-
-    await callback.message.answer(
-        question_8_text,
-        reply_markup=keyboard_q8,
-        parse_mode='HTML'
-    )
 
+# ========================================
+# ОТВЕТЫ НА ВОПРОСЫ КВИЗА (по графу из quiz_graph.py)
+# ========================================
 
-@router.callback_query(F.data.in_(["q8_scale", "q8_struggle", "q8_burnout"]))
-async def handle_question_8(callback: CallbackQuery, state: FSMContext):
-    """Обработка ответа на вопрос 8 - Диагностика системы/ресурсов"""
+@callbacks.route("a", legacy={option_id: option_id for option_id in QUIZ_GRAPH.option_ids})
+async def handle_answer(
+    callback: CallbackQuery,
+    arg: str,
+    tx: StateTransaction,
+    delayed: DelayedScheduler,
+    bot: Bot,
+    recorder: Optional[QuizRecorder] = None,
+    funnel: Optional[FunnelStats] = None,
+    events: Optional[EventLog] = None,
+):
+    """Обработка ответа на любой вопрос квиза"""
 
     await callback.answer()
 
-    # Получаем текущие данные
-    data = await state.get_data()
-    system_pain = data.get('system_pain', 0)
-
-    # Начисляем баллы боли в зависимости от ответа
-    pain_points = {
-        "q8_scale": 0,        # Готов масштабироваться - нет боли
-        "q8_struggle": 1,     # Напрячётся, но справится - средняя боль
-        "q8_burnout": 3       # Сгорит и запутается - высокая боль (нет масштабируемости)
-    }
-
-    system_pain += pain_points[callback.data]
-
-    # Жалобность варианта (для fallback perceived)
-    complaint_levels = {
-        "q8_scale": 0,
-        "q8_struggle": 1,
-        "q8_burnout": 3
-    }
-
-    # Обновляем complaint_best если нужно
-    complaint = complaint_levels[callback.data]
-    complaint_best = data.get('complaint_best')
-    if not complaint_best or complaint > complaint_best[1]:
-        await state.update_data(complaint_best=("system", complaint))
-
-    # Сохраняем обновлённый счётчик и ответ
-    answer_text = {
-        "q8_scale": "Распланирую и справлюсь",
-        "q8_struggle": "Придётся напрячься, но вытяну",
-        "q8_burnout": "Сгорю, запутаюсь и начну сливать"
-    }
-
-    await state.update_data(
-        question_8=answer_text[callback.data],
-        system_pain=system_pain
-    )
-
-    # Все вопросы пройдены - переходим к результатам
-    await state.set_state(QuizStates.show_result)
-
-    # Вычисляем финальный результат с помощью scoring модуля
-    from scoring import AnswersState, compute_result, build_final_message, get_result_buttons
-    from config import DEFAULT_TEMPLATE
-
-    # Получаем все данные
-    data = await state.get_data()
-
-    # Формируем AnswersState
-    answers_state = AnswersState(
-        scores={
-            "product": data.get('product_pain', 0),
-            "traffic": data.get('traffic_pain', 0),
-            "content": data.get('content_pain', 0),
-            "sales": data.get('sales_pain', 0),
-            "system": data.get('system_pain', 0),
-        },
-        perceived_zone=data.get('perceived_zone'),
-        complaint_best=data.get('complaint_best')
-    )
-
-    # Вычисляем результат
-    result = compute_result(answers_state)
-
-    # Строим финальное сообщение и кнопки
-    final_message = build_final_message(result, DEFAULT_TEMPLATE)
-    result_buttons = get_result_buttons(result, DEFAULT_TEMPLATE)
-
-    await callback.message.answer(
-        "✅ Отлично! Диагностика завершена.\n\n"
-        "По твоим ответам я вижу одну интересную штуку.\n\n"
-        "Сейчас проанализирую твои результаты и покажу результат...",
-        parse_mode='HTML'
-    )
-
-    # Короткая пауза для эффекта
-    import asyncio
-    await asyncio.sleep(2)
+    answer = QUIZ_GRAPH.answers.get(arg)
+    if answer is None:
+        return
+    question, option = answer
+
+    # Ответы хранятся кодами вариантов (см. session_codec.py);
+    # баллы боли, perceived и complaint_best выводятся из них
+    session = QuizSession.from_data(await tx.get_data())
+    session.answer(question, option)
+    await tx.set_data(session.to_data())
+    if events is not None:
+        events.on_answer(callback.from_user.id, question, option)
+
+    next_question = QUIZ_GRAPH.next_question(question)
+    if next_question is None:
+        # Все вопросы пройдены - переходим к результатам
+        await tx.set_state(QuizStates.show_result)
+        await show_result(callback, tx, delayed, bot, recorder, funnel, events)
+        return
 
-    # Создаем клавиатуру с кнопками
-    keyboard = None
-    if result_buttons:
-        keyboard = InlineKeyboardMarkup(
-            inline_keyboard=[[btn] for btn in result_buttons]
+    # Переходим к следующему вопросу
+    await tx.set_state(QUESTION_STATES[next_question.id])
+
+    with send_priority(Priority.QUIZ):
+        await bot(QUESTION_MESSAGES[next_question.id].method(callback.message.chat.id))
+
+
+def session_result(session: QuizSession):
+    """DiagnosticResult для сессии"""
+    # Все комбинации ответов посчитаны заранее: результат — один поиск
+    table = get_result_table()
+    result = table.get(session.perceived_zone, session.option_ids(table.questions))
+
+    if result is None:
+        # Ответили не на все вопросы (например, сессия старого формата): считаем по баллам
+        result = compute_result(session.answers_state())
+
+    return result
+
+
+async def show_result(
+    callback: CallbackQuery,
+    tx: StateTransaction,
+    delayed: DelayedScheduler,
+    bot: Bot,
+    recorder: Optional[QuizRecorder] = None,
+    funnel: Optional[FunnelStats] = None,
+    events: Optional[EventLog] = None,
+):
+    """Подсчёт и показ результата диагностики"""
+    session = QuizSession.from_data(await tx.get_data())
+    result = session_result(session)
+
+    # Запись в базу уходит в фоновый поток, хендлер диск не ждёт
+    if recorder is not None:
+        user = callback.from_user
+        recorder.record_completion(Completion.from_result(user.id, user.username, session, result))
+    if funnel is not None:
+        funnel.on_result(result, session.niche)
+    if events is not None:
+        events.on_result(callback.from_user.id, result)
+
+    with send_priority(Priority.RESULT):
+        await bot(ANALYSING.method(callback.message.chat.id))
+
+    # Короткая пауза для эффекта: результат отправит планировщик,
+    # хендлер не ждёт. В журнал пишем только ключ готового текста
+    delayed.schedule(2, "result", callback.message.chat.id, {"key": render_key(result)}, bot.id)
+
+
+@delivery("result")
+async def deliver_result(bot: Bot, chat_id: int, payload: dict):
+    """Отложенная отправка финального результата с кнопками"""
+    try:
+        bottleneck, twist, perceived = payload["key"]
+    except (KeyError, TypeError, ValueError):
+        # Запись другого формата: повтор не поможет, доставку снимаем
+        logger.error(f"❌ Результат для чата {chat_id} не отправлен: непонятный ключ {payload!r}")
+        return
+    # Ключ мог записать прежний контент: тогда текст рендерится на лету
+    rendered = render_by_key((bottleneck, twist, perceived), tenant_for(bot.id).template)
+
+    with send_priority(Priority.RESULT):
+        await bot.send_message(
+            chat_id,
+            rendered.text,
+            reply_markup=rendered.keyboard,
+            parse_mode='HTML'
         )
 
-    # Отправляем финальный результат с кнопками
-    await callback.message.answer(
-        final_message,
-        reply_markup=keyboard,
-        parse_mode='HTML'
-    )
-
 
 # ========================================
 # ОБРАБОТЧИКИ КНОПОК РЕЗУЛЬТАТА
 # ========================================
 
-@router.callback_query(F.data == "to_consult")
-async def handle_to_consult(callback: CallbackQuery, state: FSMContext):
+@callbacks.route("rc", legacy={"to_consult": ""})
+async def handle_to_consult(
+    callback: CallbackQuery,
+    arg: str,
+    tx: StateTransaction,
+    bot: Bot,
+    recorder: Optional[QuizRecorder] = None,
+    funnel: Optional[FunnelStats] = None,
+    notifier: Optional[LeadNotifier] = None,
+    events: Optional[EventLog] = None,
+):
     """Обработка кнопки 'Хочу разбор с {ЭКСПЕРТ}'"""
+    tenant = tenant_for(bot.id)
     await callback.answer()
+    await record_lead(callback, tx, recorder, funnel, notifier, events, "consult", tenant)
 
-    from config import DEFAULT_TEMPLATE
+    with send_priority(Priority.RESULT):
+        await callback.message.answer(
+            tenant.consult_text(),
+            reply_markup=tenant.compiled().consult_keyboard,
+            parse_mode='HTML'
+        )
 
-    consult_message = (
-        f"<b>Тогда следующий шаг простой:</b>\n\n"
-        f"<b>{DEFAULT_TEMPLATE.expert_name}</b> делает для таких, как ты, {DEFAULT_TEMPLATE.service_format} — "
-        f"за одну встречу вы разбираете твою точку А, узкое горлышко и реальные шаги на 2026 год.\n\n"
-        f"<b>Нажми на кнопку ниже, чтобы:</b>\n"
-        f"— получить условия и стоимость,\n"
-        f"— задать вопрос,\n"
-        f"— или сразу записаться."
-    )
 
-    # Создаем кнопку для связи с экспертом
-    from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+@callbacks.route("rs", legacy={"to_self": ""})
+async def handle_to_self(
+    callback: CallbackQuery,
+    arg: str,
+    tx: StateTransaction,
+    bot: Bot,
+    recorder: Optional[QuizRecorder] = None,
+    funnel: Optional[FunnelStats] = None,
+    notifier: Optional[LeadNotifier] = None,
+    events: Optional[EventLog] = None,
+):
+    """Обработка кнопки 'Попробую сам(а) по шагам'"""
+    tenant = tenant_for(bot.id)
+    await callback.answer()
+    await record_lead(callback, tx, recorder, funnel, notifier, events, "self", tenant)
 
-    keyboard = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(
-                text=f"Написать {DEFAULT_TEMPLATE.expert_name_dat}",
-                url=f"https://t.me/{DEFAULT_TEMPLATE.expert_username}"
-            )]
-        ]
-    )
+    with send_priority(Priority.RESULT):
+        await callback.message.answer(
+            tenant.self_text(),
+            parse_mode='HTML'
+        )
 
-    await callback.message.answer(
-        consult_message,
-        reply_markup=keyboard,
-        parse_mode='HTML'
-    )
 
+async def record_lead(
+    callback: CallbackQuery,
+    tx: StateTransaction,
+    recorder: Optional[QuizRecorder],
+    funnel: Optional[FunnelStats],
+    notifier: Optional[LeadNotifier],
+    events: Optional[EventLog],
+    choice: str,
+    tenant: Tenant,
+) -> None:
+    """Записать выбор после результата (consult — заявка на разбор, о ней узнают админы эксперта или владелец)"""
+    if funnel is not None:
+        funnel.on_lead(choice)
+    if events is not None:
+        events.on_lead(callback.from_user.id, choice)
+    if notifier is not None and choice != "consult":
+        notifier = None
+    if recorder is None and notifier is None:
+        return
 
-@router.callback_query(F.data == "to_self")
-async def handle_to_self(callback: CallbackQuery, state: FSMContext):
-    """Обработка кнопки 'Попробую сам(а) по шагам'"""
-    await callback.answer()
+    session = QuizSession.from_data(await tx.get_data())
+    result = session_result(session) if session.answers else None
+
+    user = callback.from_user
+    if recorder is not None:
+        bottleneck = result.bottleneck if result else None
+        recorder.record_lead(Lead(user.id, user.username, session.name, bottleneck, choice, time.time()))
+    if notifier is not None:
+        notifier.notify(
+            lead_event(user.id, user.username, session, result, tenant.name),
+            chat_ids=tenant.admin_ids,
+            bot_id=tenant.bot_id,
+        )
 
-    from config import DEFAULT_TEMPLATE
 
-    self_message = (
-        "<b>Круто, что ты готов(а) пробовать сам(а).</b>\n\n"
-        "Сохрани эти шаги и попробуй хотя бы 7–10 дней делать хоть что-то одно из списка.\n\n"
-        f"Если поймёшь, что буксуешь, смело возвращайся к "
-        f"<a href='https://t.me/{DEFAULT_TEMPLATE.expert_username}'>{DEFAULT_TEMPLATE.expert_name_dat}</a> — "
-        f"{DEFAULT_TEMPLATE.pronoun_nom} не будет тебя отчитывать, "
-        "а поможет спокойно довести эту историю до роста дохода."
-    )
+# ========================================
+# ЕДИНАЯ ТОЧКА ВХОДА ДЛЯ CALLBACK-КНОПОК
+# ========================================
 
-    await callback.message.answer(
-        self_message,
-        parse_mode='HTML'
-    )
+@router.callback_query()
+async def dispatch_callback(callback: CallbackQuery, **data):
+    """Найти обработчик кнопки по индексу callbacks"""
+    if await callbacks.dispatch(callback, data) is False:
+        # Кнопка от старой/неизвестной версии — просто убираем «часики»
+        await callback.answer()
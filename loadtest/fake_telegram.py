@@ -0,0 +1,212 @@
+"""
+Локальные заглушки Telegram для замеров без сети
+
+FakeBotAPI — сервер вместо api.telegram.org: отвечает на методы Bot API
+и складывает отправленные ботом сообщения в очередь по chat_id. Умеет
+отдавать апдейты через getUpdates (long polling), добавлять задержку
+ответа и отвечать 429 Too Many Requests с заданной вероятностью.
+FakeTelegramClient — «Telegram», который шлёт апдейты на webhook бота.
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from aiohttp import ClientSession, web
+
+
+class FakeBotAPI:
+    """
+    Заглушка Bot API: bot{token}/{method} -> {"ok": true, "result": ...}
+
+    Args:
+        latency: задержка ответа на каждый метод, секунды (кроме getUpdates)
+        jitter: случайная добавка к задержке, от 0 до jitter секунд
+        error_rate: доля отправок в чат, на которые приходит 429
+        retry_after: retry_after в ответе 429, секунды
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self._message_id = 0
+        self._replies: Dict[int, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def wait_reply(self, chat_id: int, timeout: float = 10.0) -> Dict[str, Any]:
+        """Дождаться следующего сообщения бота в чат"""
+        return await asyncio.wait_for(self._replies[chat_id].get(), timeout)
+
+    def push_update(self, update: Dict[str, Any]) -> None:
+        """Положить апдейт для getUpdates (режим polling)"""
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """getUpdates: подтверждённые (id < offset) выбрасываются, пустой ответ — после timeout"""
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+
+        return self._updates[:int(params.get("limit") or 100)]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+
+        self.calls[method] += 1
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(params)})
+
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + random.random() * self.jitter)
+
+        if self.error_rate and "chat_id" in params and random.random() < self.error_rate:
+            # Как Telegram при превышении лимитов
+            self.errors[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+
+        return web.json_response({"ok": True, "result": self.result_for(method, params)})
+
+    def result_for(self, method: str, params: Dict[str, Any]) -> Any:
+        """Ответ на метод Bot API"""
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "QuizBot", "username": "quiz_bot"}
+
+        if method in ("sendMessage", "sendDocument"):
+            self._message_id += 1
+            chat_id = int(params["chat_id"])
+            message = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": params.get("text", params.get("caption", "")),
+            }
+            if params.get("reply_markup"):
+                markup = params["reply_markup"]
+                message["reply_markup"] = json.loads(markup) if isinstance(markup, str) else markup
+            self._replies[chat_id].put_nowait(message)
+            return message
+
+        # answerCallbackQuery, setWebhook, deleteWebhook и прочие
+        return True
+
+
+class FakeTelegramClient:
+    """Шлёт апдейты на webhook бота, как это делает Telegram"""
+
+    def __init__(self, webhook_url: str, secret_token: Optional[str] = None):
+        self.webhook_url = webhook_url
+        self.headers = {}
+        if secret_token:
+            self.headers["X-Telegram-Bot-Api-Secret-Token"] = secret_token
+        self._update_id = 0
+        self._session: Optional[ClientSession] = None
+
+    async def __aenter__(self) -> "FakeTelegramClient":
+        self._session = ClientSession()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self._session.close()
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    @staticmethod
+    def _user(user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+    def message_update(self, user_id: int, text: str) -> Dict[str, Any]:
+        """Апдейт с текстовым сообщением от пользователя"""
+        update_id = self._next_id()
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return {"update_id": update_id, "message": message}
+
+    def callback_update(self, user_id: int, data: str) -> Dict[str, Any]:
+        """Апдейт с нажатием inline-кнопки"""
+        update_id = self._next_id()
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "",
+                },
+            },
+        }
+
+    async def post(self, update: Dict[str, Any]) -> float:
+        """Отправить апдейт, вернуть время ответа webhook в секундах"""
+        started = time.perf_counter()
+        async with self._session.post(self.webhook_url, json=update, headers=self.headers) as response:
+            response.raise_for_status()
+            await response.read()
+        return time.perf_counter() - started
@@ -0,0 +1,326 @@
+"""
+Нагрузочный тест полного квиза: сколько людей одновременно выдержит бот
+
+Бот (main.create_bot / create_dispatcher — со всеми middleware, записью
+в базу и журналами) работает против FakeBotAPI в одном процессе. Каждый
+виртуальный пользователь проходит весь путь: /start -> «Да» -> имя ->
+ниша -> вопросы по графу -> результат -> кнопка после результата,
+с паузой «на подумать» между шагами. Апдейты приходят через getUpdates
+(polling) или POST на webhook.
+
+--mode supervisor — масштабирование supervisor.py: тот же сценарий
+прогоняется с 1, 2, ..., --workers воркерами, апдейты раскладываются
+по воркерам как в supervisor (Supervisor.route). FakeBotAPI и виртуальные
+пользователи работают в родительском процессе — для честного замера ему
+нужно своё ядро, т.е. ядер должно быть больше, чем воркеров.
+
+Задержка шага — от отправки апдейта до последнего ответа бота на него.
+Для последнего вопроса это ответ «Анализирую…»; result_delivery — от него
+до самого результата (пауза отложенной доставки входит).
+
+Запуск: python -m loadtest.quiz_load --users 2000 --ramp 20 --think 1 --mode polling
+        python -m loadtest.quiz_load --users 2000 --ramp 5 --think 0.2 --mode supervisor --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import resource
+import socket
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from aiohttp import web
+
+import main as app
+from loadtest.fake_telegram import FakeBotAPI, FakeTelegramClient
+from quiz_graph import QUIZ_GRAPH
+from supervisor import Supervisor
+from webhook import create_webhook_app
+
+SECRET = "load-secret"
+NAMES = ("Анна", "Мария", "Олег", "Ирина", "Дмитрий", "Елена")
+
+
+def buttons(reply: Dict[str, Any]) -> List[str]:
+    """callback_data всех кнопок сообщения"""
+    markup = reply.get("reply_markup") or {}
+    return [
+        button["callback_data"]
+        for row in markup.get("inline_keyboard", [])
+        for button in row
+        if "callback_data" in button
+    ]
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class VirtualUsers:
+    """
+    Сценарий пользователя и сбор задержек
+
+    Args:
+        api: FakeBotAPI, куда бот шлёт ответы
+        send: как доставить апдейт боту (polling, webhook или очередь воркера)
+        think: средняя пауза между шагами, секунды
+        timeout: сколько ждать ответа бота
+    """
+
+    def __init__(self, api: FakeBotAPI, client: FakeTelegramClient, send, think: float, timeout: float):
+        self.api = api
+        self.client = client
+        self.send = send
+        self.think = think
+        self.timeout = timeout
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.updates = 0
+        self.completed = 0
+        self.failed: Dict[str, int] = defaultdict(int)
+
+    async def _pause(self, rng: random.Random) -> None:
+        if self.think:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * self.think)
+
+    async def step(self, name: str, user_id: int, update: Dict[str, Any], replies: int = 1) -> Dict[str, Any]:
+        """Отправить апдейт и дождаться replies ответов; вернуть последний"""
+        started = time.perf_counter()
+        self.updates += 1
+        await self.send(update)
+        reply = None
+        for _ in range(replies):
+            reply = await self.api.wait_reply(user_id, self.timeout)
+        self.latencies[name].append(time.perf_counter() - started)
+        return reply
+
+    async def run_user(self, user_id: int) -> None:
+        rng = random.Random(user_id)
+        client = self.client
+        step_name = "start"
+        try:
+            reply = await self.step("start", user_id, client.message_update(user_id, "/start"))
+            await self._pause(rng)
+
+            step_name = "start_quiz"
+            await self.step(step_name, user_id, client.callback_update(user_id, buttons(reply)[0]))
+            await self._pause(rng)
+
+            # Приветствие по имени + вопрос о нише
+            step_name = "name"
+            reply = await self.step(step_name, user_id, client.message_update(user_id, rng.choice(NAMES)), replies=2)
+            await self._pause(rng)
+
+            step_name = "niche"
+            niches = [data for data in buttons(reply) if not data.endswith(":custom")]
+            reply = await self.step(step_name, user_id, client.callback_update(user_id, rng.choice(niches)))
+
+            while True:
+                options = buttons(reply)
+                if not options or not options[0].startswith("1:a:"):
+                    break
+                await self._pause(rng)
+                choice = rng.choice(options)
+                question, _ = QUIZ_GRAPH.answers[choice.rpartition(":")[2]]
+                step_name = question.id
+                reply = await self.step(step_name, user_id, client.callback_update(user_id, choice))
+
+            # Последний ответ: «Анализирую…» пришёл, результат — через отложенную доставку
+            step_name = "result_delivery"
+            started = time.perf_counter()
+            reply = await self.api.wait_reply(user_id, self.timeout)
+            self.latencies["result_delivery"].append(time.perf_counter() - started)
+            await self._pause(rng)
+
+            step_name = "after_result"
+            after = buttons(reply)
+            # Примерно треть хочет разбор (первая кнопка), остальные — сами
+            choice = after[0] if rng.random() < 0.3 else after[-1]
+            await self.step(step_name, user_id, client.callback_update(user_id, choice))
+            self.completed += 1
+        except (asyncio.TimeoutError, IndexError, KeyError):
+            self.failed[step_name] += 1
+
+    def report(self) -> str:
+        order = ["start", "start_quiz", "name", "niche", *(q.id for q in QUIZ_GRAPH), "result_delivery", "after_result"]
+        lines = [f"{'шаг':<18}{'n':>7}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}"]
+        for name in order:
+            values = sorted(self.latencies.get(name, ()))
+            if not values:
+                continue
+            lines.append(
+                f"{name:<18}{len(values):>7}{percentile(values, 0.5) * 1000:>10.1f}"
+                f"{percentile(values, 0.95) * 1000:>10.1f}{percentile(values, 0.99) * 1000:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+def use_workdir(override: bool = False) -> str:
+    """Всё, что бот пишет на диск, — во временный каталог"""
+    workdir = tempfile.mkdtemp(prefix="quiz_load_")
+    for name, filename in (
+        ("DATABASE_PATH", "quiz_bot.db"), ("STATS_PATH", "stats.json"), ("DELAYED_PATH", "delayed.jsonl"),
+        ("NOTIFY_PATH", "notifications.jsonl"), ("EVENTS_DIR", "events"),
+    ):
+        if override:
+            os.environ[name] = os.path.join(workdir, filename)
+        else:
+            os.environ.setdefault(name, os.path.join(workdir, filename))
+    return workdir
+
+
+def configure_bot(args: argparse.Namespace) -> None:
+    if args.global_rate:
+        app.OUTBOUND.global_rate = args.global_rate
+    else:
+        # Меряем бота, а не лимит Telegram в 30 сообщений/с
+        app.OUTBOUND.global_rate = 1e9
+
+    # Токен любой подходящего формата: запросы уходят в FakeBotAPI
+    app.BOT_TOKEN = "123456:LOADTEST"
+
+
+async def drive(args: argparse.Namespace, users: "VirtualUsers") -> float:
+    """Прогнать всех пользователей; вернуть длительность, секунды"""
+    async def arrive(index: int) -> None:
+        # Пользователи приходят равномерно за ramp секунд
+        await asyncio.sleep(args.ramp * index / args.users)
+        await users.run_user(100000 + index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(arrive(i) for i in range(args.users)))
+    return time.perf_counter() - started
+
+
+async def main(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    await api.start()
+
+    workdir = use_workdir()
+    configure_bot(args)
+    bot = app.create_bot(api.url)
+    dp = app.create_dispatcher()
+
+    runner = None
+    polling = None
+    if args.mode == "webhook":
+        os.environ.setdefault('WEBHOOK_SECRET', SECRET)
+        # startup/shutdown диспетчера вызывает само aiohttp-приложение
+        runner = web.AppRunner(create_webhook_app(dp, bot), access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}{os.getenv('WEBHOOK_PATH', '/webhook')}"
+        client = FakeTelegramClient(url, os.environ['WEBHOOK_SECRET'])
+        await client.__aenter__()
+        send = client.post
+    else:
+        client = FakeTelegramClient("")
+        polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+
+        async def send(update: Dict[str, Any]) -> None:
+            api.push_update(update)
+
+    users = VirtualUsers(api, client, send, think=args.think, timeout=args.timeout)
+    elapsed = await drive(args, users)
+
+    if polling is not None:
+        await dp.stop_polling()
+        await polling
+    else:
+        await client.__aexit__(None, None, None)
+        await runner.cleanup()
+    await bot.session.close()
+    await api.stop()
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(users.report())
+    print()
+    print(f"Пользователей: {args.users}, дошли до конца: {users.completed}, сбои по шагам: {dict(users.failed)}")
+    print(f"Апдейтов: {users.updates} за {elapsed:.1f} с — {users.updates / elapsed:.0f} апдейтов/с")
+    print(f"Bot API: {dict(api.calls)}, 429: {dict(api.errors)}")
+    print(f"📤 Исходящие: {app.OUTBOUND.stats}")
+    print(f"Пиковая память процесса: {peak_rss:.0f} МБ")
+    print(f"Файлы бота: {workdir}")
+
+
+async def sharded(args: argparse.Namespace, port: int, supervisor: Supervisor) -> Tuple["VirtualUsers", float, FakeBotAPI]:
+    """Один прогон против уже запущенных воркеров supervisor"""
+    api = FakeBotAPI(port=port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    await api.start()
+    client = FakeTelegramClient("")
+
+    # Дождаться, пока поднимутся все воркеры: chat_id подряд попадают в разные
+    # (hash(int) % N), поэтому /start от N пользователей будит каждого
+    workers = len(supervisor.queues)
+    for user_id in range(workers):
+        supervisor.route(client.message_update(user_id, "/start"))
+    for user_id in range(workers):
+        await api.wait_reply(user_id, args.timeout)
+
+    async def send(update: Dict[str, Any]) -> None:
+        supervisor.route(update)
+
+    users = VirtualUsers(api, client, send, think=args.think, timeout=args.timeout)
+    elapsed = await drive(args, users)
+    await api.stop()
+    return users, elapsed, api
+
+
+def run_supervisor(args: argparse.Namespace) -> None:
+    """Тот же сценарий с 1..--workers воркерами: апдейтов/с на каждое число воркеров"""
+    configure_bot(args)
+    rows = []
+    for workers in range(1, args.workers + 1):
+        # Воркеры — fork этого процесса, поэтому адрес FakeBotAPI известен до их запуска,
+        # а сам он поднимается потом, в asyncio.run (fork из работающего цикла нельзя)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        app.TELEGRAM_API_URL = f"http://127.0.0.1:{port}"
+        use_workdir(override=True)
+
+        supervisor = Supervisor(workers)
+        supervisor.start()
+        try:
+            users, elapsed, api = asyncio.run(sharded(args, port, supervisor))
+        finally:
+            supervisor.stop()
+        rows.append((workers, users, elapsed, api))
+        print(f"воркеров: {workers} — {users.updates / elapsed:.0f} апдейтов/с", flush=True)
+
+    base = rows[0][1].updates / rows[0][2]
+    print()
+    print(f"{'воркеров':<10}{'апдейтов/с':>12}{'ускорение':>11}{'p95 шага, мс':>14}{'дошли':>8}{'сбои':>7}")
+    for workers, users, elapsed, api in rows:
+        rate = users.updates / elapsed
+        steps = sorted(value for name, values in users.latencies.items() if name != "result_delivery" for value in values)
+        p95 = percentile(steps, 0.95) * 1000 if steps else 0.0
+        print(
+            f"{workers:<10}{rate:>12.0f}{rate / base:>10.2f}x{p95:>14.1f}"
+            f"{users.completed:>8}{sum(users.failed.values()):>7}"
+        )
+    print(f"Ядер: {os.cpu_count()}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1000, help="виртуальных пользователей")
+    parser.add_argument('--ramp', type=float, default=10.0, help="за сколько секунд приходят все пользователи")
+    parser.add_argument('--think', type=float, default=1.0, help="средняя пауза между шагами, с")
+    parser.add_argument('--mode', choices=("polling", "webhook", "supervisor"), default="polling")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="до скольких воркеров (--mode supervisor)")
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка Bot API, с")
+    parser.add_argument('--jitter', type=float, default=0.0, help="случайная добавка к задержке, с")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля отправок с ответом 429")
+    parser.add_argument('--global-rate', type=float, default=0.0, help="общий лимит сообщений/с (0 — без лимита)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="сколько ждать ответа бота, с")
+    args = parser.parse_args()
+    if args.mode == "supervisor":
+        run_supervisor(args)
+    else:
+        asyncio.run(main(args))
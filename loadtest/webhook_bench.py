@@ -0,0 +1,97 @@
+"""
+Пропускная способность webhook-режима без сети
+
+Бот, FakeBotAPI и FakeTelegramClient работают в одном процессе.
+Каждый виртуальный пользователь проходит /start -> «Да» -> имя,
+дожидаясь ответа бота перед следующим шагом.
+
+Запуск: python -m loadtest.webhook_bench --users 500 --concurrency 100
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from handlers import start
+from loadtest.fake_telegram import FakeBotAPI, FakeTelegramClient
+from webhook import create_webhook_app
+
+SECRET = "bench-secret"
+
+
+async def run_user(client: FakeTelegramClient, api: FakeBotAPI, user_id: int, latencies: list) -> None:
+    steps = [
+        (client.message_update(user_id, "/start"), 1),
+        (client.callback_update(user_id, "start_quiz"), 1),
+        (client.message_update(user_id, "Анна"), 2),
+    ]
+    for update, replies in steps:
+        started = time.perf_counter()
+        await client.post(update)
+        for _ in range(replies):
+            await api.wait_reply(user_id)
+        latencies.append(time.perf_counter() - started)
+
+
+async def main(users: int, concurrency: int) -> None:
+    api = FakeBotAPI()
+    await api.start()
+
+    bot = Bot(
+        token="123456:BENCH",
+        session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+    )
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(start.router)
+
+    os.environ.setdefault('WEBHOOK_SECRET', SECRET)
+    app = create_webhook_app(dp, bot)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    latencies: list = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited(client: FakeTelegramClient, user_id: int) -> None:
+        async with limit:
+            await run_user(client, api, user_id, latencies)
+
+    url = f"http://127.0.0.1:{port}{os.getenv('WEBHOOK_PATH', '/webhook')}"
+    async with FakeTelegramClient(url, os.environ['WEBHOOK_SECRET']) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(client, 1000 + i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Пользователей: {users}, апдейтов: {len(latencies)}, за {elapsed:.2f} с")
+    print(f"Апдейтов в секунду: {len(latencies) / elapsed:.0f}")
+    print(
+        f"Задержка шага: p50 {statistics.median(latencies) * 1000:.1f} мс, "
+        f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} мс"
+    )
+    print(f"Вызовы Bot API: {dict(api.calls)}")
+
+    await runner.cleanup()
+    await api.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.concurrency))
@@ -1,8 +1,14 @@
+# Первым: отсюда считается время импортов и запуска (utils/startup.py)
+from utils.startup import STARTUP
+STARTUP.track_imports()
+
 import asyncio
 import logging
+from typing import List, Optional
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 import os
 from dotenv import load_dotenv
@@ -10,11 +16,44 @@ from aiogram.types import BotCommand
 
 
 # Импортируем наш обработчик старта
-from handlers import start
+from handlers import admin, start
+from config import DEFAULT_TEMPLATE
+from scoring import TEMPLATE_CACHE_SIZE, get_result_table, set_template_cache_size, use_bundle, warm_up_templates
+import content_bundle
+from static_messages import NICHES, enable_fast_path
+from storage.factory import create_storage
+from storage.instrumented import InstrumentedStorage
+from outbound import OutboundMiddleware, OutboundScheduler
+from delayed import DelayedScheduler
+from database.recorder import QuizRecorder
+from database.event_log import EventLog
+from utils.analytics import FunnelStats
+from utils.notifications import LeadNotifier
+from utils.metrics import TENANT_MEMORY, MetricsServer, observe_storage, storage_collectors
+from middlewares.metrics import ApiMetricsMiddleware, UpdateMetricsMiddleware
+from middlewares.profiling import ApiTimingMiddleware
+from utils.profiling import record_storage
+from middlewares.startup import FirstUpdateMiddleware
+from tenants import Tenants, use_tenants
+
+STARTUP.imports_done()
 
 # Загружаем переменные из .env
 load_dotenv()
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+# polling (по умолчанию) или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+# Адрес Bot API (можно указать локальный сервер, например для нагрузочных тестов)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+# Эксперты со своими ботами (tenants.py); пусто — один бот BOT_TOKEN
+TENANTS_PATH = os.getenv('TENANTS_PATH', '')
+
+# Лимиты исходящих сообщений (см. outbound.py)
+OUTBOUND = OutboundScheduler(
+    global_rate=float(os.getenv('OUTBOUND_GLOBAL_RATE', 30)),
+    chat_rate=float(os.getenv('OUTBOUND_CHAT_RATE', 1)),
+    chat_burst=float(os.getenv('OUTBOUND_CHAT_BURST', 3)),
+)
 
 # Настройка логирования (чтобы видеть, что происходит)
 logging.basicConfig(
@@ -24,30 +63,202 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def create_session(api_url: Optional[str] = None) -> AiohttpSession:
+    """HTTP-сессия до api_url, TELEGRAM_API_URL или api.telegram.org (одна на всех ботов)"""
+    api_url = api_url or TELEGRAM_API_URL
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url)) if api_url else AiohttpSession()
+
+    # Сколько хендлер ждал Bot API, вместе с очередью (для /profile)
+    session.middleware(ApiTimingMiddleware())
+    # Все отправки идут через очередь с лимитами Telegram
+    session.middleware(OutboundMiddleware(OUTBOUND))
+    # Время и ошибки самих запросов к Bot API (после очереди)
+    session.middleware(ApiMetricsMiddleware())
+
+    return session
+
+
+def create_bot(api_url: Optional[str] = None, token: Optional[str] = None, session: Optional[AiohttpSession] = None) -> Bot:
+    """Бот с токеном token (по умолчанию BOT_TOKEN) на сессии session (по умолчанию — новой)"""
+    return Bot(
+        token=token or BOT_TOKEN,
+        session=session or create_session(api_url),
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+    )
+
+
+def create_bots(api_url: Optional[str] = None) -> List[Bot]:
+    """
+    Боты всех экспертов из TENANTS_PATH на одной HTTP-сессии
+
+    Бот BOT_TOKEN (если задан) — последним: его aiogram передаёт
+    в startup, через него уходят уведомления владельцу.
+    """
+    if not TENANTS_PATH:
+        return [create_bot(api_url)]
+
+    tenants = Tenants.load(TENANTS_PATH)
+    use_tenants(tenants)
+
+    session = create_session(api_url)
+    tokens = [tenant.token for tenant in tenants if tenant.token != BOT_TOKEN]
+    if BOT_TOKEN:
+        tokens.append(BOT_TOKEN)
+    bots = [create_bot(token=token, session=session) for token in tokens]
+
+    # Тексты всех экспертов (и DEFAULT_TEMPLATE) помещаются в кэш разом
+    set_template_cache_size(max(TEMPLATE_CACHE_SIZE, len(tenants) + 1))
+
+    TENANT_MEMORY.collect = lambda: {(name,): size for name, size in tenants.memory().items()}
+    memory = tenants.memory()
+    logger.info(
+        f"👥 Экспертов: {len(tenants)}, ботов: {len(bots)}, "
+        f"на эксперта ~{sum(memory.values()) / max(1, len(memory)) / 1024:.1f} КБ"
+    )
+    return bots
+
+
+def create_dispatcher() -> Dispatcher:
+    """Диспетчер с хранилищем из .env и обработчиками квиза"""
+    # Хранилище FSM выбирается через FSM_STORAGE в .env; каждая операция замеряется
+    storage = InstrumentedStorage(create_storage(), observe_storage, record_storage)
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    dp.update.outer_middleware(FirstUpdateMiddleware(STARTUP))
+    storage_collectors(storage)
+
+    # /metrics для Prometheus (пусто — не поднимать)
+    metrics_port = os.getenv('METRICS_PORT', '')
+    if metrics_port:
+        metrics = MetricsServer(os.getenv('METRICS_HOST', '127.0.0.1'), int(metrics_port))
+        dp.startup.register(metrics.start)
+        dp.shutdown.register(metrics.stop)
+
+    # Админские команды раньше квиза: /stats не должен попасть в ответ на вопрос
+    dp.include_router(admin.router)
+    # Подключаем обработчики из handlers/start.py
+    dp.include_router(start.router)
+
+    # Разбивка времени хендлеров квиза для /profile
+    dp["profiler"] = start.profiler
+
+    # Владелец и админы (/stats): OWNER_ID и ADMIN_IDS через запятую
+    dp["admin_ids"] = frozenset(
+        int(user_id)
+        for user_id in [os.getenv('OWNER_ID', ''), *os.getenv('ADMIN_IDS', '').split(',')]
+        if user_id.strip()
+    )
+
+    # Всё, что бот пишет на диск, включается в .env (пусто — только в памяти / не писать)
+    # Воронка и статистика: счётчики в памяти, раз в минуту — в STATS_PATH
+    funnel = FunnelStats(
+        os.getenv('STATS_PATH') or None,
+        known_niches=tuple(niche for _, niche in NICHES.values() if niche),
+    )
+    dp["funnel"] = funnel
+    start.state_tx.on_transition(funnel.on_transition)
+    dp.startup.register(funnel.start)
+    dp.shutdown.register(funnel.stop)
+
+    # Отложенные доставки (результат квиза через паузу), журнал в DELAYED_PATH
+    delayed = DelayedScheduler(os.getenv('DELAYED_PATH') or None)
+    dp["delayed"] = delayed
+    dp.startup.register(delayed.start)
+    dp.shutdown.register(delayed.stop)
+
+    # Журнал событий квиза для офлайн-анализа (python -m database.event_log EVENTS_DIR)
+    events_dir = os.getenv('EVENTS_DIR', '')
+    events = EventLog(events_dir) if events_dir else None
+    dp["events"] = events
+    if events is not None:
+        start.state_tx.on_transition(events.on_transition)
+        dp.startup.register(events.start)
+        dp.shutdown.register(events.stop)
+
+    # Заявки на разбор — админам эксперта (admin_ids в TENANTS_PATH) или владельцу (OWNER_ID):
+    # сразу или сводкой раз в NOTIFY_WINDOW секунд
+    owner_id = os.getenv('OWNER_ID', '').strip()
+    notifier = LeadNotifier(
+        [int(owner_id)] if owner_id else [],
+        os.getenv('NOTIFY_PATH') or None,
+        window=float(os.getenv('NOTIFY_WINDOW', 60)),
+        max_batch=int(os.getenv('NOTIFY_MAX_BATCH', 20)),
+    ) if owner_id or TENANTS_PATH else None
+    dp["notifier"] = notifier
+    if notifier is not None:
+        dp.startup.register(notifier.start)
+        dp.shutdown.register(notifier.stop)
+
+    # Завершённые квизы и заявки пишутся в SQLite в фоне (пусто — не сохранять)
+    database_path = os.getenv('DATABASE_PATH', '')
+    recorder = QuizRecorder(database_path) if database_path else None
+    dp["recorder"] = recorder
+    if recorder is not None:
+        dp.startup.register(recorder.start)
+        dp.shutdown.register(recorder.stop)
+
+    # Тексты результатов и таблица ответов, собранные заранее (python -m content_bundle);
+    # записи бандла декодируются при первом обращении
+    bundle = content_bundle.load(os.getenv('CONTENT_BUNDLE', content_bundle.DEFAULT_PATH))
+    if bundle is not None:
+        use_bundle(bundle)
+        logger.info(f"📦 Контент из {bundle.path}")
+    else:
+        # Заранее рендерим все тексты результатов
+        warm_up_templates(DEFAULT_TEMPLATE)
+
+        # Таблица результатов на все комбинации ответов + сверка с compute_result
+        checked = get_result_table().verify()
+        logger.info(f"🧮 Таблица результатов: {checked} комбинаций ответов, сверка пройдена")
+
+    # Статичные сообщения можно отправлять с готовым JSON клавиатур
+    if os.getenv('STATIC_FAST_PATH', '0') == '1':
+        enable_fast_path()
+
+    STARTUP.mark("dispatcher")
+    return dp
+
+
+def log_shutdown_stats(dp: Dispatcher) -> None:
+    """Итоговая статистика при остановке"""
+    logger.info(f"📊 FSM: {start.state_tx.stats}")
+    if hasattr(dp.storage, "stats"):
+        logger.info(f"🗄 Хранилище: {dp.storage.stats}")
+    logger.info(f"📤 Исходящие: {OUTBOUND.stats}")
+    logger.info(f"⏰ Ожидают отложенной доставки: {dp['delayed'].pending}")
+    if dp["recorder"] is not None:
+        logger.info(f"🗃 База: {dp['recorder'].stats}")
+    if dp["events"] is not None:
+        logger.info(f"🧾 Событий в журнале: {dp['events'].events}")
+    if dp["notifier"] is not None:
+        logger.info(f"🔔 Уведомления о заявках: {dp['notifier']}")
+
+
 async def main():
     """Главная функция запуска бота"""
     
     logger.info("🚀 Запуск бота...")
     
-    # Создаём бота
-    bot = Bot(
-        token=BOT_TOKEN,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-    )
+    # Создаём ботов (один или по боту на эксперта из TENANTS_PATH)
+    bots = create_bots()
     
     # Создаём диспетчер (обработчик сообщений)
-    dp = Dispatcher(storage=MemoryStorage())
-    
-    # Подключаем обработчики из handlers/start.py
-    dp.include_router(start.router)
+    dp = create_dispatcher()
     
+    logger.info(STARTUP.format_imports())
     logger.info("✅ Бот готов к работе!")
     
     # Запускаем бота (он будет ждать сообщений)
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == 'webhook':
+            from webhook import run_webhook
+            await run_webhook(dp, *bots)
+        else:
+            await dp.start_polling(*bots)
     finally:
-        await bot.session.close()
+        log_shutdown_stats(dp)
+        # Сессия общая — закрываем один раз
+        await bots[0].session.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,105 @@
+"""
+Middleware, которые пишут метрики (utils/metrics.py)
+
+UpdateMetricsMiddleware — outer-middleware диспетчера: все апдейты по типу
+HandlerMetricsMiddleware — роутер квиза: время каждого хендлера
+ApiMetricsMiddleware — сессия бота: время и ошибки запросов к Bot API
+"""
+
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import CallbackQuery, TelegramObject, Update
+
+from callback_index import CallbackIndex
+from utils.metrics import (
+    API_ERRORS,
+    API_SECONDS,
+    HANDLER_ERRORS,
+    HANDLER_SECONDS,
+    UPDATE_SECONDS,
+    UPDATES,
+)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Счётчик апдейтов (для updates/sec) и полное время обработки"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        UPDATES.inc(update_type)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATE_SECONDS.observe(time.perf_counter() - started, update_type)
+
+
+def handler_name(event: TelegramObject, data: Dict[str, Any], callbacks: Optional[CallbackIndex]) -> str:
+    """Имя хендлера: для кнопок — обработчик маршрута из CallbackIndex"""
+    if callbacks is not None and isinstance(event, CallbackQuery):
+        return callbacks.handler_name(event.data) or "unknown_callback"
+    handler = data.get("handler")
+    return getattr(getattr(handler, "callback", None), "__name__", "unknown")
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Время хендлеров по имени
+
+    Регистрируется раньше StateTransactionMiddleware, поэтому в замер
+    входит и запись FSM после хендлера.
+    """
+
+    def __init__(self, callbacks: Optional[CallbackIndex] = None):
+        self.callbacks = callbacks
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = handler_name(event, data, self.callbacks)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            HANDLER_ERRORS.inc(name, type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Время и ошибки запросов к Bot API по методу
+
+    Подключается после OutboundMiddleware: ожидание лимитов в замер не входит,
+    каждый повтор после RetryAfter считается отдельным запросом.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        api_method = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            API_ERRORS.inc(api_method, type(e).__name__)
+            raise
+        finally:
+            API_SECONDS.observe(time.perf_counter() - started, api_method)
@@ -0,0 +1,100 @@
+"""
+Middleware профилирования (utils/profiling.py)
+
+ProfilingMiddleware — роутер квиза: разбивка времени хендлера и cProfile по /profile N
+ApiTimingMiddleware — сессия бота: время ожидания Bot API внутри хендлера
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import FSInputFile, TelegramObject
+
+from callback_index import CallbackIndex
+from middlewares.metrics import handler_name
+from utils.profiling import Profiler, record_api
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    """
+    Разбивка времени хендлеров: Bot API / FSM / CPU
+
+    Регистрируется раньше StateTransactionMiddleware — запись FSM после
+    хендлера попадает в его время.
+    """
+
+    def __init__(self, profiler: Profiler, callbacks: Optional[CallbackIndex] = None):
+        self.profiler = profiler
+        self.callbacks = callbacks
+        self._reports: set = set()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        profiler = self.profiler
+        name = handler_name(event, data, self.callbacks)
+
+        profiler.capture_begin()
+        started, token = profiler.begin()
+        try:
+            return await handler(event, data)
+        finally:
+            profiler.end(name, started, token)
+            report = profiler.capture_end()
+            if report is not None:
+                # Отчёт уходит в фоне — апдейт пользователя его не ждёт
+                task = asyncio.create_task(self._send_report(data["bot"], profiler.capture_chat_id, report))
+                self._reports.add(task)
+                task.add_done_callback(self._reports.discard)
+
+    async def _send_report(self, bot: Bot, chat_id: int, report: Tuple[str, str]) -> None:
+        text_path, prof_path = report
+        try:
+            await bot.send_document(
+                chat_id,
+                FSInputFile(text_path, filename="profile.txt"),
+                caption="🔬 cProfile: cumulative и tottime",
+            )
+            await bot.send_document(
+                chat_id,
+                FSInputFile(prof_path, filename="profile.prof"),
+                caption="Для snakeviz / pstats",
+            )
+        except Exception:
+            logger.exception("Не удалось отправить профиль")
+        finally:
+            os.unlink(text_path)
+            os.unlink(prof_path)
+
+
+class ApiTimingMiddleware(BaseRequestMiddleware):
+    """
+    Время, которое хендлер ждал Bot API
+
+    Подключается раньше OutboundMiddleware: ожидание лимитов тоже
+    считается ожиданием API.
+    """
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            record_api(time.perf_counter() - started)
@@ -0,0 +1,35 @@
+"""
+Время до первого обработанного апдейта (этап first_update в utils.startup)
+"""
+
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from utils.startup import StartupReport
+
+logger = logging.getLogger(__name__)
+
+
+class FirstUpdateMiddleware(BaseMiddleware):
+    """Outer-middleware диспетчера: после первого апдейта отмечает этап и пишет отчёт в лог"""
+
+    def __init__(self, report: StartupReport):
+        self.report = report
+        self.done = False
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        finally:
+            if not self.done:
+                self.done = True
+                seconds = self.report.mark("first_update")
+                logger.info(f"🚀 Первый апдейт обработан через {seconds:.2f} с после запуска ({self.report.format_phases()})")
@@ -0,0 +1,165 @@
+"""
+Транзакция FSM на один апдейт: одно чтение, одна запись
+
+Хендлер работает с локальной копией состояния и данных, а в хранилище
+всё уходит одной записью после успешного завершения хендлера.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import TelegramObject
+
+
+class StateTransaction:
+    """
+    Локальная копия FSM-состояния пользователя на время одного апдейта
+
+    Интерфейс повторяет FSMContext (get_data / update_data / set_state),
+    поэтому хендлеры переписываются заменой state -> tx.
+    """
+
+    def __init__(self, context: FSMContext, raw_state: Optional[str]):
+        self.context = context
+        # Состояние уже прочитано FSMContextMiddleware — повторно не читаем
+        self._state = raw_state
+        self._data: Optional[Dict[str, Any]] = None
+
+        self._state_dirty = False
+        self._data_dirty = False
+
+        # Счётчики обращений к хранилищу
+        self.reads = 0
+        self.writes = 0
+
+    async def _load(self) -> Dict[str, Any]:
+        """Прочитать данные из хранилища (один раз за апдейт)"""
+        if self._data is None:
+            # QuizRedisStorage читает данные вместе с состоянием — второй запрос не нужен
+            take = getattr(self.context.storage, "take_prefetched_data", None)
+            data = take(self.context.key) if take is not None else None
+            if data is None:
+                data = await self.context.storage.get_data(key=self.context.key)
+                self.reads += 1
+            self._data = data
+        return self._data
+
+    @property
+    def state(self) -> Optional[str]:
+        """Текущее (возможно, ещё не записанное) состояние"""
+        return self._state
+
+    async def get_state(self) -> Optional[str]:
+        return self._state
+
+    async def set_state(self, state: Union[State, str, None] = None) -> None:
+        self._state = state.state if isinstance(state, State) else state
+        self._state_dirty = True
+
+    async def get_data(self) -> Dict[str, Any]:
+        return (await self._load()).copy()
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self._data = data.copy()
+        self._data_dirty = True
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        current = await self._load()
+        if data:
+            current.update(data)
+        current.update(kwargs)
+        self._data_dirty = True
+        return current.copy()
+
+    async def flush(self) -> None:
+        """Записать изменения в хранилище одной операцией"""
+        storage = self.context.storage
+        key = self.context.key
+
+        if self._state_dirty and self._data_dirty and hasattr(storage, "set_state_and_data"):
+            # Хранилище умеет писать состояние и данные атомарно (одним запросом)
+            await storage.set_state_and_data(key=key, state=self._state, data=self._data)
+            self.writes += 1
+        else:
+            if self._data_dirty:
+                await storage.set_data(key=key, data=self._data)
+                self.writes += 1
+            if self._state_dirty:
+                await storage.set_state(key=key, state=self._state)
+                self.writes += 1
+
+        self._state_dirty = self._data_dirty = False
+
+
+@dataclass
+class StorageOpStats:
+    """Счётчики операций с хранилищем"""
+    updates: int = 0
+    reads: int = 0
+    writes: int = 0
+
+    @property
+    def ops_per_update(self) -> float:
+        if not self.updates:
+            return 0.0
+        return (self.reads + self.writes) / self.updates
+
+    def __str__(self) -> str:
+        return (
+            f"апдейтов: {self.updates}, чтений: {self.reads}, записей: {self.writes}, "
+            f"операций на апдейт: {self.ops_per_update:.2f}"
+        )
+
+
+# (user_id, старое состояние, новое состояние) — вызывается после записи
+TransitionListener = Callable[[int, Optional[str], Optional[str]], None]
+
+
+class StateTransactionMiddleware(BaseMiddleware):
+    """
+    Передаёт в хендлер tx: StateTransaction и сохраняет изменения после него
+
+    Если хендлер упал — ничего не записываем, состояние пользователя
+    остаётся прежним и кнопку можно нажать ещё раз.
+    После записи сменившееся состояние передаётся слушателям (on_transition).
+    """
+
+    def __init__(self):
+        self.stats = StorageOpStats()
+        self.listeners: List[TransitionListener] = []
+
+    def on_transition(self, listener: TransitionListener) -> TransitionListener:
+        """Подписаться на переходы между состояниями"""
+        self.listeners.append(listener)
+        return listener
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        context: Optional[FSMContext] = data.get("state")
+        if context is None:
+            return await handler(event, data)
+
+        previous = data.get("raw_state")
+        tx = StateTransaction(context, previous)
+        data["tx"] = tx
+
+        result = await handler(event, data)
+        await tx.flush()
+
+        if tx.state != previous:
+            for listener in self.listeners:
+                listener(context.key.user_id, previous, tx.state)
+
+        self.stats.updates += 1
+        # +1 чтение: get_state, который делает FSMContextMiddleware
+        self.stats.reads += tx.reads + 1
+        self.stats.writes += tx.writes
+
+        return result
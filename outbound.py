@@ -0,0 +1,273 @@
+"""
+Исходящие сообщения с учётом лимитов Telegram
+
+Все вызовы Bot API с chat_id проходят через OutboundMiddleware:
+  - глобальный token bucket (~30 сообщений/с) на каждого бота,
+  - token bucket на каждый чат бота (~1 сообщение/с с небольшим запасом),
+  - приоритеты: результат квиза уходит раньше приветствий,
+  - TelegramRetryAfter не теряет сообщение — запрос повторяется после паузы.
+
+Приоритет задаётся в хендлере:
+    with send_priority(Priority.RESULT):
+        await callback.message.answer(...)
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    """Очередность отправки (меньше — раньше)"""
+    RESULT = 0      # Результат диагностики и кнопки после него
+    QUIZ = 1        # Вопросы квиза
+    DEFAULT = 2     # Приветствия и всё остальное
+
+
+_priority: ContextVar[Priority] = ContextVar("send_priority", default=Priority.DEFAULT)
+
+
+@contextmanager
+def send_priority(priority: Priority) -> Iterator[None]:
+    """Задать приоритет для отправок внутри блока"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """Token bucket с резервированием: reserve() возвращает, сколько ждать"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        # Отрицательный остаток — очередь: ждём, пока он восполнится
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие seconds секунд (после RetryAfter)"""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+@dataclass
+class OutboundStats:
+    """Метрики исходящей очереди"""
+    sent: int = 0
+    retries: int = 0
+    failed: int = 0
+    queue_depth: int = 0            # Ждут глобального токена прямо сейчас
+    max_queue_depth: int = 0
+    latency_total: float = 0.0      # От постановки в очередь до ответа Telegram
+    latency_max: float = 0.0
+
+    @property
+    def latency_avg(self) -> float:
+        return self.latency_total / self.sent if self.sent else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"отправлено: {self.sent}, повторов: {self.retries}, ошибок: {self.failed}, "
+            f"очередь: {self.queue_depth} (макс. {self.max_queue_depth}), "
+            f"задержка: ср. {self.latency_avg * 1000:.0f} мс, макс. {self.latency_max * 1000:.0f} мс"
+        )
+
+
+class _BotLane:
+    """Поток одного бота: свой глобальный бакет, очередь и выдача токенов"""
+
+    __slots__ = ("bucket", "queue", "wakeup", "worker")
+
+    def __init__(self, rate: float):
+        self.bucket = TokenBucket(rate, rate)
+        self.queue: List[Tuple[int, int, asyncio.Future]] = []
+        # Создаются в OutboundScheduler.start(): Event и задача привязаны
+        # к циклу событий, а планировщик — глобальный объект и переживает asyncio.run()
+        self.wakeup: Optional[asyncio.Event] = None
+        self.worker: "asyncio.Task | None" = None
+
+
+class OutboundScheduler:
+    """
+    Выдаёт разрешения на отправку с учётом лимитов и приоритетов
+
+    Сначала запрос ждёт токен своего чата (порядок в чате сохраняется),
+    затем встаёт в очередь своего бота с приоритетом за его глобальным
+    токеном. Telegram ограничивает каждый токен отдельно, поэтому у каждого
+    бота свой бакет на global_rate и своя очередь — занятый бот не
+    задерживает соседей.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        max_retries: int = 3,
+    ):
+        # Сообщений/с на бота; применяется к ботам, ещё не отправлявшим сообщений
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self.stats = OutboundStats()
+
+        # (bot_id, chat_id) -> бакет: лимит на чат у каждого бота свой
+        self._chats: Dict[Tuple[int, Any], TokenBucket] = {}
+        self._lanes: Dict[int, _BotLane] = {}
+        self._seq = itertools.count()
+
+    def _lane(self, bot_id: int) -> _BotLane:
+        lane = self._lanes.get(bot_id)
+        if lane is None:
+            lane = self._lanes[bot_id] = _BotLane(self.global_rate)
+        return lane
+
+    def global_bucket(self, bot_id: int) -> TokenBucket:
+        """Глобальный бакет бота"""
+        return self._lane(bot_id).bucket
+
+    def _chat_bucket(self, bot_id: int, chat_id: Any) -> TokenBucket:
+        key = (bot_id, chat_id)
+        bucket = self._chats.get(key)
+        if bucket is None:
+            bucket = self._chats[key] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self._chats) > 100_000:
+                self._forget_idle_chats()
+        return bucket
+
+    def _forget_idle_chats(self) -> None:
+        """Убрать чаты с полным бакетом — они ничем не отличаются от новых"""
+        now = time.monotonic()
+        for key, bucket in list(self._chats.items()):
+            if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.capacity:
+                del self._chats[key]
+
+    def start(self, lane: _BotLane) -> None:
+        """Запустить выдачу токенов бота в текущем цикле событий"""
+        loop = asyncio.get_running_loop()
+        # Запросы из прошлого цикла ждать уже некому
+        alive = [item for item in lane.queue if item[2].get_loop() is loop]
+        self.stats.queue_depth -= len(lane.queue) - len(alive)
+        heapq.heapify(alive)
+        lane.queue = alive
+        lane.wakeup = asyncio.Event()
+        lane.worker = loop.create_task(self._grant_loop(lane))
+
+    async def acquire(self, bot_id: int, chat_id: Any, priority: Priority) -> None:
+        """Дождаться права отправить сообщение в чат от имени бота"""
+        delay = self._chat_bucket(bot_id, chat_id).reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+        lane = self._lane(bot_id)
+        if lane.worker is None or lane.worker.done():
+            self.start(lane)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(lane.queue, (int(priority), next(self._seq), future))
+        self.stats.queue_depth += 1
+        self.stats.max_queue_depth = max(self.stats.max_queue_depth, self.stats.queue_depth)
+        lane.wakeup.set()
+        await future
+
+    async def _grant_loop(self, lane: _BotLane) -> None:
+        """Выдаёт глобальные токены бота по приоритету"""
+        while True:
+            while not lane.queue:
+                lane.wakeup.clear()
+                await lane.wakeup.wait()
+
+            delay = lane.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+
+            # Берём самый приоритетный запрос на момент выдачи токена
+            while lane.queue:
+                _, _, future = heapq.heappop(lane.queue)
+                self.stats.queue_depth -= 1
+                if not future.done():
+                    future.set_result(None)
+                    break
+
+    def retry_after(self, bot_id: int, chat_id: Any, seconds: float) -> None:
+        """
+        Telegram попросил подождать: 429 на отправку в чат придерживает
+        только этот чат, без chat_id — весь поток бота
+        """
+        if chat_id is None:
+            self.global_bucket(bot_id).pause(seconds)
+        else:
+            self._chat_bucket(bot_id, chat_id).pause(seconds)
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """Request-middleware сессии бота: лимиты и повтор после RetryAfter"""
+
+    def __init__(self, scheduler: OutboundScheduler):
+        self.scheduler = scheduler
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Any:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            # answerCallbackQuery, getUpdates и т.п. — не под лимитом сообщений,
+            # но их 429 — общий для бота: придерживаем все отправки
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.scheduler.retry_after(bot.id, None, e.retry_after)
+                raise
+
+        scheduler = self.scheduler
+        priority = _priority.get()
+        started = time.monotonic()
+
+        for attempt in range(scheduler.max_retries + 1):
+            await scheduler.acquire(bot.id, chat_id, priority)
+            try:
+                result = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == scheduler.max_retries:
+                    scheduler.stats.failed += 1
+                    raise
+                scheduler.stats.retries += 1
+                logger.warning(f"⏳ RetryAfter {e.retry_after} с для чата {chat_id}, повторяю")
+                scheduler.retry_after(bot.id, chat_id, e.retry_after)
+                continue
+
+            latency = time.monotonic() - started
+            scheduler.stats.sent += 1
+            scheduler.stats.latency_total += latency
+            scheduler.stats.latency_max = max(scheduler.stats.latency_max, latency)
+            return result
@@ -0,0 +1,272 @@
+"""
+Вопросы квиза как данные: тексты, варианты, баллы боли и переходы
+
+Чтобы добавить вопрос — добавьте Question в QUESTIONS (и состояние
+в QuizStates). Отдельный хендлер не нужен: все ответы обрабатывает
+handle_answer в handlers/start.py по графу из quiz_graph.py.
+"""
+
+from typing import Optional, Tuple
+from dataclasses import dataclass
+
+from config import Zone
+
+
+@dataclass(frozen=True)
+class Option:
+    """Вариант ответа (кнопка)"""
+    id: str                             # callback_data кнопки
+    button: str                         # Текст кнопки
+    answer: str = ""                    # Что сохраняем как ответ
+    pain: int = 0                       # Баллы боли в зону вопроса
+    complaint: int = 0                  # Жалобность (для fallback perceived)
+    perceived: Optional[Zone] = None    # Зона, которую человек считает проблемой
+
+
+@dataclass(frozen=True)
+class Question:
+    """Вопрос квиза"""
+    id: str                             # ID вопроса
+    state: str                          # Имя состояния в QuizStates
+    text: str                           # Текст вопроса
+    options: Tuple[Option, ...]
+    answer_key: Optional[str] = None    # Ключ ответа в данных FSM
+    zone: Optional[Zone] = None         # Диагностическая зона (для баллов боли)
+    next: Optional[str] = None          # Следующий вопрос (None — показать результат)
+    reset_scores: bool = False          # Обнулить счётчики боли при ответе
+
+
+# ========================================
+# ТОЧКА А И ЦЕЛИ
+# ========================================
+
+# Текст вопроса 1 собирается в хендлере ниши (подставляются имя и ниша)
+Q1 = Question(
+    id="q1",
+    state="question_1",
+    text="",
+    answer_key="question_1",
+    next="q2",
+    options=(
+        Option("q1_better", "📈 Лучше, чем предыдущие годы", "Лучше, чем предыдущие годы"),
+        Option("q1_same", "➡️ Примерно на том же уровне", "Примерно на том же уровне"),
+        Option("q1_worse", "📉 Хуже, чем хотелось бы", "Хуже, чем хотелось бы"),
+    ),
+)
+
+Q2 = Question(
+    id="q2",
+    state="question_2",
+    text=(
+        "✅ Принято!\n\n"
+        "Для начала зафиксируем, с чем ты входишь в 2026.\n"
+        "Мне не нужны точные цифры, главное — порядок.\n\n"
+        "<b>Вопрос 2. Доход за 2025</b>\n\n"
+        "Примерно какой был твой средний ежемесячный доход в 2025?\n"
+        "На каком уровне ты сейчас?"
+    ),
+    answer_key="question_2",
+    next="q3",
+    options=(
+        Option("q2_under50", "💵 До 50 000 в месяц", "До 50 000 в месяц"),
+        Option("q2_50to100", "💰 50–100 000", "50–100 000"),
+        Option("q2_100to300", "💎 100–300 000", "100–300 000"),
+        Option("q2_over300", "🚀 300 000+", "300 000+"),
+    ),
+)
+
+Q3 = Question(
+    id="q3",
+    state="question_3",
+    text=(
+        "✅ Отлично! Зафиксировали!\n\n"
+        "📍 <b>Точка Б: куда хочешь прийти в 2026?</b>\n\n"
+        "Теперь давай зафиксируем, чего ты хочешь от 2026 года, чтобы сказать:\n"
+        "«Да, этот год я прожил(а) не зря».\n\n"
+        "<b>Вопрос 3. Цель по доходу</b>\n\n"
+        "Что для тебя про рост в 2026?"
+    ),
+    answer_key="question_3",
+    next="perceived",
+    # Инициализируем счётчики боли для диагностики
+    reset_scores=True,
+    options=(
+        Option("q3_x2x3", "📊 Стабильно x2–x3 от того, что есть сейчас",
+               "Стабильно x2–x3 от того, что есть сейчас"),
+        Option("q3_x5x10", "🚀 Резкий рывок x5–x10, готов(а) вкалывать, даже если страшно",
+               "Резкий рывок x5–x10, готов(а) вкалывать"),
+        Option("q3_x100", "💎 Мечтаю про x100, но не понимаю \"как\"",
+               "Мечтаю про x100, но не понимаю \"как\""),
+        Option("q3_survive", "🌱 Хочу наконец перестать выживать и нормально жить",
+               "Хочу перестать выживать и нормально жить"),
+    ),
+)
+
+# Вопрос PERCEIVED: что человек ДУМАЕТ, что мешает (для твиста)
+Q_PERCEIVED = Question(
+    id="perceived",
+    state="question_perceived",
+    text=(
+        "✅ Супер! Твоя цель зафиксирована!\n\n"
+        "🤔 <b>Давай честно:</b>\n\n"
+        "Как тебе кажется, что <b>больше всего</b> мешает росту прямо сейчас?\n\n"
+        "Выбери то, что первым приходит в голову, когда думаешь: "
+        "«Вот если бы ЭТО решить — сразу полегчало бы»."
+    ),
+    next="q4",
+    options=(
+        Option("perceived_product", "📦 Слабое предложение / не понимаю, что продавать",
+               perceived="product"),
+        Option("perceived_traffic", "👥 Мало новых людей, слабый трафик",
+               perceived="traffic"),
+        Option("perceived_content", "📝 Не доверяют / мало прогрева к продукту",
+               perceived="content"),
+        Option("perceived_sales", "💰 Трудно продавать / стыдно / не умею",
+               perceived="sales"),
+        Option("perceived_system", "⚙️ Нет времени / сил / структуры",
+               perceived="system"),
+    ),
+)
+
+
+# ========================================
+# ДИАГНОСТИКА: 5 ЗОН
+# ========================================
+
+Q4 = Question(
+    id="q4",
+    state="question_4",
+    text=(
+        "✅ Супер! Твоя цель зафиксирована!\n\n"
+        "🔍 <b>Диагностика: 5 зон, где «течёт» результат</b>\n\n"
+        "Теперь проверим 5 ключевых точек, где чаще всего теряются деньги.\n"
+        "Я задам по одному вопросу на каждую зону — отвечай честно.\n\n"
+        "📦 <b>Продукт/предложение</b>\n\n"
+        "Начнём с самого очевидного вопроса: что ты продаёшь?\n\n"
+        "Представь, что я твой идеальный клиент.\n"
+        "Можешь ли ты за 1–2 предложения объяснить, что именно я у тебя могу купить? "
+        "Чем ты мне можешь помочь?"
+    ),
+    answer_key="question_4",
+    zone="product",
+    next="q5",
+    options=(
+        # Понятное предложение - нет боли
+        Option("q4_clear", "✅ Да, у меня есть понятное предложение",
+               "Да, у меня есть понятное предложение", pain=0, complaint=0),
+        # Запинается - средняя боль
+        Option("q4_medium", "🤔 Примерно могу, но запинаюсь",
+               "Примерно могу, но запинаюсь", pain=1, complaint=1),
+        # Каша в голове - высокая боль
+        Option("q4_chaos", "😵 Нет, у меня миллион идей и форматов, хочу всё и сразу",
+               "Нет, у меня миллион идей и форматов", pain=2, complaint=2),
+    ),
+)
+
+Q5 = Question(
+    id="q5",
+    state="question_5",
+    text=(
+        "✅ Принято!\n\n"
+        "👥 <b>Поток людей (трафик)</b>\n\n"
+        "Хороший продукт без людей — это как концерт в пустом зале.\n\n"
+        "Насколько стабильно к тебе приходят новые люди?"
+    ),
+    answer_key="question_5",
+    zone="traffic",
+    next="q6",
+    options=(
+        # Стабильный трафик - нет боли
+        Option("q5_stable", "✅ Новые люди стабильно приходят каждую неделю",
+               "Новые люди стабильно приходят каждую неделю", pain=0, complaint=0),
+        # Нестабильный - средняя боль
+        Option("q5_unstable", "🤷 Иногда прибавляется кто-то, иногда тишина",
+               "Иногда прибавляется кто-то, иногда тишина", pain=1, complaint=1),
+        # Нет новых людей - высокая боль
+        Option("q5_stagnant", "😞 Практически одни и те же лица везде, никого нового",
+               "Практически одни и те же лица везде, никого нового", pain=2, complaint=2),
+    ),
+)
+
+Q6 = Question(
+    id="q6",
+    state="question_6",
+    text=(
+        "✅ Зафиксировали!\n\n"
+        "📝 <b>Контент / доверие</b>\n\n"
+        "Люди покупают не только продукт, но и историю, в которую ты их зовёшь.\n\n"
+        "Как ты ведёшь контент в своих основных площадках?"
+    ),
+    answer_key="question_6",
+    zone="content",
+    next="q7",
+    options=(
+        # Регулярный контент с логикой - нет боли
+        Option("q6_regular", "✅ Регулярно, с понятными темами и рубриками",
+               "Регулярно, с понятными темами и рубриками", pain=0, complaint=0),
+        # Нерегулярно, как попало - высокая боль
+        Option("q6_irregular", "🎨 Пишу/выступаю когда есть вдохновение и силы, как попало",
+               "Пишу когда есть вдохновение, как попало", pain=2, complaint=2),
+        # Нет логики прогрева к продукту - высокая боль
+        Option("q6_no_funnel", "📚 Часто даю пользу, но почти не веду к продукту",
+               "Часто даю пользу, но почти не веду к продукту", pain=4, complaint=4),
+    ),
+)
+
+Q7 = Question(
+    id="q7",
+    state="question_7",
+    text=(
+        "✅ Понял!\n\n"
+        "💰 <b>Продажи и офферы</b>\n\n"
+        "Теперь про самое «любимое» — продажи.\n\n"
+        "Как часто ты прямо и спокойно говоришь людям:\n"
+        "«Вот мой формат работы, вот стоимость, вот как записаться»?"
+    ),
+    answer_key="question_7",
+    zone="sales",
+    next="q8",
+    options=(
+        # Регулярно продаёт - нет боли
+        Option("q7_regular", "✅ Регулярно, мне ок с продажами. Не стесняюсь",
+               "Регулярно, мне ок с продажами. Не стесняюсь", pain=0, complaint=0),
+        # Иногда, когда прижало - средняя боль
+        Option("q7_sometimes", "🤔 Иногда, когда уже прижало",
+               "Иногда, когда уже прижало", pain=1, complaint=1),
+        # Стыдно продавать - ЖИРНАЯ БОЛЬ, самая жалобная
+        Option("q7_ashamed", "😳 Стыдно продавать, надеюсь, что сами догадаются и спросят",
+               "Стыдно продавать, надеюсь, что сами догадаются", pain=3, complaint=3),
+    ),
+)
+
+Q8 = Question(
+    id="q8",
+    state="question_8",
+    text=(
+        "✅ Зафиксировал!\n\n"
+        "⚙️ <b>Система / ресурс</b>\n\n"
+        "И ещё вопрос не про цифры, а про выживание.\n\n"
+        "Если к тебе завтра придут 20 клиентов одновременно, что произойдёт?"
+    ),
+    answer_key="question_8",
+    zone="system",
+    next=None,
+    options=(
+        # Готов масштабироваться - нет боли
+        Option("q8_scale", "✅ Распланирую и справлюсь",
+               "Распланирую и справлюсь", pain=0, complaint=0),
+        # Напрячётся, но справится - средняя боль
+        Option("q8_struggle", "😰 Придётся напрячься, но, наверное, как-нибудь вытяну",
+               "Придётся напрячься, но вытяну", pain=1, complaint=1),
+        # Сгорит и запутается - высокая боль (нет масштабируемости)
+        Option("q8_burnout", "🔥 Сгорю, запутаюсь и начну сливать. Испорчу отношения с половиной",
+               "Сгорю, запутаюсь и начну сливать", pain=3, complaint=3),
+    ),
+)
+
+
+# Порядок важен только для читаемости: переходы задаются полем next
+QUESTIONS: Tuple[Question, ...] = (Q1, Q2, Q3, Q_PERCEIVED, Q4, Q5, Q6, Q7, Q8)
+
+# С какого вопроса начинается квиз после выбора ниши
+FIRST_QUESTION = "q1"
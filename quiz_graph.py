@@ -0,0 +1,63 @@
+"""
+Граф квиза: вопросы из questions.py, собранные в неизменяемые индексы
+
+Собирается один раз при импорте. Хендлеру на каждый ответ нужен
+один поиск по callback_data — без построения словарей и списков.
+"""
+
+from types import MappingProxyType
+from typing import Iterator, Mapping, Optional, Tuple
+
+from config import ZONE_MAX
+from questions import FIRST_QUESTION, QUESTIONS, Option, Question
+
+
+class QuizGraph:
+    """Неизменяемый граф вопросов"""
+
+    __slots__ = ("questions", "answers", "first")
+
+    def __init__(self, questions: Tuple[Question, ...], first: str):
+        by_id = {}
+        answers = {}
+
+        for question in questions:
+            if question.id in by_id:
+                raise ValueError(f"Повторяется id вопроса: {question.id}")
+            by_id[question.id] = question
+
+            if question.zone is not None and question.zone not in ZONE_MAX:
+                raise ValueError(f"Вопрос {question.id}: неизвестная зона {question.zone}")
+
+            for option in question.options:
+                if option.id in answers:
+                    raise ValueError(f"Повторяется callback_data: {option.id}")
+                answers[option.id] = (question, option)
+
+        for question in questions:
+            if question.next is not None and question.next not in by_id:
+                raise ValueError(f"Вопрос {question.id}: нет следующего вопроса {question.next}")
+
+        if first not in by_id:
+            raise ValueError(f"Нет первого вопроса {first}")
+
+        self.questions: Mapping[str, Question] = MappingProxyType(by_id)
+        # callback_data -> (вопрос, вариант)
+        self.answers: Mapping[str, Tuple[Question, Option]] = MappingProxyType(answers)
+        self.first = by_id[first]
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions.values())
+
+    @property
+    def option_ids(self) -> frozenset:
+        return frozenset(self.answers)
+
+    def next_question(self, question: Question) -> Optional[Question]:
+        """Следующий вопрос или None, если пора показывать результат"""
+        if question.next is None:
+            return None
+        return self.questions[question.next]
+
+
+QUIZ_GRAPH = QuizGraph(QUESTIONS, FIRST_QUESTION)
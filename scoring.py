@@ -2,20 +2,27 @@
 Алгоритм подсчета и определения главного "похитителя X100"
 """
 
-from typing import Dict, Optional, Tuple
+import logging
+from collections import OrderedDict
+from functools import cached_property
+from itertools import product
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Sequence, Tuple
 from dataclasses import dataclass, field
+import config
 from config import (
     Zone,
-    ZONE_MAX,
-    ZONE_PRIORITY,
     ZONE_LABEL,
-    TWIST_THRESHOLD,
     TemplateVars,
     DEFAULT_TEMPLATE,
     COMMON_COMPLAINTS,
     RESULT_SERIES_MAP,
     ResultSeries,
 )
+from questions import Option, Question
+from quiz_graph import QUIZ_GRAPH, QuizGraph
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -45,7 +52,7 @@ def normalize_scores(scores: Dict[Zone, int]) -> Dict[Zone, float]:
         Нормализованные баллы от 0.0 до 1.0 для каждой зоны
     """
     return {
-        zone: scores[zone] / ZONE_MAX[zone]
+        zone: scores[zone] / config.ZONE_MAX[zone]
         for zone in scores.keys()
     }
 
@@ -60,7 +67,7 @@ def pick_max_zone(norm_scores: Dict[Zone, float]) -> Zone:
     tied = [zone for zone, score in norm_scores.items() if score == max_val]
 
     # Тай-брейк: выбираем по приоритету
-    for zone in ZONE_PRIORITY:
+    for zone in config.ZONE_PRIORITY:
         if zone in tied:
             return zone
 
@@ -80,14 +87,14 @@ def pick_perceived_fallback(state: AnswersState) -> Optional[Zone]:
     return None
 
 
-@dataclass
+@dataclass(frozen=True)
 class DiagnosticResult:
     """Результат диагностики"""
     bottleneck: Zone              # Главный похититель (реальный)
     perceived: Optional[Zone]     # Что человек ДУМАЕТ
     twist: bool                   # Показывать ли твист
-    norm_scores: Dict[Zone, float]  # Нормализованные баллы
-    raw_scores: Dict[Zone, int]   # Сырые баллы
+    norm_scores: Mapping[Zone, float]  # Нормализованные баллы
+    raw_scores: Mapping[Zone, int]     # Сырые баллы
 
 
 def compute_result(state: AnswersState) -> DiagnosticResult:
@@ -111,7 +118,7 @@ def compute_result(state: AnswersState) -> DiagnosticResult:
     if perceived and perceived != bottleneck:
         # Проверяем, достаточно ли разница для твиста
         diff = norm_scores[bottleneck] - norm_scores[perceived]
-        twist = diff >= TWIST_THRESHOLD
+        twist = diff >= config.TWIST_THRESHOLD
 
     return DiagnosticResult(
         bottleneck=bottleneck,
@@ -122,6 +129,164 @@ def compute_result(state: AnswersState) -> DiagnosticResult:
     )
 
 
+# ========================================
+# ТАБЛИЦА ВСЕХ ВАРИАНТОВ ОТВЕТОВ
+# ========================================
+
+# Ключ таблицы: (perceived зона или None, id выбранных вариантов
+# диагностических вопросов в порядке квиза)
+AnswerKey = Tuple[Optional[Zone], Tuple[str, ...]]
+
+
+def _config_fingerprint() -> tuple:
+    """
+    Всё из config, от чего зависит compute_result
+
+    Значения читаются через модуль config (а не копии из import), поэтому
+    видна и правка словаря на месте, и новое присваивание config.TWIST_THRESHOLD,
+    и importlib.reload(config).
+    """
+    return (tuple(config.ZONE_MAX.items()), tuple(config.ZONE_PRIORITY), config.TWIST_THRESHOLD)
+
+
+def _freeze(result: DiagnosticResult) -> DiagnosticResult:
+    """Результат с неизменяемыми словарями баллов (один объект на всех)"""
+    return DiagnosticResult(
+        bottleneck=result.bottleneck,
+        perceived=result.perceived,
+        twist=result.twist,
+        norm_scores=MappingProxyType(dict(result.norm_scores)),
+        raw_scores=MappingProxyType(dict(result.raw_scores)),
+    )
+
+
+class ResultTable:
+    """
+    Результаты для всех комбинаций ответов, посчитанные заранее
+
+    Пространство ответов маленькое: 3 варианта на каждый из пяти
+    диагностических вопросов × (5 perceived + нет ответа) = 1458 записей.
+    Завершение квиза — один поиск в словаре.
+    """
+
+    __slots__ = ("questions", "perceived", "results", "fingerprint")
+
+    def __init__(self, graph: QuizGraph, rows: Optional[Sequence[tuple]] = None):
+        """rows — готовые записи из content_bundle (тогда compute_result не вызывается)"""
+        path = []
+        question = graph.first
+        while question is not None:
+            path.append(question)
+            question = graph.next_question(question)
+
+        # Диагностические вопросы (с зоной) в порядке прохождения
+        self.questions: Tuple[Question, ...] = tuple(q for q in path if q.zone)
+        self.perceived: Tuple[Optional[Zone], ...] = (None,) + tuple(dict.fromkeys(
+            option.perceived for q in path for option in q.options if option.perceived
+        ))
+        self.fingerprint = _config_fingerprint()
+
+        results: Dict[AnswerKey, DiagnosticResult] = {}
+        if rows is not None:
+            for key, (bottleneck, perceived, twist, norm_scores, raw_scores) in rows:
+                results[key] = DiagnosticResult(
+                    bottleneck=bottleneck,
+                    perceived=perceived,
+                    twist=twist,
+                    norm_scores=MappingProxyType(dict(norm_scores)),
+                    raw_scores=MappingProxyType(dict(raw_scores)),
+                )
+        else:
+            for perceived in self.perceived:
+                for options in product(*(q.options for q in self.questions)):
+                    key = (perceived, tuple(option.id for option in options))
+                    results[key] = _freeze(compute_result(self.state_for(perceived, options)))
+
+        self.results: Mapping[AnswerKey, DiagnosticResult] = MappingProxyType(results)
+
+    def state_for(self, perceived: Optional[Zone], options: Sequence[Option]) -> AnswersState:
+        """AnswersState, который накопит хендлер при таких ответах"""
+        scores = {zone: 0 for zone in config.ZONE_MAX}
+        complaint_best = None
+
+        for question, option in zip(self.questions, options):
+            scores[question.zone] += option.pain
+            if not complaint_best or option.complaint > complaint_best[1]:
+                complaint_best = (question.zone, option.complaint)
+
+        return AnswersState(scores=scores, perceived_zone=perceived, complaint_best=complaint_best)
+
+    def rows(self) -> Tuple[tuple, ...]:
+        """Записи таблицы в виде простых кортежей (для content_bundle)"""
+        return tuple(
+            (key, (r.bottleneck, r.perceived, r.twist, tuple(r.norm_scores.items()), tuple(r.raw_scores.items())))
+            for key, r in self.results.items()
+        )
+
+    def get(self, perceived: Optional[Zone], option_ids: Tuple[str, ...]) -> Optional[DiagnosticResult]:
+        """Результат по ответам или None, если ответов не хватает"""
+        return self.results.get((perceived, option_ids))
+
+    def verify(self) -> int:
+        """
+        Самопроверка: каждая запись совпадает с compute_result
+
+        Returns:
+            Число проверенных записей
+
+        Raises:
+            ValueError: при первом расхождении
+        """
+        options = {option.id: option for q in self.questions for option in q.options}
+
+        for (perceived, option_ids), result in self.results.items():
+            state = self.state_for(perceived, [options[option_id] for option_id in option_ids])
+            expected = compute_result(state)
+            if result != expected:
+                raise ValueError(
+                    f"Таблица результатов расходится с compute_result для "
+                    f"{perceived}, {option_ids}: {result} != {expected}"
+                )
+
+        return len(self.results)
+
+
+_result_table: Optional[ResultTable] = None
+
+# content_bundle.ContentBundle, если контент собран заранее (use_bundle)
+_bundle = None
+
+
+def use_bundle(bundle) -> None:
+    """
+    Брать таблицу результатов и тексты DEFAULT_TEMPLATE из собранного бандла
+
+    Записи бандла декодируются при первом обращении к ним.
+    """
+    global _bundle, _result_table
+
+    _bundle = bundle
+    _result_table = None
+    _template_cache.clear()
+
+
+def get_result_table() -> ResultTable:
+    """Таблица результатов; пересобирается, если изменились ZONE_MAX, ZONE_PRIORITY или TWIST_THRESHOLD"""
+    global _result_table, _bundle
+
+    fingerprint = _config_fingerprint()
+    if _result_table is None or _result_table.fingerprint != fingerprint:
+        if _bundle is not None and _bundle.fingerprint != fingerprint:
+            # Бандл посчитан под прежние настройки: его таблица и тексты устарели
+            logger.warning("⚠️ Настройки подсчёта изменились — бандл контента больше не используется")
+            _bundle = None
+            _template_cache.clear()
+        rows = _bundle.result_rows() if _bundle is not None else None
+        _result_table = ResultTable(QUIZ_GRAPH, rows)
+
+    return _result_table
+
+
 def build_final_message(
     result: DiagnosticResult,
     template_vars: Optional[TemplateVars] = None
@@ -137,18 +302,27 @@ def build_final_message(
         Финальное сообщение с результатом
     """
     vars = template_vars or DEFAULT_TEMPLATE
+    return _render_text(result.bottleneck, result.twist, result.perceived, vars)
+
 
+def _render_text(
+    bottleneck: Zone,
+    twist: bool,
+    perceived: Optional[Zone],
+    vars: TemplateVars
+) -> str:
+    """Подставить переменные в текст серии результата"""
     # Получаем серию результата для зоны
-    series = RESULT_SERIES_MAP.get(result.bottleneck)
+    series = RESULT_SERIES_MAP.get(bottleneck)
 
     if not series:
-        return f"⚠️ Финальный текст для зоны '{result.bottleneck}' еще не прописан"
+        return f"⚠️ Финальный текст для зоны '{bottleneck}' еще не прописан"
 
     # Выбираем текст: TWIST или CONFIRMATION
-    if result.twist and result.perceived:
+    if twist and perceived:
         message_template = series.message_twist
         # Для TWIST используем perceived зону как "частое жалобное"
-        complaint = COMMON_COMPLAINTS.get(result.perceived, "непонятная проблема")
+        complaint = COMMON_COMPLAINTS.get(perceived, "непонятная проблема")
     else:
         message_template = series.message_confirmation
         complaint = ""  # Не нужно для confirmation
@@ -180,16 +354,221 @@ def get_result_buttons(
 
     vars = template_vars or DEFAULT_TEMPLATE
 
+    return [
+        InlineKeyboardButton(text=text, callback_data=callback_data)
+        for text, callback_data in _render_buttons(result.bottleneck, vars)
+    ]
+
+
+def _render_buttons(bottleneck: Zone, vars: TemplateVars) -> Tuple[Tuple[str, str], ...]:
+    """Кнопки серии результата как пары (текст, callback_data)"""
     # Получаем серию результата для зоны
-    series = RESULT_SERIES_MAP.get(result.bottleneck)
+    series = RESULT_SERIES_MAP.get(bottleneck)
 
     if not series:
-        return []
+        return ()
+
+    # Подставляем переменные в текст кнопок
+    return tuple(
+        (btn.text.replace("{ЭКСПЕРТ}", vars.expert_name), btn.id)
+        for btn in series.buttons
+    )
+
+
+def build_consult_message(template_vars: Optional[TemplateVars] = None) -> str:
+    """Текст после кнопки 'Хочу разбор с {ЭКСПЕРТ}'"""
+    vars = template_vars or DEFAULT_TEMPLATE
+
+    return (
+        f"<b>Тогда следующий шаг простой:</b>\n\n"
+        f"<b>{vars.expert_name}</b> делает для таких, как ты, {vars.service_format} — "
+        f"за одну встречу вы разбираете твою точку А, узкое горлышко и реальные шаги на 2026 год.\n\n"
+        f"<b>Нажми на кнопку ниже, чтобы:</b>\n"
+        f"— получить условия и стоимость,\n"
+        f"— задать вопрос,\n"
+        f"— или сразу записаться."
+    )
+
+
+def build_self_message(template_vars: Optional[TemplateVars] = None) -> str:
+    """Текст после кнопки 'Попробую сам(а) по шагам'"""
+    vars = template_vars or DEFAULT_TEMPLATE
+
+    return (
+        "<b>Круто, что ты готов(а) пробовать сам(а).</b>\n\n"
+        "Сохрани эти шаги и попробуй хотя бы 7–10 дней делать хоть что-то одно из списка.\n\n"
+        f"Если поймёшь, что буксуешь, смело возвращайся к "
+        f"<a href='https://t.me/{vars.expert_username}'>{vars.expert_name_dat}</a> — "
+        f"{vars.pronoun_nom} не будет тебя отчитывать, "
+        "а поможет спокойно довести эту историю до роста дохода."
+    )
+
+
+# ========================================
+# ПРЕДКОМПИЛИРОВАННЫЕ ТЕКСТЫ РЕЗУЛЬТАТОВ
+# ========================================
+
+# Ключ готового результата: (bottleneck, twist, perceived)
+# Для confirmation perceived не влияет на текст, поэтому он всегда None
+RenderKey = Tuple[Zone, bool, Optional[Zone]]
+
+# Сколько наборов TemplateVars (экспертов) держим в кэше одновременно
+TEMPLATE_CACHE_SIZE = 32
+
+
+@dataclass(frozen=True)
+class RenderedResult:
+    """Готовый к отправке результат: текст + кнопки"""
+    text: str
+    buttons: Tuple[Tuple[str, str], ...]  # (текст, callback_data)
+
+    @cached_property
+    def keyboard(self):
+        """InlineKeyboardMarkup, собирается один раз при первом обращении"""
+        from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+        if not self.buttons:
+            return None
+
+        return InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text=text, callback_data=callback_data)]
+                for text, callback_data in self.buttons
+            ]
+        )
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """Все тексты одного эксперта (TemplateVars), отрендеренные заранее"""
+    results: Dict[RenderKey, RenderedResult]
+    consult_text: str
+    consult_button: Tuple[str, str]  # (текст, url)
+    self_text: str
+
+    @cached_property
+    def consult_keyboard(self):
+        """Кнопка связи с экспертом"""
+        from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+        text, url = self.consult_button
+        return InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text=text, url=url)]]
+        )
+
+
+_template_cache: "OrderedDict[tuple, CompiledTemplate]" = OrderedDict()
+
+
+def render_key(result: DiagnosticResult) -> RenderKey:
+    """Ключ готового текста для результата (та же логика выбора, что в build_final_message)"""
+    if result.twist and result.perceived:
+        return (result.bottleneck, True, result.perceived)
+    return (result.bottleneck, False, None)
+
+
+def compile_template(template_vars: Optional[TemplateVars] = None) -> CompiledTemplate:
+    """
+    Отрендерить все достижимые комбинации (bottleneck, twist, perceived)
+
+    Returns:
+        CompiledTemplate с готовыми текстами и кнопками
+    """
+    vars = template_vars or DEFAULT_TEMPLATE
+
+    results: Dict[RenderKey, RenderedResult] = {}
+    for bottleneck in RESULT_SERIES_MAP:
+        buttons = _render_buttons(bottleneck, vars)
+
+        key = (bottleneck, False, None)
+        results[key] = RenderedResult(_render_text(*key, vars), buttons)
+
+        for perceived in config.ZONE_PRIORITY:
+            key = (bottleneck, True, perceived)
+            results[key] = RenderedResult(_render_text(*key, vars), buttons)
+
+    return CompiledTemplate(
+        results=results,
+        consult_text=build_consult_message(vars),
+        consult_button=(
+            f"Написать {vars.expert_name_dat}",
+            f"https://t.me/{vars.expert_username}",
+        ),
+        self_text=build_self_message(vars),
+    )
+
+
+def get_compiled_template(template_vars: Optional[TemplateVars] = None) -> CompiledTemplate:
+    """
+    Скомпилированные тексты для эксперта (LRU-кэш на TEMPLATE_CACHE_SIZE записей)
+    """
+    vars = template_vars or DEFAULT_TEMPLATE
+    cache_key = tuple(vars.__dict__.values())
+
+    compiled = _template_cache.get(cache_key)
+    if compiled is not None:
+        _template_cache.move_to_end(cache_key)
+        return compiled
+
+    compiled = _bundle.template(vars) if _bundle is not None else None
+    if compiled is None:
+        compiled = compile_template(vars)
+    _template_cache[cache_key] = compiled
+    if len(_template_cache) > TEMPLATE_CACHE_SIZE:
+        _template_cache.popitem(last=False)
+
+    return compiled
+
+
+def set_template_cache_size(size: int) -> None:
+    """Размер LRU-кэша скомпилированных текстов (по числу экспертов, см. tenants.py)"""
+    global TEMPLATE_CACHE_SIZE
+
+    TEMPLATE_CACHE_SIZE = size
+    while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+        _template_cache.popitem(last=False)
+
+
+def cached_template(template_vars: TemplateVars) -> Optional[CompiledTemplate]:
+    """Скомпилированные тексты, если они сейчас в кэше (без компиляции и без сдвига в LRU)"""
+    return _template_cache.get(tuple(template_vars.__dict__.values()))
+
+
+def render_result(
+    result: DiagnosticResult,
+    template_vars: Optional[TemplateVars] = None
+) -> RenderedResult:
+    """
+    Готовый текст и кнопки результата — поиск по ключу вместо подстановок
+
+    Тексты совпадают с build_final_message / get_result_buttons
+    """
+    return render_by_key(render_key(result), template_vars)
+
+
+def render_by_key(key: RenderKey, template_vars: Optional[TemplateVars] = None) -> RenderedResult:
+    """
+    Готовый текст и кнопки по ключу render_key
+
+    Ключ может прийти из журнала отложенных доставок, записанного прежней
+    версией контента: если готового текста нет, он рендерится на лету.
+    """
+    compiled = get_compiled_template(template_vars)
+    rendered = compiled.results.get(key)
+
+    if rendered is None:
+        # Зона без серии результата или ключ от прежнего контента: рендерим на лету, как раньше
+        vars = template_vars or DEFAULT_TEMPLATE
+        bottleneck, twist, perceived = key
+        rendered = RenderedResult(
+            _render_text(bottleneck, twist, perceived, vars),
+            _render_buttons(bottleneck, vars),
+        )
+
+    return rendered
 
-    # Создаем кнопки с подставленными переменными
-    buttons = []
-    for btn in series.buttons:
-        text = btn.text.replace("{ЭКСПЕРТ}", vars.expert_name)
-        buttons.append(InlineKeyboardButton(text=text, callback_data=btn.id))
 
-    return buttons
+def warm_up_templates(*template_vars: TemplateVars) -> None:
+    """Прогреть кэш при старте, чтобы первые завершения не платили за рендер"""
+    for vars in template_vars or (DEFAULT_TEMPLATE,):
+        get_compiled_template(vars)
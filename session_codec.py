@@ -0,0 +1,150 @@
+"""
+Компактная сессия квиза: ответы упакованы в одно целое число
+
+Раньше в данных FSM лежали полные тексты ответов (question_1 … question_8),
+счётчики *_pain, complaint_best и perceived_zone — десяток ключей и строк
+на пользователя. Теперь хранится только номер выбранного варианта на
+каждый вопрос (3 бита), баллы и perceived выводятся из ответов по графу,
+а тексты ответов собираются лениво — для экспорта.
+
+В данных FSM сессия — словарь из трёх ключей: name, niche, answers.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from config import Zone, ZONE_MAX
+from questions import Option, Question
+from quiz_graph import QUIZ_GRAPH
+from scoring import AnswersState
+
+# Код варианта: номер в вопросе + 1 (0 — вопрос без ответа)
+BITS_PER_QUESTION = max(len(q.options) for q in QUIZ_GRAPH).bit_length()
+_MASK = (1 << BITS_PER_QUESTION) - 1
+
+# Вопрос -> сдвиг его кода в упакованном числе (в порядке графа)
+SHIFTS: Dict[str, int] = {
+    question.id: index * BITS_PER_QUESTION for index, question in enumerate(QUIZ_GRAPH)
+}
+
+# Вопросы с зоной: ответы на них обнуляются вместе с баллами (reset_scores).
+# Баллы и complaint_best выводятся из этих ответов, поэтому complaint_best
+# прошлого прохождения тоже не переносится (старый хендлер обнулял только
+# *_pain). На результат это влияет, только если на вопрос perceived так и
+# не ответили: иначе complaint_best не используется (tests/test_session_codec.py).
+_DIAGNOSTIC_MASK = 0
+for _question in QUIZ_GRAPH:
+    if _question.zone:
+        _DIAGNOSTIC_MASK |= _MASK << SHIFTS[_question.id]
+
+
+class QuizSession:
+    """Сессия пользователя: имя, ниша и упакованные ответы"""
+
+    __slots__ = ("name", "niche", "answers")
+
+    def __init__(self, name: Optional[str] = None, niche: Optional[str] = None, answers: int = 0):
+        self.name = name
+        self.niche = niche
+        self.answers = answers
+
+    # ---------- ответы ----------
+
+    def answer(self, question: Question, option: Option) -> None:
+        """Записать выбранный вариант (повторный ответ заменяет прежний)"""
+        if question.reset_scores:
+            # Начало нового прохождения: старые диагностические ответы не в счёт
+            self.answers &= ~_DIAGNOSTIC_MASK
+        self._set(question, option)
+
+    def _set(self, question: Question, option: Option) -> None:
+        shift = SHIFTS[question.id]
+        code = question.options.index(option) + 1
+        self.answers = (self.answers & ~(_MASK << shift)) | (code << shift)
+
+    def option(self, question: Question) -> Optional[Option]:
+        """Выбранный вариант или None"""
+        code = (self.answers >> SHIFTS[question.id]) & _MASK
+        return question.options[code - 1] if code else None
+
+    def option_ids(self, questions: Iterable[Question]) -> Tuple[Optional[str], ...]:
+        """id выбранных вариантов (ключ scoring.ResultTable)"""
+        result = []
+        for question in questions:
+            option = self.option(question)
+            result.append(option.id if option else None)
+        return tuple(result)
+
+    # ---------- то, что раньше хранилось отдельными ключами ----------
+
+    @property
+    def perceived_zone(self) -> Optional[Zone]:
+        """Зона, которую человек считает проблемой"""
+        for question in QUIZ_GRAPH:
+            option = self.option(question)
+            if option is not None and option.perceived:
+                return option.perceived
+        return None
+
+    def answers_state(self) -> AnswersState:
+        """Баллы боли и complaint_best — так же, как их копил хендлер"""
+        scores = {zone: 0 for zone in ZONE_MAX}
+        complaint_best = None
+
+        for question in QUIZ_GRAPH:
+            if not question.zone:
+                continue
+            option = self.option(question)
+            if option is None:
+                continue
+
+            scores[question.zone] += option.pain
+            if not complaint_best or option.complaint > complaint_best[1]:
+                complaint_best = (question.zone, option.complaint)
+
+        return AnswersState(
+            scores=scores,
+            perceived_zone=self.perceived_zone,
+            complaint_best=complaint_best,
+        )
+
+    def labels(self) -> Dict[str, str]:
+        """Тексты ответов по answer_key (question_1 …) — только для экспорта"""
+        labels = {}
+        for question in QUIZ_GRAPH:
+            option = self.option(question)
+            if option is not None and question.answer_key:
+                labels[question.answer_key] = option.answer
+        return labels
+
+    # ---------- данные FSM ----------
+
+    def to_data(self) -> Dict[str, Any]:
+        """Словарь для хранилища FSM"""
+        return {"name": self.name, "niche": self.niche, "answers": self.answers}
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any]) -> "QuizSession":
+        """Сессия из данных FSM (в том числе старого формата с текстами ответов)"""
+        session = cls(data.get("name"), data.get("niche"), data.get("answers", 0))
+
+        if "answers" not in data:
+            session._load_legacy(data)
+
+        return session
+
+    def _load_legacy(self, data: Dict[str, Any]) -> None:
+        """Старый формат: тексты ответов, perceived_zone и options (id вариантов)"""
+        options = data.get("options") or {}
+
+        for question in QUIZ_GRAPH:
+            for option in question.options:
+                if (
+                    options.get(question.id) == option.id
+                    or (question.answer_key and data.get(question.answer_key) == option.answer)
+                    or (option.perceived and data.get("perceived_zone") == option.perceived)
+                ):
+                    self._set(question, option)
+                    break
+
+    def __repr__(self) -> str:
+        return f"QuizSession(name={self.name!r}, niche={self.niche!r}, answers={self.answers:#x})"
@@ -0,0 +1,183 @@
+"""
+Статичные сообщения бота: текст и клавиатура собираются один раз при импорте
+
+Клавиатура каждого сообщения — неизменяемый InlineKeyboardMarkup, который
+переиспользуется во всех отправках. При STATIC_FAST_PATH=1 сообщение уходит
+с уже сериализованным reply_markup: SendMessage собирается без валидации,
+а сессия aiogram передаёт готовую JSON-строку как есть. Запрос всё равно
+проходит через middleware сессии (лимиты outbound.py и т.п.).
+"""
+
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Optional, Tuple
+
+from aiogram.methods import SendMessage
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from callback_index import CallbackIndex
+from quiz_graph import QUIZ_GRAPH
+
+# Отправлять статичные сообщения заранее сериализованными (см. enable_fast_path)
+_fast_path = False
+
+Buttons = Tuple[Tuple[str, str], ...]  # (текст, callback_data), по кнопке в ряду
+
+
+@dataclass(frozen=True)
+class StaticMessage:
+    """Текст и кнопки, которые не зависят от пользователя"""
+    text: str
+    buttons: Buttons = ()
+
+    @cached_property
+    def keyboard(self) -> Optional[InlineKeyboardMarkup]:
+        """InlineKeyboardMarkup, один на все отправки"""
+        if not self.buttons:
+            return None
+
+        return InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text=text, callback_data=callback_data)]
+                for text, callback_data in self.buttons
+            ]
+        )
+
+    @cached_property
+    def markup_json(self) -> Optional[str]:
+        """reply_markup в том виде, в каком он уходит в Bot API"""
+        if self.keyboard is None:
+            return None
+
+        return json.dumps(
+            self.keyboard.model_dump(mode="json", exclude_none=True),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @cached_property
+    def prepared(self) -> SendMessage:
+        """
+        SendMessage с готовым JSON клавиатуры, собранный без валидации
+
+        Сборка model_construct не бесплатна (дефолты полей копируются),
+        поэтому он делается один раз, а на отправку берётся поверхностная копия.
+        """
+        fields = {"chat_id": 0, "text": self.text, "parse_mode": "HTML"}
+        if self.markup_json is not None:
+            fields["reply_markup"] = self.markup_json
+        return SendMessage.model_construct(**fields)
+
+    def method(self, chat_id: int, text: Optional[str] = None) -> SendMessage:
+        """
+        SendMessage в чат chat_id
+
+        text подменяет текст при той же клавиатуре (первый вопрос квиза
+        с именем и нишей пользователя).
+        """
+        text = text if text is not None else self.text
+
+        if _fast_path:
+            return self.prepared.model_copy(update={"chat_id": chat_id, "text": text})
+
+        return SendMessage(chat_id=chat_id, text=text, reply_markup=self.keyboard, parse_mode="HTML")
+
+
+pack = CallbackIndex.pack
+
+
+# ========================================
+# ПРИВЕТСТВИЕ И ЗНАКОМСТВО
+# ========================================
+
+WELCOME = StaticMessage(
+    text=(
+        "👋 Привет, друг!\n\n"
+        "<b>Твой личный детектив по итогам года готов к расследованию!</b>\n\n"
+        "Если 2025 по доходу/результатам тебя не радует, давай устроим маленькое расследование: "
+        "кто съедает твой рост и почему ты до сих пор не там, где мог(ла) быть.\n\n"
+        "За 2–3 минуты ты увидишь своё узкое место и поймёшь, что с этим делать в 2026. Поехали?"
+    ),
+    buttons=(
+        ("✅ Да, хочу расследование", pack("st")),
+        ("❌ Нет, потом как-нибудь", pack("dc")),
+    ),
+)
+
+ASK_NAME = StaticMessage(
+    "Отлично! Прежде чем начнём расследование, представьтесь:\n\n"
+    "<b>Как вас зовут?</b>"
+)
+
+DECLINE = StaticMessage(
+    "Понимаю! 😊\n\n"
+    "Когда будешь готов к расследованию — просто напиши /start\n\n"
+    "Я буду ждать! 🕵️"
+)
+
+NAME_INVALID = StaticMessage("Пожалуйста, введите корректное имя (минимум 2 символа):")
+
+
+# ========================================
+# НИША
+# ========================================
+
+# Код кнопки -> (подпись, ниша в предложном падеже); None — напишет сам
+NICHES: Dict[str, Tuple[str, Optional[str]]] = {
+    "infoproducts": ("💼 Инфопродукты", "инфопродуктах"),
+    "consulting": ("📊 Консалтинг", "консалтинге"),
+    "sales": ("🚀 Продажи", "продажах"),
+    "business": ("💰 Бизнес", "бизнесе"),
+    "custom": ("✍️ Другое (напишу сам)", None),
+}
+
+ASK_NICHE = StaticMessage(
+    "Теперь подскажи, в какой сфере ты работаешь?",
+    buttons=tuple((label, pack("n", code)) for code, (label, _) in NICHES.items()),
+)
+
+ASK_CUSTOM_NICHE = StaticMessage("Напиши свою сферу деятельности:")
+
+NICHE_INVALID = StaticMessage("Пожалуйста, напиши сферу деятельности (минимум 3 символа):")
+
+
+# ========================================
+# КВИЗ
+# ========================================
+
+# Вопрос -> сообщение с кнопками вариантов (текст первого вопроса
+# собирается в хендлере, здесь берётся только клавиатура)
+QUESTION_MESSAGES: Dict[str, StaticMessage] = {
+    question.id: StaticMessage(
+        question.text,
+        buttons=tuple((option.button, pack("a", option.id)) for option in question.options),
+    )
+    for question in QUIZ_GRAPH
+}
+
+ANALYSING = StaticMessage(
+    "✅ Отлично! Диагностика завершена.\n\n"
+    "По твоим ответам я вижу одну интересную штуку.\n\n"
+    "Сейчас проанализирую твои результаты и покажу результат..."
+)
+
+
+# Все статичные сообщения; клавиатуры собираются здесь же, при импорте
+STATIC_MESSAGES = (
+    WELCOME, ASK_NAME, DECLINE, NAME_INVALID, ASK_NICHE,
+    ASK_CUSTOM_NICHE, NICHE_INVALID, ANALYSING, *QUESTION_MESSAGES.values(),
+)
+
+for _message in STATIC_MESSAGES:
+    _message.keyboard
+
+
+def enable_fast_path(enabled: bool = True) -> None:
+    """Включить отправку с готовым JSON клавиатур (сериализуются сразу)"""
+    global _fast_path
+
+    if enabled:
+        for message in STATIC_MESSAGES:
+            message.prepared
+    _fast_path = enabled
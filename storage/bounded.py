@@ -0,0 +1,388 @@
+"""
+FSM-хранилище в памяти с ограничением по числу сессий и времени простоя
+
+В отличие от MemoryStorage не растёт бесконечно: давно неактивные
+сессии вытесняются (LRU + idle TTL, всё за O(1)). Вытесненные, но
+не завершённые сессии можно сбросить в локальный файл и поднять
+обратно, если пользователь вернётся.
+
+Файл — журнал JSON-строк: сессия, поднятая обратно, помечается
+записью-надгробием, поэтому после перезапуска старая копия не перезапишет
+ушедшую вперёд сессию. Журнал сжимается при открытии и когда дорастает
+до spill_max_bytes (самые старые сессии тогда выбрасываются). Запись
+и чтение файла — в отдельном потоке, цикл событий диска не ждёт.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _sizeof(value: Any) -> int:
+    """Примерный размер объекта в байтах (с вложенными dict/list/tuple)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_sizeof(item) for item in value)
+    return size
+
+
+class _Session:
+    """Состояние одного пользователя"""
+    __slots__ = ("state", "data", "last_seen", "size")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.data = data or {}
+        self.last_seen = time.monotonic()
+        self.size = 0
+
+
+@dataclass
+class BoundedStorageStats:
+    """Статистика хранилища"""
+    sessions: int = 0       # Сессий в памяти
+    bytes: int = 0          # Примерный объём данных сессий
+    evicted: int = 0        # Вытеснено по лимиту числа сессий
+    expired: int = 0        # Вытеснено по времени простоя
+    spilled: int = 0        # Сброшено в файл
+    restored: int = 0       # Поднято из файла
+    spill_dropped: int = 0  # Выброшено из файла по лимиту размера
+
+    def __str__(self) -> str:
+        return (
+            f"сессий: {self.sessions}, ~{self.bytes / 1024:.0f} КБ, "
+            f"вытеснено: {self.evicted}, истекло: {self.expired}, "
+            f"в файл: {self.spilled}, из файла: {self.restored}, "
+            f"выброшено из файла: {self.spill_dropped}"
+        )
+
+
+def _key_list(key: StorageKey) -> list:
+    return [key.bot_id, key.chat_id, key.user_id, key.thread_id, key.destiny]
+
+
+def _parse_key(values: list) -> StorageKey:
+    # По именам: в новых aiogram у StorageKey есть поля между thread_id и destiny
+    bot_id, chat_id, user_id, thread_id, destiny = values
+    return StorageKey(bot_id=bot_id, chat_id=chat_id, user_id=user_id, thread_id=thread_id, destiny=destiny)
+
+
+class _SpillFile:
+    """
+    Журнал вытесненных сессий; всё чтение и запись — в одном потоке
+
+    Операции выполняются по порядку (очередь), поэтому take() после put()
+    того же ключа всегда видит записанное. Индекс ключ -> (смещение, длина)
+    принадлежит потоку.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+        # Порядок = порядок записи (в начале — самые старые)
+        self._index: "OrderedDict[StorageKey, Tuple[int, int]]" = OrderedDict()
+        self._size = 0
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+
+        # Открытие и сжатие — до запуска потока: при старте бота, ещё без апдейтов
+        self._file = open(path, "a+b")
+        stale = self._load()
+        if stale:
+            self._compact()
+        self._thread = threading.Thread(target=self._run, name="quiz-fsm-spill", daemon=True)
+        self._thread.start()
+
+    def keys(self) -> List[StorageKey]:
+        """Ключи в файле на момент открытия"""
+        return list(self._index)
+
+    # ---------- API для цикла событий (без ожидания диска) ----------
+
+    def put(self, key: StorageKey, state: str, data: Dict[str, Any]) -> None:
+        self._queue.put(("put", key, (state, data), None))
+
+    def take(self, key: StorageKey) -> "Future[Optional[dict]]":
+        """Прочитать запись и пометить её надгробием (None — записи нет)"""
+        future: Future = Future()
+        self._queue.put(("take", key, None, future))
+        return future
+
+    def close(self) -> None:
+        """Дописать очередь и закрыть файл (блокирует — вызывать в executor)"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    # ---------- поток ----------
+
+    def _run(self) -> None:
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                op, key, payload, future = item
+                try:
+                    if op == "put":
+                        self._put(key, *payload)
+                    else:
+                        future.set_result(self._take(key))
+                except Exception as e:
+                    logger.exception("❌ Ошибка файла вытесненных сессий")
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+        finally:
+            self._file.close()
+
+    def _load(self) -> int:
+        """Индекс по файлу (последняя запись ключа побеждает); сколько строк устарело"""
+        self._file.seek(0)
+        offset = 0
+        lines = 0
+        for line in self._file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Оборванная запись (процесс упал посреди записи) — дальше не читаем
+                logger.warning(f"⚠️ {self.path}: повреждённая строка на смещении {offset}, хвост отброшен")
+                lines += 1
+                break
+            lines += 1
+            key = _parse_key(record["key"])
+            self._index.pop(key, None)
+            if not record.get("gone"):
+                self._index[key] = (offset, len(line))
+            offset += len(line)
+        self._size = offset
+        return lines - len(self._index)
+
+    def _append(self, record: Dict[str, Any]) -> Tuple[int, int]:
+        line = json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(line)
+        self._size = offset + len(line)
+        return offset, len(line)
+
+    def _put(self, key: StorageKey, state: str, data: Dict[str, Any]) -> None:
+        self._index.pop(key, None)
+        self._index[key] = self._append({"key": _key_list(key), "state": state, "data": data})
+        if self._size > self.max_bytes:
+            self._compact()
+
+    def _take(self, key: StorageKey) -> Optional[dict]:
+        location = self._index.pop(key, None)
+        if location is None:
+            return None
+        offset, length = location
+        self._file.flush()
+        record = json.loads(os.pread(self._file.fileno(), length, offset))
+        # Надгробие: после перезапуска эта копия уже не поднимется
+        self._append({"key": _key_list(key), "gone": True})
+        return record
+
+    def _compact(self) -> None:
+        """Переписать файл только с живыми записями, не больше половины max_bytes"""
+        self._file.flush()
+        live = sum(length for _, length in self._index.values())
+        while self._index and live > self.max_bytes // 2:
+            _, (_, length) = self._index.popitem(last=False)
+            live -= length
+            self.dropped += 1
+
+        fd = self._file.fileno()
+        tmp_path = self.path + ".tmp"
+        index = OrderedDict()
+        with open(tmp_path, "wb") as tmp:
+            for key, (offset, length) in self._index.items():
+                index[key] = (tmp.tell(), length)
+                tmp.write(os.pread(fd, length, offset))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._file.close()
+        self._file = open(self.path, "a+b")
+        self._index = index
+        self._size = live
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """
+    Замена MemoryStorage с лимитами
+
+    Args:
+        max_sessions: Максимум сессий в памяти
+        idle_ttl: Через сколько секунд без активности сессия вытесняется
+        spill_path: Файл для незавершённых вытесненных сессий (None — не сохранять)
+        finished_states: Состояния, после которых сессию можно не сохранять
+        spill_max_bytes: Предельный размер файла; при нём файл сжимается,
+            а если живых сессий слишком много — выбрасываются самые старые
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 100_000,
+        idle_ttl: Optional[float] = None,
+        spill_path: Optional[str] = None,
+        finished_states: Iterable[str] = (),
+        spill_max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.finished_states = frozenset(finished_states)
+
+        # Порядок = порядок последнего обращения (в начале — самые старые)
+        self._sessions: "OrderedDict[StorageKey, _Session]" = OrderedDict()
+        self._stats = BoundedStorageStats()
+
+        self._spill: Optional[_SpillFile] = None
+        # Ключи, которые могут быть в файле (сам индекс — у потока файла)
+        self._spilled: Set[StorageKey] = set()
+        # Ключ -> чтение из файла, которое уже идёт
+        self._restoring: Dict[StorageKey, "asyncio.Future"] = {}
+        if spill_path:
+            self._spill = _SpillFile(spill_path, spill_max_bytes)
+            self._spilled.update(self._spill.keys())
+
+    # ---------- статистика ----------
+
+    @property
+    def stats(self) -> BoundedStorageStats:
+        self._stats.sessions = len(self._sessions)
+        if self._spill is not None:
+            self._stats.spill_dropped = self._spill.dropped
+        return self._stats
+
+    def session_states(self) -> List[Optional[str]]:
+        """Состояния всех сессий в памяти (для метрик)"""
+        return [session.state for session in self._sessions.values()]
+
+    # ---------- вытеснение ----------
+
+    def _expire(self) -> None:
+        """Вытеснить сессии, которые простаивают дольше idle_ttl"""
+        if self.idle_ttl is None:
+            return
+        deadline = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            key, session = next(iter(self._sessions.items()))
+            if session.last_seen > deadline:
+                break
+            self._drop(key)
+            self._stats.expired += 1
+
+    def _drop(self, key: StorageKey) -> None:
+        session = self._sessions.pop(key)
+        self._stats.bytes -= session.size
+        if (
+            self._spill is not None
+            and session.state is not None
+            and session.state not in self.finished_states
+        ):
+            # Словарь данных больше никто не меняет: set_data кладёт копию
+            self._spill.put(key, session.state, session.data)
+            self._spilled.add(key)
+            self._stats.spilled += 1
+
+    def _insert(self, key: StorageKey, session: _Session) -> _Session:
+        self._sessions[key] = session
+        if len(self._sessions) > self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+            self._stats.evicted += 1
+        return session
+
+    async def _get(self, key: StorageKey, create: bool = False) -> Optional[_Session]:
+        self._expire()
+
+        session = self._sessions.get(key)
+        if session is None and self._spill is not None and (key in self._spilled or key in self._restoring):
+            record = await self._restore(key)
+            # Пока читали файл, сессию мог поднять параллельный вызов
+            session = self._sessions.get(key)
+            if session is None and record is not None:
+                session = self._insert(key, _Session(record["state"], record["data"]))
+                self._resize(session)
+                self._stats.restored += 1
+
+        if session is None:
+            if not create:
+                return None
+            session = self._insert(key, _Session())
+        else:
+            self._sessions.move_to_end(key)
+
+        session.last_seen = time.monotonic()
+        return session
+
+    def _resize(self, session: _Session) -> None:
+        size = _sizeof(session.data) + (_sizeof(session.state) if session.state else 0)
+        self._stats.bytes += size - session.size
+        session.size = size
+
+    # ---------- файл для вытесненных сессий ----------
+
+    async def _restore(self, key: StorageKey) -> Optional[dict]:
+        """Запись ключа из файла; одновременные вызовы ждут одно чтение"""
+        future = self._restoring.get(key)
+        if future is None:
+            self._spilled.discard(key)
+            future = self._restoring[key] = asyncio.wrap_future(self._spill.take(key))
+            future.add_done_callback(lambda _: self._restoring.pop(key, None))
+        return await asyncio.shield(future)
+
+    # ---------- BaseStorage ----------
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        session = await self._get(key, create=True)
+        session.state = state.state if isinstance(state, State) else state
+        self._resize(session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        session = await self._get(key)
+        return session.state if session else None
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        session = await self._get(key, create=True)
+        session.data = data.copy()
+        self._resize(session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        session = await self._get(key)
+        return session.data.copy() if session else {}
+
+    async def set_state_and_data(
+        self,
+        key: StorageKey,
+        state: StateType = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        session = await self._get(key, create=True)
+        session.state = state.state if isinstance(state, State) else state
+        session.data = (data or {}).copy()
+        self._resize(session)
+
+    async def close(self) -> None:
+        if self._spill is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._spill.close)
+            self._stats.spill_dropped = self._spill.dropped
+            self._spill = None
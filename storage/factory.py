@@ -0,0 +1,43 @@
+"""
+Выбор FSM-хранилища по настройкам из .env
+"""
+
+import os
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+
+def create_storage() -> BaseStorage:
+    """
+    FSM_STORAGE=memory (по умолчанию) | bounded | redis
+
+    Для redis: REDIS_URL и FSM_TTL (секунды жизни брошенной сессии)
+    Для bounded: FSM_MAX_SESSIONS, FSM_TTL, FSM_SPILL_PATH и FSM_SPILL_MAX_MB
+    """
+    kind = os.getenv('FSM_STORAGE', 'memory').lower()
+
+    if kind == 'memory':
+        return MemoryStorage()
+
+    if kind == 'bounded':
+        from handlers.states import QuizStates
+        from storage.bounded import BoundedMemoryStorage
+
+        return BoundedMemoryStorage(
+            max_sessions=int(os.getenv('FSM_MAX_SESSIONS', 100_000)),
+            idle_ttl=int(os.getenv('FSM_TTL', 7 * 24 * 3600)),
+            spill_path=os.getenv('FSM_SPILL_PATH') or None,
+            finished_states=[QuizStates.show_result.state],
+            spill_max_bytes=int(float(os.getenv('FSM_SPILL_MAX_MB', 256)) * 1024 * 1024),
+        )
+
+    if kind == 'redis':
+        from storage.redis_storage import QuizRedisStorage
+
+        return QuizRedisStorage.from_url(
+            os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+            ttl=int(os.getenv('FSM_TTL', 7 * 24 * 3600)),
+        )
+
+    raise ValueError(f"Неизвестный FSM_STORAGE: {kind}")
@@ -0,0 +1,166 @@
+"""
+Минимальный Redis-совместимый сервер в процессе (RESP2)
+
+Нужен, чтобы проверять и бенчмаркать QuizRedisStorage без настоящего Redis.
+Поддерживает только команды, которые использует FSM-хранилище:
+PING, GET, SET (EX/PX), DEL, MGET, EXISTS, EXPIRE, TTL, FLUSHDB,
+SELECT, CLIENT, MULTI/EXEC/DISCARD.
+
+Пример:
+    server = FakeRedisServer()
+    await server.start()
+    storage = QuizRedisStorage.from_url(server.url)
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+
+class FakeRedisServer:
+    """Redis-заглушка: словарь в памяти с ленивым истечением ключей"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        # key -> (value, expire_at | None)
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.Task] = set()
+
+    @property
+    def url(self) -> str:
+        # Заглушка отвечает только на RESP2 (новые redis-py по умолчанию просят RESP3)
+        return f"redis://{self.host}:{self.port}/0?protocol=2"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for task in self._clients:
+                task.cancel()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await self._server.wait_closed()
+
+    # ---------- протокол ----------
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._clients.add(task)
+        queued: Optional[List[List[bytes]]] = None
+        try:
+            while True:
+                command = await self._read_command(reader)
+                if command is None:
+                    break
+
+                name = command[0].upper()
+                if name == b"MULTI":
+                    queued = []
+                    reply = b"+OK\r\n"
+                elif name == b"DISCARD":
+                    queued = None
+                    reply = b"+OK\r\n"
+                elif name == b"EXEC":
+                    results = [self._execute(cmd) for cmd in queued or []]
+                    queued = None
+                    reply = b"*%d\r\n" % len(results) + b"".join(results)
+                elif queued is not None:
+                    queued.append(command)
+                    reply = b"+QUEUED\r\n"
+                else:
+                    reply = self._execute(command)
+
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(task)
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # inline-команда (например, из telnet)
+            return line.strip().split()
+
+        args = []
+        for _ in range(int(line[1:])):
+            size = int((await reader.readline())[1:])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    # ---------- команды ----------
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        item = self.data.get(key)
+        if item is None:
+            return None
+        value, expire_at = item
+        if expire_at is not None and expire_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    @staticmethod
+    def _bulk(value: Optional[bytes]) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _execute(self, command: List[bytes]) -> bytes:
+        self.commands += 1
+        name, args = command[0].upper(), command[1:]
+
+        if name == b"PING":
+            return b"+PONG\r\n"
+        if name in (b"SELECT", b"CLIENT"):
+            return b"+OK\r\n"
+        if name == b"FLUSHDB":
+            self.data.clear()
+            return b"+OK\r\n"
+        if name == b"GET":
+            return self._bulk(self._get(args[0]))
+        if name == b"MGET":
+            return b"*%d\r\n" % len(args) + b"".join(self._bulk(self._get(key)) for key in args)
+        if name == b"SET":
+            expire_at = None
+            options = [arg.upper() for arg in args[2:]]
+            if b"EX" in options:
+                expire_at = time.monotonic() + int(args[2 + options.index(b"EX") + 1])
+            elif b"PX" in options:
+                expire_at = time.monotonic() + int(args[2 + options.index(b"PX") + 1]) / 1000
+            self.data[args[0]] = (args[1], expire_at)
+            return b"+OK\r\n"
+        if name == b"DEL":
+            removed = 0
+            for key in args:
+                if self._get(key) is not None:
+                    del self.data[key]
+                    removed += 1
+            return b":%d\r\n" % removed
+        if name == b"EXISTS":
+            return b":%d\r\n" % sum(1 for key in args if self._get(key) is not None)
+        if name == b"EXPIRE":
+            value = self._get(args[0])
+            if value is None:
+                return b":0\r\n"
+            self.data[args[0]] = (value, time.monotonic() + int(args[1]))
+            return b":1\r\n"
+        if name == b"TTL":
+            if self._get(args[0]) is None:
+                return b":-2\r\n"
+            expire_at = self.data[args[0]][1]
+            if expire_at is None:
+                return b":-1\r\n"
+            return b":%d\r\n" % int(expire_at - time.monotonic())
+
+        return b"-ERR unknown command '%s'\r\n" % name.lower()
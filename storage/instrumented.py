@@ -0,0 +1,87 @@
+"""
+Обёртка FSM-хранилища, которая замеряет каждую операцию
+
+Длительность get_state / get_data / set_* уходит наблюдателям
+observer(op, секунды) — метрикам и профилированию; всё остальное —
+как у исходного хранилища.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+StorageObserver = Callable[[str, float], None]
+
+
+class InstrumentedStorage(BaseStorage):
+    """
+    Args:
+        storage: исходное хранилище
+        observers: куда сообщать (имя операции, длительность)
+    """
+
+    def __init__(self, storage: BaseStorage, *observers: StorageObserver):
+        self.storage = storage
+        self.observers = observers
+        # Атомарная запись есть не у всех хранилищ (см. middlewares/state_tx.py)
+        if hasattr(storage, "set_state_and_data"):
+            self.set_state_and_data = self._set_state_and_data
+        # Обход сессий для метрик — только у хранилищ в памяти
+        if isinstance(storage, MemoryStorage):
+            self.session_states = self._memory_states
+
+    def observe(self, op: str, seconds: float) -> None:
+        for observer in self.observers:
+            observer(op, seconds)
+
+    def __getattr__(self, name: str) -> Any:
+        # stats, session_states и прочие атрибуты исходного хранилища
+        return getattr(self.storage, name)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        started = time.perf_counter()
+        try:
+            await self.storage.set_state(key, state)
+        finally:
+            self.observe("set_state", time.perf_counter() - started)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            return await self.storage.get_state(key)
+        finally:
+            self.observe("get_state", time.perf_counter() - started)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        started = time.perf_counter()
+        try:
+            await self.storage.set_data(key, data)
+        finally:
+            self.observe("set_data", time.perf_counter() - started)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            return await self.storage.get_data(key)
+        finally:
+            self.observe("get_data", time.perf_counter() - started)
+
+    async def _set_state_and_data(
+        self,
+        key: StorageKey,
+        state: StateType = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            await self.storage.set_state_and_data(key=key, state=state, data=data)
+        finally:
+            self.observe("set_state_and_data", time.perf_counter() - started)
+
+    def _memory_states(self) -> List[Optional[str]]:
+        return [record.state for record in self.storage.storage.values()]
+
+    async def close(self) -> None:
+        await self.storage.close()
@@ -0,0 +1,104 @@
+"""
+FSM-хранилище в Redis: TTL для брошенных сессий, компактный JSON,
+одно чтение и одна запись на апдейт
+"""
+
+import json
+from contextvars import ContextVar
+from functools import partial
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+
+
+# Компактная сериализация: без пробелов и без \uXXXX для кириллицы
+# (русский ответ в UTF-8 занимает 2 байта на символ вместо 6)
+compact_json_dumps = partial(json.dumps, ensure_ascii=False, separators=(",", ":"))
+
+# Данные, прочитанные вместе с состоянием в текущем апдейте: (ключ, данные).
+# Контекст — таск апдейта, поэтому после апдейта значение пропадает само
+_prefetched: ContextVar[Optional[Tuple[StorageKey, Dict[str, Any]]]] = ContextVar(
+    "quiz_fsm_prefetched", default=None
+)
+
+
+class QuizRedisStorage(RedisStorage):
+    """
+    RedisStorage с поддержкой set_state_and_data и get_state_and_data
+
+    state и data пишутся одним MULTI/EXEC-пайплайном (один round-trip),
+    TTL обновляется при каждой записи — брошенные на середине квиза
+    сессии удаляются сами через ttl секунд после последнего ответа.
+
+    get_state (его вызывает FSMContextMiddleware aiogram) читает state и data
+    одним MGET; StateTransaction забирает эти данные (take_prefetched_data)
+    вместо второго запроса.
+    """
+
+    def __init__(self, *args: Any, ttl: Optional[int] = None, **kwargs: Any):
+        kwargs.setdefault("json_dumps", compact_json_dumps)
+        kwargs.setdefault("state_ttl", ttl)
+        kwargs.setdefault("data_ttl", ttl)
+        super().__init__(*args, **kwargs)
+
+    async def get_state_and_data(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Состояние и данные за один запрос"""
+        state, data = await self.redis.mget(
+            self.key_builder.build(key, "state"),
+            self.key_builder.build(key, "data"),
+        )
+        if isinstance(state, bytes):
+            state = state.decode("utf-8")
+        if data is None:
+            return state, {}
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return state, self.json_loads(data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, data = await self.get_state_and_data(key)
+        _prefetched.set((key, data))
+        return state
+
+    def take_prefetched_data(self, key: StorageKey) -> Optional[Dict[str, Any]]:
+        """Данные, прочитанные get_state в этом апдейте (один раз), или None"""
+        prefetched = _prefetched.get()
+        if prefetched is None or prefetched[0] != key:
+            return None
+        _prefetched.set(None)
+        return prefetched[1]
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        _prefetched.set(None)
+        await super().set_state(key, state)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        _prefetched.set(None)
+        await super().set_data(key, data)
+
+    async def set_state_and_data(
+        self,
+        key: StorageKey,
+        state: StateType = None,
+        data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Записать состояние и данные за один запрос"""
+        _prefetched.set(None)
+        state_key = self.key_builder.build(key, "state")
+        data_key = self.key_builder.build(key, "data")
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            if state is None:
+                pipe.delete(state_key)
+            else:
+                value = state.state if isinstance(state, State) else state
+                pipe.set(state_key, value, ex=self.state_ttl)
+
+            if not data:
+                pipe.delete(data_key)
+            else:
+                pipe.set(data_key, self.json_dumps(data), ex=self.data_ttl)
+
+            await pipe.execute()
@@ -0,0 +1,356 @@
+"""
+Запуск бота в нескольких процессах с шардированием по chat_id
+
+Родительский процесс получает апдейты (long polling или webhook) как
+сырой JSON и отправляет каждый в воркер hash(chat_id) % N — все апдейты
+одного пользователя обрабатывает один и тот же воркер, по порядку.
+Воркеры форкает отдельный процесс-инкубатор, запущенный до asyncio.run:
+в нём нет цикла событий, HTTP-сессии и лишних потоков, поэтому и
+перезапуск упавшего воркера — fork из чистого процесса. Тексты config.py
+и роутер уже загружены и после gc.freeze() делятся между процессами
+copy-on-write; таблицу результатов и готовые тексты воркеры читают из общего
+content.bundle (собирается здесь, если его нет или он устарел).
+
+Упавший воркер перезапускается, апдейты в его очереди достаются новому.
+Апдейты, которые упавший воркер уже забрал из очереди, теряются: Telegram
+их повторно не пришлёт (offset getUpdates подтверждён, webhook получил 200).
+
+У каждого воркера свои отложенные доставки, уведомления о заявках и счётчики
+/stats (файлы с суффиксом .<номер воркера>). /stats складывает свои счётчики
+с последним сохранением остальных воркеров (раз в минуту); уведомления
+владельцу приходят сводками по каждому воркеру отдельно.
+
+Запуск: python supervisor.py --workers 4
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+from contextlib import asynccontextmanager
+from multiprocessing.connection import wait
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from aiohttp import ClientSession, ClientTimeout, web
+
+import content_bundle
+import main as app
+from utils.startup import STARTUP
+
+logger = logging.getLogger("supervisor")
+
+# fork обязателен: воркеры наследуют уже загруженный контент
+_ctx = multiprocessing.get_context("fork")
+
+# Пауза после ошибки getUpdates: удваивается до предела, сбрасывается после успеха
+POLL_BACKOFF = 1.0
+POLL_BACKOFF_MAX = 60.0
+
+
+def chat_id_of(update: Dict[str, Any]) -> int:
+    """chat_id апдейта (для маршрутизации), без разбора всего апдейта в модели"""
+    for field in ("message", "edited_message", "callback_query", "my_chat_member"):
+        event = update.get(field)
+        if not event:
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        if "from" in event:
+            return event["from"]["id"]
+    return update["update_id"]
+
+
+class ChatLocks:
+    """
+    Замки по chat_id: апдейты одного чата обрабатываются строго по очереди
+
+    Замок удаляется, только когда его никто не держит и не ждёт: сразу
+    после release() разбуженный ожидающий ещё не захватил замок, и новый
+    замок для того же чата пустил бы следующий апдейт параллельно с ним.
+    """
+
+    def __init__(self):
+        # chat_id -> [замок, сколько апдейтов его держат или ждут]
+        self._locks: Dict[int, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, chat_id: int) -> AsyncIterator[None]:
+        entry = self._locks.get(chat_id)
+        if entry is None:
+            entry = self._locks[chat_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[chat_id]
+
+
+# ========================================
+# ВОРКЕР
+# ========================================
+
+def _worker_main(index: int, workers: int, queue: "multiprocessing.Queue") -> None:
+    """Точка входа процесса-воркера"""
+    # Остановкой управляет родитель (через sentinel в очереди)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Импорты унаследованы от родителя; этапы воркера считаются от fork
+    STARTUP.reset()
+
+    # Глобальный лимит Telegram — на бота, поэтому делим его между воркерами
+    app.OUTBOUND.global_rate /= workers
+
+    asyncio.run(_worker(index, workers, queue))
+
+
+async def _worker(index: int, workers: int, queue: "multiprocessing.Queue") -> None:
+    loop = asyncio.get_running_loop()
+    updates: asyncio.Queue = asyncio.Queue()
+
+    # Блокирующее чтение multiprocessing.Queue — в отдельном потоке
+    def reader() -> None:
+        while True:
+            item = queue.get()
+            loop.call_soon_threadsafe(updates.put_nowait, item)
+            if item is None:
+                break
+
+    threading.Thread(target=reader, daemon=True).start()
+
+    # У каждого воркера свой журнал отложенных доставок и свои счётчики /stats
+    if os.getenv('DELAYED_PATH'):
+        os.environ['DELAYED_PATH'] = f"{os.getenv('DELAYED_PATH')}.{index}"
+    stats_path = os.getenv('STATS_PATH', '')
+    if stats_path:
+        os.environ['STATS_PATH'] = f"{stats_path}.{index}"
+    if os.getenv('METRICS_PORT'):
+        # Порт на воркер: METRICS_PORT, METRICS_PORT + 1, ...
+        os.environ['METRICS_PORT'] = str(int(os.getenv('METRICS_PORT')) + index)
+    if os.getenv('EVENTS_DIR'):
+        os.environ['EVENTS_DIR'] = f"{os.getenv('EVENTS_DIR')}.{index}"
+    if os.getenv('NOTIFY_PATH'):
+        os.environ['NOTIFY_PATH'] = f"{os.getenv('NOTIFY_PATH')}.{index}"
+
+    bot = app.create_bot()
+    dp = app.create_dispatcher()
+    if stats_path:
+        # /stats показывает все воркеры, а не только этот
+        dp["funnel"].peers = tuple(f"{stats_path}.{i}" for i in range(workers) if i != index)
+    await dp.emit_startup(bot=bot)
+
+    # Апдейты одного чата обрабатываются строго по очереди
+    locks = ChatLocks()
+    tasks = set()
+
+    async def process(update: Dict[str, Any]) -> None:
+        try:
+            async with locks.hold(chat_id_of(update)):
+                await dp.feed_raw_update(bot=bot, update=update)
+        except Exception:
+            logger.exception(f"Воркер {index}: ошибка при обработке апдейта")
+
+    logger.info(f"👷 Воркер {index} запущен (pid {os.getpid()})")
+    try:
+        while True:
+            update = await updates.get()
+            if update is None:
+                break
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+    finally:
+        await dp.emit_shutdown(bot=bot)
+        app.log_shutdown_stats(dp)
+        await bot.session.close()
+
+
+# ========================================
+# СУПЕРВИЗОР
+# ========================================
+
+def _spawn(index: int, queues: List["multiprocessing.Queue"]) -> multiprocessing.Process:
+    process = _ctx.Process(
+        target=_worker_main,
+        args=(index, len(queues), queues[index]),
+        name=f"quiz-worker-{index}",
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+def _spawner_main(queues: List["multiprocessing.Queue"], stopping, restarts) -> None:
+    """Процесс-инкубатор: форкает воркеров и перезапускает упавших"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Всё, что загружено к этому моменту, не трогаем сборщиком мусора —
+    # иначе refcount/GC-обход «пачкают» общие страницы памяти
+    gc.freeze()
+
+    processes: List[Optional[multiprocessing.Process]] = [_spawn(i, queues) for i in range(len(queues))]
+    while any(processes):
+        wait([process.sentinel for process in processes if process is not None])
+        for index, process in enumerate(processes):
+            if process is None or process.is_alive():
+                continue
+            process.join()
+            if stopping.is_set():
+                processes[index] = None
+                continue
+            logger.warning(f"⚠️ Воркер {index} завершился (код {process.exitcode}), перезапускаю")
+            with restarts.get_lock():
+                restarts.value += 1
+            processes[index] = _spawn(index, queues)
+
+
+class Supervisor:
+    """
+    Держит N воркеров и раскладывает по ним апдейты
+
+    start() вызывается до запуска цикла событий: воркеров форкает
+    процесс-инкубатор, отделённый от родителя в этот момент.
+    """
+
+    def __init__(self, workers: int):
+        self.queues: List[multiprocessing.Queue] = [_ctx.Queue() for _ in range(workers)]
+        self._stopping = _ctx.Event()
+        self._restarts = _ctx.Value("i", 0)
+        self.spawner: Optional[multiprocessing.Process] = None
+
+    @property
+    def restarts(self) -> int:
+        return self._restarts.value
+
+    def start(self) -> None:
+        self.spawner = _ctx.Process(
+            target=_spawner_main,
+            args=(self.queues, self._stopping, self._restarts),
+            name="quiz-spawner",
+        )
+        self.spawner.start()
+
+    def route(self, update: Dict[str, Any]) -> None:
+        index = hash(chat_id_of(update)) % len(self.queues)
+        self.queues[index].put(update)
+
+    async def watch(self, interval: float = 1.0) -> None:
+        """Остановиться, если упал сам инкубатор (воркеров больше некому перезапускать)"""
+        while self.spawner.is_alive():
+            await asyncio.sleep(interval)
+        raise RuntimeError(f"Процесс-инкубатор воркеров завершился (код {self.spawner.exitcode})")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        for queue in self.queues:
+            queue.put(None)
+        if self.spawner is not None:
+            self.spawner.join(timeout)
+            if self.spawner.is_alive():
+                logger.warning("⚠️ Воркеры не остановились вовремя")
+                self.spawner.terminate()
+
+
+async def poll_updates(supervisor: Supervisor) -> None:
+    """Long polling через сырой HTTP: апдейты не разбираются в pydantic-модели"""
+    base = (app.TELEGRAM_API_URL or "https://api.telegram.org").rstrip("/")
+    url = f"{base}/bot{app.BOT_TOKEN}"
+    offset = 0
+    backoff = POLL_BACKOFF
+
+    async with ClientSession(timeout=ClientTimeout(total=60)) as session:
+        await session.post(f"{url}/deleteWebhook")
+        while True:
+            try:
+                async with session.post(
+                    f"{url}/getUpdates", json={"offset": offset, "timeout": 30}
+                ) as response:
+                    status = response.status
+                    payload = await response.json(content_type=None)
+            except Exception:
+                logger.exception(f"Ошибка getUpdates, повтор через {backoff:.0f} с")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, POLL_BACKOFF_MAX)
+                continue
+
+            if not isinstance(payload, dict) or not payload.get("ok"):
+                # 401 (токен), 409 (другой getUpdates/webhook), 429, 5xx — не долбим API
+                payload = payload if isinstance(payload, dict) else {}
+                retry_after = (payload.get("parameters") or {}).get("retry_after")
+                delay = retry_after if retry_after else backoff
+                logger.error(
+                    f"getUpdates: {status} {payload.get('description', '')}, повтор через {delay:.0f} с"
+                )
+                await asyncio.sleep(delay)
+                if not retry_after:
+                    backoff = min(backoff * 2, POLL_BACKOFF_MAX)
+                continue
+
+            backoff = POLL_BACKOFF
+            for update in payload["result"]:
+                offset = update["update_id"] + 1
+                supervisor.route(update)
+
+
+async def serve_webhook(supervisor: Supervisor) -> None:
+    """Webhook: принимаем апдейт, кладём в очередь воркера, сразу отвечаем 200"""
+    secret = os.getenv('WEBHOOK_SECRET') or None
+
+    async def handle(request: web.Request) -> web.Response:
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+        supervisor.route(await request.json())
+        return web.json_response({})
+
+    web_app = web.Application()
+    web_app.router.add_post(os.getenv('WEBHOOK_PATH', '/webhook'), handle)
+    runner = web.AppRunner(web_app)
+    await runner.setup()
+    await web.TCPSite(
+        runner, os.getenv('WEBAPP_HOST', '0.0.0.0'), int(os.getenv('WEBAPP_PORT', 8080))
+    ).start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def supervise(supervisor: Supervisor) -> None:
+    intake = serve_webhook if app.BOT_MODE == 'webhook' else poll_updates
+    await asyncio.gather(intake(supervisor), supervisor.watch())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Квиз-бот в нескольких процессах")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    if app.TENANTS_PATH:
+        # Воркеры получают апдейты одного бота; несколько экспертов — в одном процессе main.py
+        parser.error("TENANTS_PATH поддерживается только в main.py")
+
+    # Контент собираем один раз здесь, воркеры только открывают бандл
+    bundle_path = os.getenv('CONTENT_BUNDLE', content_bundle.DEFAULT_PATH)
+    if bundle_path and content_bundle.ensure(bundle_path):
+        logger.info(f"📦 Собран бандл контента {bundle_path}")
+
+    supervisor = Supervisor(args.workers)
+    supervisor.start()
+    logger.info(f"🚀 Запущено воркеров: {args.workers}")
+
+    try:
+        asyncio.run(supervise(supervisor))
+    except KeyboardInterrupt:
+        logger.info("⛔ Останавливаю воркеры...")
+    finally:
+        supervisor.stop()
@@ -0,0 +1,170 @@
+"""
+Несколько экспертов (ботов) в одном процессе
+
+TENANTS_PATH — JSON-файл со списком экспертов:
+
+    [
+      {
+        "name": "marina",
+        "token": "123456:ABC...",
+        "template": {"expert_name": "Марина", "expert_name_dat": "Марине", "expert_username": "marina"},
+        "texts": {"welcome": "👋 Привет! Я бот {ЭКСПЕРТ} ..."},
+        "admin_ids": [123456789]
+      }
+    ]
+
+template — поля TemplateVars (не указанные берутся из DEFAULT_TEMPLATE),
+texts — необязательные замены текстов TEXT_KEYS; в них подставляются
+{ЭКСПЕРТ} и {ПРОДУКТ}, как в текстах результатов. admin_ids — кому
+из команды эксперта его бот пишет о заявках на разбор (пусто — владельцу,
+OWNER_ID).
+
+Общее для всех ботов: диспетчер, HTTP-сессия (один пул соединений),
+FSM-хранилище (ключи и так разделены по bot_id), таблица результатов
+и RESULT_SERIES_MAP. На эксперта — только Tenant с его строками
+и скомпилированные тексты в LRU-кэше scoring.get_compiled_template
+(main.create_bots растягивает его на всех экспертов). Лимиты исходящих
+(outbound.py) — у каждого бота свои.
+"""
+
+import json
+import sys
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, Optional, Sequence, Tuple
+
+from config import DEFAULT_TEMPLATE, TemplateVars
+from scoring import CompiledTemplate, cached_template, get_compiled_template
+
+# Тексты, которые эксперт может заменить
+TEXT_KEYS = ("welcome", "consult", "self")
+
+
+def _substitute(text: str, vars: TemplateVars) -> str:
+    return text.replace("{ЭКСПЕРТ}", vars.expert_name).replace("{ПРОДУКТ}", vars.product)
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """Эксперт: свой бот, свои переменные шаблонов и тексты"""
+    name: str
+    token: str
+    template: TemplateVars
+    # Замены из TEXT_KEYS, переменные уже подставлены
+    texts: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    # Чаты для уведомлений о заявках (пусто — владельцу)
+    admin_ids: Tuple[int, ...] = ()
+
+    @property
+    def bot_id(self) -> int:
+        return int(self.token.partition(":")[0])
+
+    def compiled(self) -> CompiledTemplate:
+        """Тексты результатов эксперта (из общего LRU-кэша)"""
+        return get_compiled_template(self.template)
+
+    def text(self, key: str) -> Optional[str]:
+        """Замена текста key или None (тогда — общий текст)"""
+        return self.texts.get(key)
+
+    def consult_text(self) -> str:
+        return self.texts.get("consult") or self.compiled().consult_text
+
+    def self_text(self) -> str:
+        return self.texts.get("self") or self.compiled().self_text
+
+    def memory(self) -> int:
+        """
+        Байт, которые держит эксперт: его строки и, если они сейчас
+        в кэше, скомпилированные тексты результатов
+        """
+        size = sys.getsizeof(self.token) + sum(sys.getsizeof(value) for value in self.template.__dict__.values())
+        size += sum(sys.getsizeof(text) for text in self.texts.values())
+        if self.template is not DEFAULT_TEMPLATE:
+            compiled = cached_template(self.template)
+            if compiled is not None:
+                size += sum(sys.getsizeof(r.text) for r in compiled.results.values())
+                size += sys.getsizeof(compiled.consult_text) + sys.getsizeof(compiled.self_text)
+        return size
+
+
+def parse_tenant(data: Dict[str, Any]) -> Tenant:
+    """Tenant из записи файла (ValueError с понятным текстом при ошибке)"""
+    name = data.get("name")
+    token = data.get("token", "")
+    if not name:
+        raise ValueError(f"У эксперта нет name: {data}")
+    if not token.partition(":")[0].isdigit():
+        raise ValueError(f"{name}: token не похож на токен бота")
+
+    known = {f.name for f in fields(TemplateVars)}
+    template_data = data.get("template", {})
+    unknown = set(template_data) - known
+    if unknown:
+        raise ValueError(f"{name}: неизвестные поля template: {', '.join(sorted(unknown))}")
+    template = replace(DEFAULT_TEMPLATE, **template_data) if template_data else DEFAULT_TEMPLATE
+
+    texts = data.get("texts", {})
+    unknown = set(texts) - set(TEXT_KEYS)
+    if unknown:
+        raise ValueError(f"{name}: неизвестные тексты: {', '.join(sorted(unknown))} (можно: {', '.join(TEXT_KEYS)})")
+
+    admin_ids = data.get("admin_ids", [])
+    if not isinstance(admin_ids, list) or not all(isinstance(chat_id, int) for chat_id in admin_ids):
+        raise ValueError(f"{name}: admin_ids — список числовых id чатов")
+
+    return Tenant(
+        name=name,
+        token=token,
+        template=template,
+        texts=MappingProxyType({key: _substitute(text, template) for key, text in texts.items()}),
+        admin_ids=tuple(admin_ids),
+    )
+
+
+class Tenants:
+    """Эксперты по bot_id"""
+
+    def __init__(self, tenants: Sequence[Tenant]):
+        self._by_bot: Dict[int, Tenant] = {}
+        for tenant in tenants:
+            if tenant.bot_id in self._by_bot:
+                raise ValueError(f"Один бот у {self._by_bot[tenant.bot_id].name} и {tenant.name}")
+            self._by_bot[tenant.bot_id] = tenant
+
+    @classmethod
+    def load(cls, path: str) -> "Tenants":
+        with open(path, encoding="utf-8") as f:
+            return cls([parse_tenant(data) for data in json.load(f)])
+
+    def get(self, bot_id: int) -> Optional[Tenant]:
+        return self._by_bot.get(bot_id)
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(self._by_bot.values())
+
+    def __len__(self) -> int:
+        return len(self._by_bot)
+
+    def memory(self) -> Dict[str, int]:
+        """Эксперт -> байт на него (см. Tenant.memory)"""
+        return {tenant.name: tenant.memory() for tenant in self}
+
+
+# Эксперт по умолчанию: DEFAULT_TEMPLATE (один бот из BOT_TOKEN)
+DEFAULT_TENANT = Tenant(name="default", token="0:", template=DEFAULT_TEMPLATE)
+
+_tenants: Optional[Tenants] = None
+
+
+def use_tenants(tenants: Optional[Tenants]) -> None:
+    """Подключить экспертов из файла (None — один эксперт по умолчанию)"""
+    global _tenants
+    _tenants = tenants
+
+
+def tenant_for(bot_id: int) -> Tenant:
+    """Эксперт бота; для незнакомого бота — DEFAULT_TENANT"""
+    if _tenants is None:
+        return DEFAULT_TENANT
+    return _tenants.get(bot_id) or DEFAULT_TENANT
@@ -0,0 +1,100 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from utils.analytics import FUNNEL_STEPS, FunnelStats, format_stats
+
+
+def result(bottleneck: str, perceived: str, twist: bool) -> SimpleNamespace:
+    return SimpleNamespace(bottleneck=bottleneck, perceived=perceived, twist=twist)
+
+
+def test_counters_and_funnel():
+    stats = FunnelStats(known_niches=("фитнес",))
+    stats.on_start()
+    stats.on_start()
+    stats.on_transition(1, None, "QuizStates:waiting_for_name")
+    stats.on_transition(1, "QuizStates:waiting_for_name", None)
+    stats.on_result(result("sales", "traffic", True), "фитнес")
+    stats.on_result(result("sales", "sales", False), "своя ниша")
+    stats.on_lead("consult")
+
+    funnel = dict((step, (reached, rate)) for step, reached, rate in stats.funnel())
+    assert tuple(funnel) == FUNNEL_STEPS
+    assert funnel["start"] == (2, 0.0) and funnel["waiting_for_name"] == (1, 0.5)
+    assert stats.results == 2 and stats.twist_rate == 0.5
+    assert stats.niches == {"фитнес": 1, "другое": 1}
+    assert stats.confusion[("traffic", "sales")] == 1
+    assert "Хотят разбор: 1" in format_stats(stats)
+
+
+def test_checkpoint_reload(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = FunnelStats(str(path))
+    stats.on_start()
+    stats.on_result(result("content", None, False), None)
+    stats.checkpoint()
+
+    restored = FunnelStats(str(path))
+    assert restored.to_dict() == stats.to_dict()
+    restored.on_start()
+    assert restored.reached["start"] == 2
+
+
+def test_combined_adds_other_workers(tmp_path):
+    worker = FunnelStats(str(tmp_path / "stats.json.1"))
+    worker.on_start()
+    worker.on_result(result("sales", "traffic", True), None)
+    worker.checkpoint()
+
+    stats = FunnelStats(str(tmp_path / "stats.json.0"))
+    stats.peers = (str(tmp_path / "stats.json.1"), str(tmp_path / "stats.json.2"))
+    stats.on_start()
+    stats.on_result(result("sales", "sales", False), None)
+
+    total = stats.combined()
+    assert total.reached["start"] == 2 and total.bottlenecks["sales"] == 2 and total.twists == 1
+    # Свои счётчики не меняются
+    assert stats.reached["start"] == 1
+
+
+def test_checkpoint_loop_and_stop(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = FunnelStats(str(path), checkpoint_interval=0.01)
+
+    async def main() -> None:
+        await stats.start()
+        stats.on_start()
+        for _ in range(100):
+            if path.exists():
+                break
+            await asyncio.sleep(0.01)
+        assert json.loads(path.read_text())["reached"] == {"start": 1}
+
+        # Без изменений файл не переписывается
+        mtime = path.stat().st_mtime_ns
+        await asyncio.sleep(0.05)
+        assert path.stat().st_mtime_ns == mtime
+
+        stats.on_lead("self")
+        await stats.stop()
+
+    asyncio.run(main())
+    assert FunnelStats(str(path)).leads == {"self": 1}
+    assert not (tmp_path / "stats.json.tmp").exists()
+
+
+def test_format_stats_matrix_and_niches():
+    stats = FunnelStats(known_niches=("фитнесе",))
+    stats.on_result(result("sales", "traffic", True), "фитнесе")
+    stats.on_result(result("sales", None, False), "фитнесе")
+    stats.on_result(result("product", "product", False), "коучинге")
+    stats.on_lead("consult")
+
+    text = format_stats(stats)
+    assert "✅ Результатов: 3, твист: 33%" in text
+    assert "<pre>думает \\ реально" in text
+    assert "• фитнесе: 2" in text and "• другое: 1" in text
+    assert "🎯 Конверсия результата в заявку: 33%" in text
+    # Пустая статистика тоже форматируется
+    assert "Результатов: 0" in format_stats(FunnelStats())
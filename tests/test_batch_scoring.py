@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import config
+from batch_scoring import NO_ZONE, ZONE_INDEX, ZONES, score_batch, states_to_arrays
+from quiz_graph import QUIZ_GRAPH
+from scoring import ResultTable, compute_result
+
+
+def table_states(table):
+    options = {option.id: option for q in table.questions for option in q.options}
+    return [
+        table.state_for(perceived, [options[option_id] for option_id in option_ids])
+        for perceived, option_ids in table.results
+    ]
+
+
+def assert_batch_matches(states, batch):
+    for row, state in enumerate(states):
+        expected = compute_result(state)
+        assert ZONES[batch.bottleneck[row]] == expected.bottleneck
+        perceived = batch.perceived[row]
+        assert (None if perceived == NO_ZONE else ZONES[perceived]) == expected.perceived
+        assert bool(batch.twist[row]) == expected.twist
+        assert batch.norm_scores[row].tolist() == [expected.norm_scores[zone] for zone in ZONES]
+
+
+def test_batch_equals_compute_result_for_every_table_row():
+    states = table_states(ResultTable(QUIZ_GRAPH))
+    batch = score_batch(*states_to_arrays(states))
+    assert len(batch.bottleneck) == len(states)
+    assert_batch_matches(states, batch)
+
+
+def test_batch_reads_config_at_call_time(monkeypatch):
+    """Подменённые настройки (как при подборе параметров) видны без явных аргументов"""
+    monkeypatch.setattr(config, "TWIST_THRESHOLD", 0.05)
+    monkeypatch.setattr(config, "ZONE_PRIORITY", list(reversed(config.ZONE_PRIORITY)))
+    states = table_states(ResultTable(QUIZ_GRAPH))
+    assert_batch_matches(states, score_batch(*states_to_arrays(states)))
+
+
+def test_batch_rejects_wrong_shapes():
+    with pytest.raises(ValueError):
+        score_batch(np.zeros((3, len(ZONES) + 1), dtype=np.int64))
+    with pytest.raises(ValueError):
+        score_batch(np.zeros((3, len(ZONES)), dtype=np.int64), np.full(2, ZONE_INDEX[ZONES[0]]))
@@ -0,0 +1,75 @@
+import asyncio
+import json
+
+from aiogram.fsm.storage.base import StorageKey
+
+from storage.bounded import BoundedMemoryStorage
+
+
+def key(user_id: int) -> StorageKey:
+    return StorageKey(bot_id=1, chat_id=user_id, user_id=user_id)
+
+
+def lines(path) -> list:
+    return [json.loads(line) for line in path.read_bytes().splitlines()]
+
+
+def test_restored_session_is_not_resurrected_after_restart(tmp_path):
+    path = tmp_path / "spill.jsonl"
+
+    async def first_run() -> None:
+        storage = BoundedMemoryStorage(max_sessions=1, spill_path=str(path))
+        await storage.set_state_and_data(key(1), "quiz:q1", {"answers": 1})
+        # Вторая сессия вытесняет первую в файл
+        await storage.set_state(key(2), "quiz:q1")
+        # Пользователь 1 вернулся и ушёл дальше
+        assert await storage.get_data(key(1)) == {"answers": 1}
+        await storage.set_state_and_data(key(1), "quiz:q5", {"answers": 5})
+        await storage.close()
+
+    async def second_run() -> None:
+        storage = BoundedMemoryStorage(max_sessions=10, spill_path=str(path))
+        # Старая копия (q1) из файла не поднимается: сессия 1 жила в памяти
+        assert await storage.get_state(key(1)) is None
+        # А пользователь 2 — поднимается
+        assert await storage.get_state(key(2)) == "quiz:q1"
+        await storage.close()
+
+    asyncio.run(first_run())
+    asyncio.run(second_run())
+    assert lines(path)[-1] == {"key": [1, 2, 2, None, "default"], "gone": True}
+    # При следующем открытии надгробия и поднятые записи выброшены
+    BoundedMemoryStorage(spill_path=str(path))
+    assert lines(path) == []
+
+
+def test_spill_file_is_capped(tmp_path):
+    path = tmp_path / "spill.jsonl"
+
+    async def run() -> BoundedMemoryStorage:
+        storage = BoundedMemoryStorage(max_sessions=1, spill_path=str(path), spill_max_bytes=4096)
+        for user_id in range(200):
+            await storage.set_state_and_data(key(user_id), "quiz:q1", {"name": "x" * 50})
+        await storage.close()
+        return storage.stats
+
+    stats = asyncio.run(run())
+    assert path.stat().st_size <= 4096
+    assert stats.spill_dropped > 0
+    # Самые свежие сессии остались в файле
+    assert lines(path)[-1]["key"][1] == 198
+
+
+def test_concurrent_gets_restore_once(tmp_path):
+    path = tmp_path / "spill.jsonl"
+
+    async def run() -> None:
+        storage = BoundedMemoryStorage(max_sessions=1, spill_path=str(path))
+        await storage.set_state_and_data(key(1), "quiz:q2", {"answers": 2})
+        await storage.set_state(key(2), "quiz:q1")
+        state, data = await asyncio.gather(storage.get_state(key(1)), storage.get_data(key(1)))
+        assert (state, data) == ("quiz:q2", {"answers": 2})
+        assert storage.stats.restored == 1
+        await storage.close()
+
+    asyncio.run(run())
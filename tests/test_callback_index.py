@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from aiogram.types import CallbackQuery, User
+
+from callback_index import CALLBACK_VERSION, CallbackIndex
+from handlers.start import NICHES, callbacks
+from quiz_graph import QUIZ_GRAPH
+from scoring import compile_template
+
+
+def callback(data: str) -> CallbackQuery:
+    user = User(id=1, is_bot=False, first_name="Анна")
+    return CallbackQuery(id="1", from_user=user, chat_instance="1", data=data)
+
+
+def test_parse_versioned_data():
+    index = CallbackIndex()
+    assert index.parse(CallbackIndex.pack("a", "q4_clear")) == ("a", "q4_clear")
+    assert index.parse(f"{CALLBACK_VERSION}:st:") == ("st", "")
+    # Аргумент может содержать двоеточие
+    assert index.parse(f"{CALLBACK_VERSION}:n:a:b") == ("n", "a:b")
+    assert index.parse("2:a:q4_clear") is None
+    assert index.parse("") is None
+    assert index.parse(None) is None
+
+
+def test_legacy_aliases_of_the_bot_routes():
+    assert callbacks.parse("start_quiz") == ("st", "")
+    assert callbacks.parse("decline_quiz") == ("dc", "")
+    assert callbacks.parse("to_consult") == ("rc", "")
+    assert callbacks.parse("to_self") == ("rs", "")
+    for code in NICHES:
+        assert callbacks.parse(f"niche_{code}") == ("n", code)
+    for option_id in QUIZ_GRAPH.option_ids:
+        assert callbacks.parse(option_id) == ("a", option_id)
+        assert callbacks.parse(CallbackIndex.pack("a", option_id)) == ("a", option_id)
+
+
+def test_every_result_button_has_a_route():
+    compiled = compile_template()
+    for rendered in compiled.results.values():
+        for _, data in rendered.buttons:
+            name = callbacks.route_name(data)
+            assert name is not None and callbacks.handler_name(data) is not None, data
+
+
+def test_dispatch_passes_only_accepted_data():
+    index = CallbackIndex()
+    calls = []
+
+    @index.route("x", legacy={"old_x": "legacy"})
+    async def handler(callback, arg, state):
+        calls.append((arg, state))
+
+    data = {"state": "s", "bot": "b"}
+    assert asyncio.run(index.dispatch(callback(CallbackIndex.pack("x", "1")), data)) is None
+    asyncio.run(index.dispatch(callback("old_x"), data))
+    assert calls == [("1", "s"), ("legacy", "s")]
+    assert asyncio.run(index.dispatch(callback(CallbackIndex.pack("y")), data)) is False
+
+    with pytest.raises(ValueError):
+        index.route("x")(handler)
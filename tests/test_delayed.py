@@ -0,0 +1,125 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+import delayed
+from delayed import DelayedScheduler, delivery
+
+SENT = []
+BOT = SimpleNamespace(id=1)
+
+
+@delivery("test_ok")
+async def deliver_ok(bot, chat_id, payload):
+    SENT.append(chat_id)
+
+
+@delivery("test_slow")
+async def deliver_slow(bot, chat_id, payload):
+    await asyncio.sleep(payload["seconds"])
+    SENT.append(chat_id)
+
+
+@delivery("test_flaky")
+async def deliver_flaky(bot, chat_id, payload):
+    if SENT.count(-chat_id) < payload["failures"]:
+        SENT.append(-chat_id)
+        raise ConnectionError("сеть")
+    SENT.append(chat_id)
+
+
+@delivery("test_blocked")
+async def deliver_blocked(bot, chat_id, payload):
+    raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text="x"), "bot was blocked by the user")
+
+
+def pending_ids(path) -> set:
+    return set(DelayedScheduler(str(path))._pending)
+
+
+def test_stop_waits_for_deliveries_in_flight(tmp_path):
+    SENT.clear()
+    path = tmp_path / "delayed.jsonl"
+
+    async def main() -> None:
+        scheduler = DelayedScheduler(str(path))
+        await scheduler.start(BOT)
+        scheduler.schedule(0, "test_slow", 1, {"seconds": 0.2})
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    assert SENT == [1]
+    assert pending_ids(path) == set()
+
+
+def test_unfinished_delivery_stays_in_journal(tmp_path):
+    SENT.clear()
+    path = tmp_path / "delayed.jsonl"
+
+    async def main() -> set:
+        scheduler = DelayedScheduler(str(path))
+        await scheduler.start(BOT)
+        slow = scheduler.schedule(0, "test_slow", 1, {"seconds": 5})
+        scheduler.schedule(0, "test_ok", 2)
+        later = scheduler.schedule(60, "test_ok", 3)
+        await asyncio.sleep(0.05)
+        await scheduler.stop(timeout=0.1)
+        return {slow, later}
+
+    expected = asyncio.run(main())
+    assert SENT == [2]
+    assert pending_ids(path) == expected
+
+
+def test_failed_delivery_is_retried(tmp_path, monkeypatch):
+    SENT.clear()
+    monkeypatch.setattr(delayed, "RETRY_DELAY", 0.05)
+    path = tmp_path / "delayed.jsonl"
+
+    async def main() -> None:
+        scheduler = DelayedScheduler(str(path))
+        await scheduler.start(BOT)
+        scheduler.schedule(0, "test_flaky", 1, {"failures": 2})
+        scheduler.schedule(0, "test_flaky", 2, {"failures": delayed.MAX_ATTEMPTS})
+        scheduler.schedule(0, "test_blocked", 3)
+        await asyncio.sleep(0.5)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    assert SENT.count(1) == 1 and SENT.count(-1) == 2
+    # Исчерпал попытки или заблокирован — больше не повторяем
+    assert 2 not in SENT and SENT.count(-2) == delayed.MAX_ATTEMPTS
+    assert pending_ids(path) == set()
+
+
+def test_retry_survives_restart(tmp_path, monkeypatch):
+    SENT.clear()
+    monkeypatch.setattr(delayed, "RETRY_DELAY", 60)
+    path = tmp_path / "delayed.jsonl"
+
+    async def main() -> None:
+        scheduler = DelayedScheduler(str(path))
+        await scheduler.start(BOT)
+        scheduler.schedule(0, "test_flaky", 1, {"failures": 1})
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    restored = DelayedScheduler(str(path))
+    assert [record["attempt"] for record in restored._pending.values()] == [2]
+    assert all(json.loads(line)["op"] == "add" for line in path.read_text().splitlines())
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    path = tmp_path / "delayed.jsonl"
+    good = {"op": "add", "id": 1, "due": 0, "kind": "test_ok", "chat_id": 1, "payload": {}}
+    path.write_text(json.dumps(good) + "\n" + '{"op":"ad')
+
+    scheduler = DelayedScheduler(str(path))
+    assert list(scheduler._pending) == [1]
+    # После загрузки журнал переписан без оборванной строки
+    assert [json.loads(line)["id"] for line in path.read_text().splitlines()] == [1]
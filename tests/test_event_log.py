@@ -0,0 +1,83 @@
+import asyncio
+import json
+import random
+
+from database.event_log import (
+    EVENT_ANSWER,
+    EVENT_START,
+    EVENT_STATE,
+    LEGACY_SCHEMA_FILE,
+    RECORD,
+    BITS_PER_QUESTION,
+    DurationHistogram,
+    EventLog,
+    current_schema,
+    funnel_timing,
+    option_popularity,
+    schema_ids,
+)
+from quiz_graph import QUIZ_GRAPH
+
+
+def write_legacy_log(directory, schema, records) -> None:
+    """Журнал старого формата (schema.json + events-000001.log) с другой схемой"""
+    directory.mkdir()
+    (directory / LEGACY_SCHEMA_FILE).write_text(json.dumps(schema), encoding="utf-8")
+    (directory / "events-000001.log").write_bytes(b"".join(RECORD.pack(*record) for record in records))
+
+
+def test_changed_graph_starts_a_new_segment_set(tmp_path):
+    directory = tmp_path / "events"
+    first = QUIZ_GRAPH.first
+    # В старой схеме у первого вопроса варианты шли в обратном порядке
+    old = current_schema()
+    old["questions"][0][1] = old["questions"][0][1][::-1]
+    write_legacy_log(directory, old, [(1.0, 7, EVENT_ANSWER, 0 << BITS_PER_QUESTION | 1)])
+
+    async def run() -> EventLog:
+        log = EventLog(str(directory))
+        log.on_answer(8, first, first.options[0])
+        await log.stop()
+        return log
+
+    log = asyncio.run(run())
+    assert schema_ids(str(directory)) == ["", log.schema_id]
+    # Старая запись читается по старой схеме: вариант 1 там — последний вариант сейчас
+    counts = option_popularity(str(directory))[first.id]
+    assert counts == {first.options[-1].id: 1, first.options[0].id: 1}
+
+
+def test_same_graph_reuses_the_segment_set(tmp_path):
+    directory = str(tmp_path / "events")
+
+    async def run() -> str:
+        log = EventLog(directory)
+        log.on_start(1)
+        await log.stop()
+        return log.schema_id
+
+    assert asyncio.run(run()) == asyncio.run(run())
+    assert len(schema_ids(directory)) == 1
+
+
+def test_funnel_timing_median_is_close(tmp_path):
+    directory = tmp_path / "events"
+    rng = random.Random(1)
+    delays = [rng.uniform(1, 100) for _ in range(2001)]
+    records = []
+    for user_id, delay in enumerate(delays):
+        records += [(0.0, user_id, EVENT_START, 0), (delay, user_id, EVENT_STATE, 1)]
+    write_legacy_log(directory, current_schema(), records)
+
+    step, reached, median = funnel_timing(str(directory))[1]
+    expected = sorted(delays)[1000]
+    assert reached == len(delays)
+    assert abs(median - expected) / expected < 0.03
+
+
+def test_histogram_memory_does_not_grow_with_events():
+    histogram = DurationHistogram()
+    for index in range(100_000):
+        histogram.add(index % 600)
+    assert histogram.count == 100_000
+    assert len(histogram.buckets) < 200
@@ -0,0 +1,100 @@
+import csv
+import os
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+from database.export import ANSWER_COLUMNS, ExportRequest, export_to_file, iter_chunks
+from database.recorder import INSERT_COMPLETION, INSERT_LEAD, SCHEMA, Completion, Lead
+from quiz_graph import QUIZ_GRAPH
+from session_codec import QuizSession
+
+
+def at(day: str) -> float:
+    """Полдень дня day (ГГГГ-ММ-ДД) в локальном времени"""
+    return datetime.fromisoformat(f"{day}T12:00:00").timestamp()
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    session = QuizSession()
+    for question in QUIZ_GRAPH:
+        session.answer(question, question.options[0])
+
+    path = str(tmp_path / "quiz.db")
+    with sqlite3.connect(path) as connection:
+        connection.executescript(SCHEMA)
+        connection.executemany(INSERT_COMPLETION, [
+            Completion(1, "anna", "Анна", "фитнесе", session.answers, "sales", "traffic", True, 1, 2, 3, 4, 5, at("2025-12-01")),
+            Completion(2, None, "Иван", None, session.answers, "product", None, False, 5, 4, 3, 2, 1, at("2025-12-10")),
+            Completion(3, None, "Олег", None, 0, "sales", None, False, 0, 0, 0, 0, 0, at("2025-12-20")),
+        ])
+        connection.executemany(INSERT_LEAD, [
+            Lead(1, "anna", "Анна", "sales", "consult", at("2025-12-02")),
+            Lead(2, None, "Иван, «Ко»", "product", "self", at("2025-12-11")),
+        ])
+    return path
+
+
+def read_csv(path: str) -> list:
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_parse_arguments():
+    request = ExportRequest.parse("parquet completions from=2025-12-01 to=2025-12-31 zone=sales")
+    assert request == ExportRequest("parquet", "completions", date(2025, 12, 1), date(2025, 12, 31), "sales")
+    assert ExportRequest.parse(None) == ExportRequest()
+
+    for args in ("xlsx", "zone=weather", "from=вчера", "limit=10"):
+        with pytest.raises(ValueError):
+            ExportRequest.parse(args)
+
+
+def test_leads_csv(db_path, tmp_path):
+    path, rows = export_to_file(db_path, ExportRequest(), str(tmp_path))
+    try:
+        with open(path, "rb") as f:
+            assert f.read(3) == b"\xef\xbb\xbf"
+        records = read_csv(path)
+    finally:
+        os.unlink(path)
+
+    assert rows == 2
+    assert list(records[0]) == ["id", "user_id", "username", "name", "bottleneck", "choice", "created_at"]
+    # Запятые и кавычки в имени экранируются
+    assert [(r["name"], r["choice"]) for r in records] == [("Анна", "consult"), ("Иван, «Ко»", "self")]
+
+
+def test_completions_filters_and_decoded_answers(db_path, tmp_path):
+    request = ExportRequest.parse("completions zone=sales from=2025-12-01 to=2025-12-19")
+    path, rows = export_to_file(db_path, request, str(tmp_path))
+    try:
+        records = read_csv(path)
+    finally:
+        os.unlink(path)
+
+    assert rows == 1
+    assert [r["user_id"] for r in records] == ["1"]
+    assert tuple(records[0])[-len(ANSWER_COLUMNS):] == ANSWER_COLUMNS
+    assert records[0]["question_1"] == QUIZ_GRAPH.first.options[0].answer
+
+    # Граница to включительно; без ответов — пустые колонки
+    request = ExportRequest.parse("completions zone=sales to=2025-12-20")
+    rows = [row for chunk in iter_chunks(db_path, request) for row in chunk]
+    assert [row[1] for row in rows] == [1, 3]
+    assert rows[1][-len(ANSWER_COLUMNS):] == (None,) * len(ANSWER_COLUMNS)
+
+
+def test_chunks_cover_every_row(db_path):
+    request = ExportRequest(table="completions")
+    chunks = list(iter_chunks(db_path, request, chunk_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [row[0] for chunk in chunks for row in chunk] == [1, 2, 3]
+
+
+def test_failed_export_leaves_no_file(tmp_path):
+    with pytest.raises(sqlite3.OperationalError):
+        export_to_file(str(tmp_path / "missing.db"), ExportRequest(), str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from loadtest.fake_telegram import FakeBotAPI, FakeTelegramClient
+from loadtest.quiz_load import buttons, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def with_bot(scenario, **api_options):
+    """scenario(api, bot) против FakeBotAPI через настоящую сессию aiogram"""
+    async def run():
+        api = FakeBotAPI(**api_options)
+        await api.start()
+        bot = Bot("123456:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+        try:
+            return await scenario(api, bot)
+        finally:
+            await bot.session.close()
+            await api.stop()
+
+    return asyncio.run(run())
+
+
+def test_sent_messages_are_queued_per_chat():
+    async def scenario(api, bot):
+        markup = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Да", callback_data="1:st")]])
+        sent = await bot.send_message(7, "Привет", reply_markup=markup)
+        reply = await api.wait_reply(7, timeout=1)
+        return sent, reply, dict(api.calls)
+
+    sent, reply, calls = with_bot(scenario)
+    assert sent.chat.id == 7 and sent.text == "Привет"
+    assert buttons(reply) == ["1:st"]
+    assert calls == {"sendMessage": 1}
+
+
+def test_get_updates_honours_offset():
+    client = FakeTelegramClient("")
+
+    async def scenario(api, bot):
+        first, second = client.message_update(1, "/start"), client.callback_update(1, "1:st")
+        api.push_update(first)
+        api.push_update(second)
+        updates = await bot.get_updates(timeout=0)
+        rest = await bot.get_updates(offset=updates[0].update_id + 1, timeout=0)
+        return updates, rest
+
+    updates, rest = with_bot(scenario)
+    assert [update.update_id for update in updates] == [1, 2]
+    assert updates[0].message.entities[0].type == "bot_command"
+    assert [update.callback_query.data for update in rest] == ["1:st"]
+
+
+def test_error_rate_answers_429_with_retry_after():
+    async def scenario(api, bot):
+        with pytest.raises(TelegramRetryAfter) as error:
+            await bot.send_message(7, "Привет")
+        return error.value.retry_after, dict(api.errors)
+
+    assert with_bot(scenario, error_rate=1.0, retry_after=3) == (3, {"sendMessage": 1})
+
+
+def test_percentile():
+    values = [float(n) for n in range(1, 101)]
+    assert percentile(values, 0.5) == 51.0
+    assert percentile(values, 0.99) == 100.0
+    assert percentile([1.0], 0.95) == 1.0
+
+
+def test_full_quiz_load_run():
+    """Весь сценарий квиза через polling у FakeBotAPI: все пользователи доходят до конца"""
+    env = {**os.environ, "BOT_TOKEN": "", "TENANTS_PATH": "", "OWNER_ID": "", "STATIC_FAST_PATH": "0"}
+    # Пустые пути — бот ничего не пишет на диск
+    env.update(dict.fromkeys(("DATABASE_PATH", "STATS_PATH", "DELAYED_PATH", "NOTIFY_PATH", "EVENTS_DIR"), ""))
+    # Лимит в чат (1 сообщение/с) растянул бы каждый шаг до секунды
+    env.update(OUTBOUND_CHAT_RATE="1000", OUTBOUND_CHAT_BURST="1000")
+    result = subprocess.run(
+        [sys.executable, "-m", "loadtest.quiz_load", "--users", "3", "--ramp", "0", "--think", "0", "--timeout", "20"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert "Пользователей: 3, дошли до конца: 3, сбои по шагам: {}" in result.stdout
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from aiohttp import ClientSession
+
+from utils import metrics
+from utils.metrics import MetricsServer, Registry
+
+
+def test_text_format_of_every_metric_kind():
+    registry = Registry()
+    updates = registry.counter("updates_total", "Апдейтов", ["type"])
+    sessions = registry.gauge("sessions", "Сессий")
+    latency = registry.histogram("latency_seconds", "Задержка", ["op"], buckets=(0.1, 1.0))
+
+    updates.inc("message")
+    updates.inc("message", amount=2)
+    updates.inc('callback "x"\n')
+    sessions.set(5)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, "get")
+
+    assert registry.render() == "\n".join([
+        "# HELP updates_total Апдейтов",
+        "# TYPE updates_total counter",
+        'updates_total{type="message"} 3',
+        'updates_total{type="callback \\"x\\"\\n"} 1',
+        "# HELP sessions Сессий",
+        "# TYPE sessions gauge",
+        "sessions 5",
+        "# HELP latency_seconds Задержка",
+        "# TYPE latency_seconds histogram",
+        # Граница корзины включительно (le), корзины накопительные
+        'latency_seconds_bucket{op="get",le="0.1"} 2',
+        'latency_seconds_bucket{op="get",le="1.0"} 3',
+        'latency_seconds_bucket{op="get",le="+Inf"} 4',
+        'latency_seconds_sum{op="get"} 3.65',
+        'latency_seconds_count{op="get"} 4',
+    ]) + "\n"
+
+
+def test_gauge_collector_and_duplicate_names():
+    registry = Registry()
+    gauge = registry.gauge("users", "Пользователей", ["state"], collect=lambda: {("q1",): 2, ("q2",): 1})
+    assert gauge.render()[2:] == ['users{state="q1"} 2', 'users{state="q2"} 1']
+
+    # Упавший коллектор не ломает остальной /metrics
+    gauge.collect = lambda: 1 / 0
+    assert gauge.render()[2:] == []
+
+    with pytest.raises(ValueError):
+        registry.counter("users", "Ещё раз")
+
+
+def test_storage_collectors_count_sessions_by_state():
+    class Storage:
+        def session_states(self):
+            return ["QuizStates:question_1", "QuizStates:question_1", "QuizStates:show_result", None]
+
+    try:
+        metrics.storage_collectors(Storage())
+        assert metrics.SESSIONS.collect() == {(): 4}
+        assert metrics.USERS_BY_STATE.collect() == {("question_1",): 2, ("show_result",): 1}
+        # Хранилище без обхода (Redis) — без коллекторов
+        metrics.storage_collectors(object())
+        assert metrics.SESSIONS.collect is None and metrics.USERS_BY_STATE.collect is None
+    finally:
+        metrics.SESSIONS.collect = metrics.USERS_BY_STATE.collect = None
+
+
+def test_metrics_endpoint():
+    registry = Registry()
+    registry.counter("hits_total", "Попаданий").inc()
+
+    async def main() -> tuple:
+        server = MetricsServer("127.0.0.1", 0, registry=registry, lag_interval=0.01)
+        await server.start()
+        try:
+            port = server._runner.addresses[0][1]
+            async with ClientSession() as client:
+                async with client.get(f"http://127.0.0.1:{port}/metrics") as response:
+                    return response.status, response.headers["Content-Type"], await response.text()
+        finally:
+            await server.stop()
+
+    status, content_type, body = asyncio.run(main())
+    assert status == 200
+    assert content_type.startswith("text/plain")
+    assert "hits_total 1\n" in body
@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+from utils.notifications import LeadNotifier
+
+
+class FlakyBot:
+    """Бот, у которого отправка в chats_down падает"""
+
+    def __init__(self, *chats_down: int):
+        self.id = 1
+        self.chats_down = set(chats_down)
+        self.messages = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        if chat_id in self.chats_down:
+            raise ConnectionError("сеть")
+        self.messages.append((chat_id, text))
+
+
+def lead(user_id: int) -> dict:
+    return {"user_id": user_id, "username": None, "name": f"Лид {user_id}", "niche": None,
+            "bottleneck": "sales", "perceived": None, "expert": None, "at": 0.0}
+
+
+def test_retry_goes_only_to_chats_that_missed_the_leads(tmp_path):
+    path = tmp_path / "notify.jsonl"
+
+    async def main() -> None:
+        bot = FlakyBot(2)
+        notifier = LeadNotifier([1, 2], str(path), window=60)
+        notifier._bot = bot
+        notifier.notify(lead(10))
+        await notifier.flush()
+        assert [chat for chat, _ in bot.messages] == [1] and notifier.pending == 1
+
+        notifier.notify(lead(11))
+        bot.chats_down.clear()
+        await notifier.flush()
+        # Чат 1 получает только новую заявку, чат 2 — обе
+        assert [(chat, "Лид 10" in text, "Лид 11" in text) for chat, text in bot.messages[1:]] == [
+            (1, False, True), (2, True, True),
+        ]
+        assert notifier.pending == 0 and notifier.sent_leads == 2
+        await notifier.stop()
+
+    asyncio.run(main())
+    assert LeadNotifier([1, 2], str(path)).pending == 0
+    assert path.read_text() == ""
+
+
+def test_partial_delivery_survives_restart(tmp_path):
+    path = tmp_path / "notify.jsonl"
+
+    async def first_run() -> None:
+        notifier = LeadNotifier([1, 2], str(path), window=60)
+        notifier.notify(lead(10))
+        await notifier.start(FlakyBot(2))
+        await asyncio.sleep(0.05)
+        await notifier.stop()
+
+    async def second_run() -> FlakyBot:
+        bot = FlakyBot()
+        notifier = LeadNotifier([1, 2], str(path), window=60)
+        assert notifier.pending == 1
+        await notifier.start(bot)
+        await asyncio.sleep(0.05)
+        await notifier.stop()
+        assert notifier.pending == 0
+        return bot
+
+    asyncio.run(first_run())
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["op"] for record in records] == ["add", "sent"] and records[1]["chat_id"] == 1
+
+    assert [chat for chat, _ in asyncio.run(second_run()).messages] == [2]
+
+
+def test_legacy_sent_record_covers_every_chat(tmp_path):
+    path = tmp_path / "notify.jsonl"
+    path.write_text(
+        json.dumps({"op": "add", "id": 1, **lead(10)}) + "\n"
+        + json.dumps({"op": "add", "id": 2, **lead(11)}) + "\n"
+        + json.dumps({"op": "sent", "ids": [1]}) + "\n"
+    )
+    notifier = LeadNotifier([1, 2], str(path))
+    assert list(notifier._pending) == [2]
+
+
+def test_torn_journal_line_does_not_block_startup(tmp_path):
+    path = tmp_path / "notify.jsonl"
+    path.write_text(json.dumps({"op": "add", "id": 1, **lead(10)}) + "\n" + '{"op": "se')
+    notifier = LeadNotifier([1], str(path))
+    assert list(notifier._pending) == [1]
+    assert len(path.read_text().splitlines()) == 1
+
+
+class NamedBot(FlakyBot):
+    def __init__(self, bot_id: int):
+        super().__init__()
+        self.id = bot_id
+
+
+def test_tenant_leads_go_to_tenant_admins_through_tenant_bot(tmp_path):
+    path = tmp_path / "notify.jsonl"
+    owner_bot, marina_bot = NamedBot(1), NamedBot(111)
+
+    async def main() -> None:
+        notifier = LeadNotifier([999], str(path), window=60)
+        await notifier.start(owner_bot, [marina_bot, owner_bot])
+        notifier.notify(lead(10), chat_ids=(50, 51), bot_id=111)
+        notifier.notify(lead(11))
+        await notifier.flush()
+        assert notifier.pending == 0
+        await notifier.stop()
+
+    asyncio.run(main())
+    assert [chat for chat, _ in marina_bot.messages] == [50, 51]
+    assert all("Лид 10" in text and "Лид 11" not in text for _, text in marina_bot.messages)
+    assert [(chat, "Лид 11" in text, "Лид 10" in text) for chat, text in owner_bot.messages] == [(999, True, False)]
+
+
+def test_tenant_recipients_survive_restart(tmp_path):
+    path = tmp_path / "notify.jsonl"
+    LeadNotifier([999], str(path)).notify(lead(10), chat_ids=(50,), bot_id=111)
+    marina_bot = NamedBot(111)
+
+    async def main() -> None:
+        notifier = LeadNotifier([999], str(path), window=60)
+        await notifier.start(NamedBot(1), [marina_bot])
+        await notifier.flush()
+        await notifier.stop()
+
+    asyncio.run(main())
+    assert [chat for chat, _ in marina_bot.messages] == [50]
+
+
+def test_lead_without_recipients_is_dropped():
+    notifier = LeadNotifier([])
+    notifier.notify(lead(10))
+    assert notifier.pending == 0
+    notifier.notify(lead(11), chat_ids=(50,), bot_id=111)
+    assert notifier.pending == 1
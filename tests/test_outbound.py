@@ -0,0 +1,50 @@
+import asyncio
+
+from outbound import OutboundScheduler, Priority
+
+
+def test_scheduler_survives_several_event_loops():
+    """Глобальный планировщик работает в нескольких asyncio.run подряд"""
+    scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000)
+
+    async def send() -> None:
+        await asyncio.wait_for(scheduler.acquire(1, 1, Priority.DEFAULT), 1)
+        # Очередь опустела — выдача токенов ждёт следующего запроса
+        await asyncio.sleep(0.01)
+        assert not scheduler._lane(1).worker.done()
+
+    asyncio.run(send())
+    asyncio.run(send())
+    assert scheduler.stats.queue_depth == 0
+
+
+def test_chat_retry_after_does_not_pause_other_chats():
+    scheduler = OutboundScheduler(global_rate=1000, chat_rate=1000, chat_burst=1000)
+    scheduler.retry_after(1, 1, 30)
+    assert scheduler._chat_bucket(1, 1).reserve() > 20
+    assert scheduler._chat_bucket(1, 2).reserve() == 0
+    assert scheduler.global_bucket(1).reserve() == 0
+
+    scheduler.retry_after(1, None, 30)
+    assert scheduler.global_bucket(1).reserve() > 20
+    # Лимиты у каждого бота свои
+    assert scheduler.global_bucket(2).reserve() == 0
+    assert scheduler._chat_bucket(2, 1).reserve() == 0
+
+
+def test_busy_bot_does_not_starve_others():
+    """Очередь одного бота не задерживает отправки другого"""
+    scheduler = OutboundScheduler(global_rate=10, chat_rate=1000, chat_burst=1000)
+
+    async def scenario() -> float:
+        busy = [asyncio.create_task(scheduler.acquire(1, chat, Priority.DEFAULT)) for chat in range(50)]
+        await asyncio.sleep(0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await scheduler.acquire(2, 1, Priority.DEFAULT)
+        waited = loop.time() - started
+        for task in busy:
+            task.cancel()
+        return waited
+
+    assert asyncio.run(scenario()) < 0.5
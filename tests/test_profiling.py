@@ -0,0 +1,65 @@
+import asyncio
+import os
+import pstats
+
+from utils.profiling import Profiler, record_api, record_storage
+
+
+def test_split_attributes_waits_to_the_running_handler():
+    profiler = Profiler()
+
+    async def handler(name: str, api: float, storage: float) -> None:
+        started, token = profiler.begin()
+        await asyncio.sleep(0)
+        record_api(api)
+        record_storage("get_data", storage)
+        await asyncio.sleep(0)
+        profiler.end(name, started, token)
+
+    async def main() -> None:
+        # Параллельные хендлеры: у каждого свой счётчик ожиданий
+        await asyncio.gather(handler("answer", 0.5, 0.25), handler("start", 0.125, 0.0), handler("answer", 0.5, 0.25))
+
+    asyncio.run(main())
+    # Вне хендлера ожидания никуда не записываются
+    record_api(1.0)
+
+    answer, start = profiler.handlers["answer"], profiler.handlers["start"]
+    assert (answer.calls, answer.api, answer.storage) == (2, 1.0, 0.5)
+    assert (start.calls, start.api, start.storage) == (1, 0.125, 0.0)
+    assert answer.cpu == 0.0    # wall меньше «ожиданий» — не уходит в минус
+    text = profiler.format_split()
+    assert text.splitlines()[0].split() == ["хендлер", "вызовов", "всего", "API", "FSM", "CPU"]
+    assert {line.split()[0] for line in text.splitlines()[1:]} == {"answer", "start"}
+
+
+def test_capture_covers_the_armed_updates():
+    profiler = Profiler(top=5)
+    assert profiler.capture_end() is None
+
+    profiler.arm(2, chat_id=7)
+    outputs = []
+    for _ in range(3):
+        profiler.capture_begin()
+        sum(range(1000))
+        outputs.append(profiler.capture_end())
+
+    assert outputs[0] is None and outputs[2] is None
+    text_path, prof_path = outputs[1]
+    try:
+        with open(text_path, encoding="utf-8") as f:
+            assert f.read().startswith("Апдейтов: 2,")
+        assert pstats.Stats(prof_path).total_calls > 0
+    finally:
+        os.unlink(text_path)
+        os.unlink(prof_path)
+    assert not profiler.capturing and profiler.capture_chat_id == 7
+
+
+def test_cancel_stops_capture():
+    profiler = Profiler()
+    profiler.arm(5, chat_id=7)
+    profiler.capture_begin()
+    profiler.cancel()
+    assert not profiler.capturing
+    assert profiler.capture_end() is None
@@ -0,0 +1,103 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.start import handle_answer
+from handlers.states import QuizStates
+from questions import QUESTIONS, Option, Question
+from quiz_graph import QUIZ_GRAPH, QuizGraph
+from session_codec import QuizSession
+
+
+class FakeTx:
+    """StateTransaction в памяти: данные и состояние"""
+
+    def __init__(self):
+        self.data = {}
+        self.state = None
+
+    async def get_data(self):
+        return dict(self.data)
+
+    async def set_data(self, data):
+        self.data = dict(data)
+
+    async def set_state(self, state):
+        self.state = state.state
+
+
+def answer(tx: FakeTx, option_id: str) -> list:
+    """handle_answer на нажатие option_id; что ушло в Bot API"""
+    sent = []
+
+    async def bot(method):
+        sent.append(method)
+
+    async def ack():
+        pass
+
+    callback = SimpleNamespace(answer=ack, message=SimpleNamespace(chat=SimpleNamespace(id=7)))
+    asyncio.run(handle_answer(callback, option_id, tx, delayed=None, bot=bot))
+    return sent
+
+
+def test_graph_walks_every_question_in_order():
+    ids = []
+    question = QUIZ_GRAPH.first
+    while question is not None:
+        ids.append(question.id)
+        assert isinstance(getattr(QuizStates, question.state).state, str)
+        question = QUIZ_GRAPH.next_question(question)
+
+    assert ids == ["q1", "q2", "q3", "perceived", "q4", "q5", "q6", "q7", "q8"]
+    assert sorted(ids) == sorted(QUIZ_GRAPH.questions)
+    assert QUIZ_GRAPH.answers["q1_worse"][0].id == "q1"
+
+
+def test_graph_rejects_broken_questions():
+    option = Option("dup", "Кнопка")
+    with pytest.raises(ValueError, match="callback_data"):
+        QuizGraph((Question("a", "s_a", "", (option,)), Question("b", "s_b", "", (option,))), "a")
+    with pytest.raises(ValueError, match="следующего"):
+        QuizGraph((Question("a", "s_a", "", (option,), next="nowhere"),), "a")
+    with pytest.raises(ValueError, match="зона"):
+        QuizGraph((Question("a", "s_a", "", (option,), zone="weather"),), "a")
+    with pytest.raises(ValueError, match="первого"):
+        QuizGraph(QUESTIONS, "nowhere")
+
+
+def test_each_answer_moves_to_the_next_question_state():
+    tx = FakeTx()
+    question = QUIZ_GRAPH.first
+    while QUIZ_GRAPH.next_question(question) is not None:
+        next_question = QUIZ_GRAPH.next_question(question)
+        sent = answer(tx, question.options[0].id)
+        assert tx.state == getattr(QuizStates, next_question.state).state
+        assert [method.text for method in sent] == [next_question.text]
+        question = next_question
+
+    session = QuizSession.from_data(tx.data)
+    assert all(session.option(q) is not None for q in QUIZ_GRAPH if q.next is not None)
+
+
+def test_q3_answer_resets_pain_of_the_previous_pass():
+    tx = FakeTx()
+    question = QUIZ_GRAPH.first
+    while QUIZ_GRAPH.next_question(question) is not None:
+        # Самые «больные» ответы, чтобы баллы точно были
+        answer(tx, max(question.options, key=lambda option: option.pain).id)
+        question = QUIZ_GRAPH.next_question(question)
+    assert any(QuizSession.from_data(tx.data).answers_state().scores.values())
+
+    reset = QUIZ_GRAPH.questions["q3"]
+    assert reset.reset_scores
+    answer(tx, reset.options[1].id)
+
+    session = QuizSession.from_data(tx.data)
+    assert tx.state == QuizStates.question_perceived.state
+    assert not any(session.answers_state().scores.values())
+    assert session.option(reset) is reset.options[1]
+    # Ответы до Q3 (точка А) и perceived сбросом не затрагиваются
+    assert session.option(QUIZ_GRAPH.first) is not None
+    assert session.option(QUIZ_GRAPH.questions["perceived"]) is not None
@@ -0,0 +1,86 @@
+import asyncio
+import sqlite3
+import time
+
+from database.recorder import Completion, Lead, QuizRecorder
+
+
+def completion(user_id: int) -> Completion:
+    return Completion(user_id, None, "Анна", "в фитнесе", 0, "sales", None, False, 1, 2, 3, 4, 5, time.time())
+
+
+def lead(user_id: int) -> Lead:
+    return Lead(user_id, "anna", "Анна", "sales", "consult", time.time())
+
+
+def count(path: str, table: str) -> int:
+    with sqlite3.connect(path) as connection:
+        return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_batches_are_flushed_while_running(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    recorder = QuizRecorder(path, batch_size=10, flush_interval=0.05)
+
+    async def main() -> int:
+        await recorder.start()
+        for user_id in range(25):
+            recorder.record_completion(completion(user_id))
+        recorder.record_lead(lead(1))
+
+        # Пишется без stop(): пачками не больше batch_size, не дольше flush_interval
+        deadline = time.monotonic() + 5
+        while recorder.stats.written < 26 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        written = count(path, "completions") + count(path, "leads")
+        await recorder.stop()
+        return written
+
+    assert asyncio.run(main()) == 26
+    assert recorder.stats.max_batch <= 10
+    assert recorder.stats.batches >= 3
+    assert recorder.stats.backlog == 0
+
+
+def test_stop_drains_the_queue(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    # Окно пачки больше теста: всё, что записано, записано остановкой
+    recorder = QuizRecorder(path, batch_size=1000, flush_interval=60)
+
+    async def main() -> None:
+        # Записи до start() тоже не теряются
+        recorder.record_completion(completion(1))
+        await recorder.start()
+        for user_id in range(2, 101):
+            recorder.record_completion(completion(user_id))
+        recorder.record_lead(lead(1))
+        started = time.monotonic()
+        await recorder.stop()
+        assert time.monotonic() - started < 5
+
+    asyncio.run(main())
+    assert count(path, "completions") == 100
+    assert count(path, "leads") == 1
+    assert (recorder.stats.written, recorder.stats.backlog, recorder.stats.errors) == (101, 0, 0)
+    # Повторный stop — ничего не делает
+    asyncio.run(recorder.stop())
+
+
+def test_failed_batch_is_counted_and_writing_continues(tmp_path):
+    path = str(tmp_path / "quiz.db")
+    recorder = QuizRecorder(path, flush_interval=0.01)
+    with sqlite3.connect(path) as connection:
+        connection.execute("DROP TABLE leads")
+
+    async def main() -> None:
+        await recorder.start()
+        recorder.record_lead(lead(1))
+        deadline = time.monotonic() + 5
+        while recorder.stats.errors == 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        recorder.record_completion(completion(1))
+        await recorder.stop()
+
+    asyncio.run(main())
+    assert recorder.stats.errors == 1
+    assert count(path, "completions") == 1
@@ -0,0 +1,100 @@
+import asyncio
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+
+import storage.fake_redis as fake_redis
+from middlewares.state_tx import StateTransaction
+from storage.fake_redis import FakeRedisServer
+from storage.instrumented import InstrumentedStorage
+from storage.redis_storage import QuizRedisStorage
+
+KEY = StorageKey(bot_id=1, chat_id=5, user_id=5)
+
+
+def with_storage(scenario, ttl: int = 3600):
+    async def main():
+        server = FakeRedisServer()
+        await server.start()
+        storage = QuizRedisStorage.from_url(server.url, ttl=ttl)
+        try:
+            return await scenario(server, storage)
+        finally:
+            await storage.close()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def test_state_and_data_round_trip():
+    async def scenario(server, storage):
+        data = {"name": "Анна", "answers": [1, 2], "perceived": None}
+        await storage.set_state_and_data(KEY, "QuizStates:question_4", data)
+        assert await storage.get_state_and_data(KEY) == ("QuizStates:question_4", data)
+        assert await storage.get_data(KEY) == data
+
+        # Компактный JSON: кириллица байтами UTF-8, без пробелов и \uXXXX
+        raw = server.data[storage.key_builder.build(KEY, "data").encode()][0]
+        assert raw == '{"name":"Анна","answers":[1,2],"perceived":null}'.encode()
+
+        await storage.set_state_and_data(KEY, None, {})
+        assert await storage.get_state_and_data(KEY) == (None, {})
+        assert server.data == {}
+
+    with_storage(scenario)
+
+
+def test_abandoned_session_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fake_redis.time, "monotonic", lambda: now[0])
+
+    async def scenario(server, storage):
+        await storage.set_state_and_data(KEY, "QuizStates:question_2", {"name": "Анна"})
+        now[0] += 50
+        # Ответ продлевает TTL
+        await storage.set_state_and_data(KEY, "QuizStates:question_3", {"name": "Анна", "q2": 1})
+        now[0] += 80
+        assert await storage.get_state(KEY) == "QuizStates:question_3"
+        now[0] += 21
+        assert await storage.get_state_and_data(KEY) == (None, {})
+
+    with_storage(scenario, ttl=100)
+
+
+def test_transaction_reads_state_and_data_in_one_request():
+    async def scenario(server, storage):
+        ops = []
+        instrumented = InstrumentedStorage(storage, lambda op, seconds: ops.append(op))
+        await storage.set_state_and_data(KEY, "QuizStates:question_1", {"name": "Анна"})
+        commands = server.commands
+
+        # Как в апдейте: FSMContextMiddleware читает состояние, хендлер — данные
+        context = FSMContext(storage=instrumented, key=KEY)
+        tx = StateTransaction(context, await context.get_state())
+        assert (await tx.get_data())["name"] == "Анна"
+        assert server.commands - commands == 1 and tx.reads == 0
+
+        await tx.update_data(q1="a")
+        await tx.set_state("QuizStates:question_2")
+        await tx.flush()
+        assert ops == ["get_state", "set_state_and_data"]
+
+        # Данные забираются один раз; после записи — снова из Redis
+        assert storage.take_prefetched_data(KEY) is None
+        assert await storage.get_data(KEY) == {"name": "Анна", "q1": "a"}
+
+    with_storage(scenario)
+
+
+def test_prefetched_data_is_per_key_and_dropped_on_write():
+    other = StorageKey(bot_id=1, chat_id=6, user_id=6)
+
+    async def scenario(server, storage):
+        await storage.set_data(KEY, {"a": 1})
+        await storage.get_state(KEY)
+        assert storage.take_prefetched_data(other) is None
+
+        await storage.set_data(KEY, {"a": 2})
+        assert storage.take_prefetched_data(KEY) is None
+
+    with_storage(scenario)
@@ -0,0 +1,136 @@
+from dataclasses import replace
+
+import pytest
+
+import config
+import scoring
+from quiz_graph import QUIZ_GRAPH
+from scoring import (
+    ResultTable,
+    build_final_message,
+    compile_template,
+    get_result_table,
+    render_key,
+)
+
+
+@pytest.fixture
+def table() -> ResultTable:
+    return ResultTable(QUIZ_GRAPH)
+
+
+@pytest.fixture
+def restore_config():
+    saved = dict(config.ZONE_MAX), config.TWIST_THRESHOLD
+    yield
+    config.ZONE_MAX.clear()
+    config.ZONE_MAX.update(saved[0])
+    config.TWIST_THRESHOLD = saved[1]
+    scoring._result_table = None
+
+
+def test_table_covers_every_answer_combination(table):
+    combinations = 1
+    for question in table.questions:
+        combinations *= len(question.options)
+    assert len(table.results) == combinations * len(table.perceived)
+    assert table.verify() == len(table.results)
+
+
+def test_verify_reports_a_wrong_entry(table):
+    key, result = next(iter(table.results.items()))
+    other = next(zone for zone in config.ZONE_MAX if zone != result.bottleneck)
+    table.results = {**table.results, key: replace(result, bottleneck=other)}
+    with pytest.raises(ValueError, match="расходится"):
+        table.verify()
+
+
+def test_render_key_finds_the_same_text_as_build_final_message(table):
+    compiled = compile_template(config.DEFAULT_TEMPLATE)
+    for result in table.results.values():
+        assert compiled.results[render_key(result)].text == build_final_message(result, config.DEFAULT_TEMPLATE)
+
+
+def test_table_is_rebuilt_when_config_is_rebound(restore_config):
+    first = get_result_table()
+    assert get_result_table() is first
+
+    # Новое значение, а не правка на месте: scoring должен увидеть его через config
+    config.TWIST_THRESHOLD = config.TWIST_THRESHOLD + 0.5
+    second = get_result_table()
+    assert second is not first
+    assert second.verify() == len(second.results)
+
+    config.ZONE_MAX["sales"] += 1
+    assert get_result_table() is not second
+
+
+def test_stale_bundle_is_dropped_when_config_changes(tmp_path, restore_config):
+    import content_bundle
+
+    path = str(tmp_path / "content.bundle")
+    content_bundle.build(path)
+    bundle = content_bundle.load(path)
+    scoring.use_bundle(bundle)
+    try:
+        assert get_result_table().fingerprint == bundle.fingerprint
+
+        config.TWIST_THRESHOLD = config.TWIST_THRESHOLD + 0.5
+        table = get_result_table()
+        # Таблица посчитана заново через compute_result, а не взята из бандла
+        assert scoring._bundle is None
+        assert table.verify() == len(table.results)
+    finally:
+        scoring.use_bundle(None)
+        bundle.close()
+
+
+def test_render_by_key_falls_back_for_unknown_keys():
+    compiled = compile_template()
+    key = next(iter(compiled.results))
+    assert scoring.render_by_key(key) == compiled.results[key]
+
+    # Ключ от прежнего контента (зоны уже нет) — рендер на лету, без KeyError
+    stale = scoring.render_by_key(("old_zone", False, None))
+    assert stale.text and stale.buttons == ()
+
+
+def test_deliver_result_survives_stale_and_malformed_keys():
+    import asyncio
+    from types import SimpleNamespace
+
+    from handlers.start import deliver_result
+
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        sent.append((chat_id, text))
+
+    bot = SimpleNamespace(id=1, send_message=send_message)
+    asyncio.run(deliver_result(bot, 7, {"key": ["old_zone", True, "sales"]}))
+    asyncio.run(deliver_result(bot, 8, {"key": ["sales", True]}))
+    asyncio.run(deliver_result(bot, 9, {}))
+    assert [chat_id for chat_id, _ in sent] == [7]
+
+
+def test_compiled_template_matches_rendering_on_the_fly(table):
+    """Заранее собранные тексты и кнопки эксперта — те же, что рендер на лету"""
+    template = replace(
+        config.DEFAULT_TEMPLATE,
+        expert_name="Александр",
+        expert_name_dat="Александру",
+        expert_username="alex_expert",
+        pronoun_nom="он",
+    )
+    compiled = compile_template(template)
+    for result in table.results.values():
+        rendered = scoring.render_result(result, template)
+        assert rendered == compiled.results[render_key(result)]
+        assert rendered.text == build_final_message(result, template)
+        assert [
+            (button.text, button.callback_data) for button in scoring.get_result_buttons(result, template)
+        ] == list(rendered.buttons)
+
+    assert compiled.consult_text == scoring.build_consult_message(template)
+    assert compiled.self_text == scoring.build_self_message(template)
+    assert "Александр" in compiled.consult_text and "alex_expert" in compiled.self_text
@@ -0,0 +1,29 @@
+import sys
+
+from utils.startup import StartupReport
+
+
+def timers() -> list:
+    return [finder for finder in sys.meta_path if type(finder).__name__ == "_ImportTimer"]
+
+
+def test_importing_modules_does_not_install_the_hook(monkeypatch):
+    for name in ("utils.startup", "utils.metrics"):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import utils.metrics  # noqa: F401
+
+    assert timers() == []
+
+
+def test_track_imports_until_done():
+    report = StartupReport()
+    report.track_imports()
+    assert len(timers()) == 1
+    sys.modules.pop("json.tool", None)
+    import json.tool  # noqa: F401
+    report.imports_done()
+
+    assert timers() == [] and "json.tool" in report.modules
+    # После imports_done хук больше не ставится
+    report.track_imports()
+    assert timers() == []
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from middlewares.state_tx import StateTransaction, StateTransactionMiddleware
+from storage.bounded import BoundedMemoryStorage
+from storage.instrumented import InstrumentedStorage
+
+KEY = StorageKey(bot_id=1, chat_id=1, user_id=1)
+
+
+def context(storage) -> tuple:
+    """FSMContext над хранилищем, которое записывает имена операций"""
+    ops = []
+    instrumented = InstrumentedStorage(storage, lambda op, seconds: ops.append(op))
+    return FSMContext(storage=instrumented, key=KEY), ops
+
+
+def test_one_read_and_one_write_per_update():
+    async def main() -> None:
+        state, ops = context(MemoryStorage())
+        await state.storage.set_data(KEY, {"name": "Анна"})
+        ops.clear()
+
+        tx = StateTransaction(state, "quiz:q1")
+        assert (await tx.get_data())["name"] == "Анна"
+        await tx.update_data(niche="фитнес")
+        await tx.update_data({"q1": "a"})
+        await tx.set_state("quiz:q2")
+        # До flush в хранилище ничего не ушло
+        assert ops == ["get_data"] and await state.storage.get_state(KEY) is None
+
+        await tx.flush()
+        assert ops == ["get_data", "get_state", "set_data", "set_state"]
+        assert await state.storage.get_data(KEY) == {"name": "Анна", "niche": "фитнес", "q1": "a"}
+        assert await state.storage.get_state(KEY) == "quiz:q2"
+        assert (tx.reads, tx.writes) == (1, 2)
+
+    asyncio.run(main())
+
+
+def test_atomic_write_when_storage_supports_it():
+    async def main() -> None:
+        state, ops = context(BoundedMemoryStorage())
+        tx = StateTransaction(state, None)
+        await tx.set_data({"name": "Анна"})
+        await tx.set_state("quiz:q1")
+        await tx.flush()
+        assert ops == ["set_state_and_data"] and (tx.reads, tx.writes) == (0, 1)
+
+        # Повторный flush без изменений ничего не пишет
+        await tx.flush()
+        assert ops == ["set_state_and_data"]
+
+    asyncio.run(main())
+
+
+def test_only_changed_parts_are_written():
+    async def main() -> None:
+        state, ops = context(BoundedMemoryStorage())
+        tx = StateTransaction(state, "quiz:q1")
+        await tx.set_state("quiz:q2")
+        await tx.flush()
+        assert ops == ["set_state"]
+
+        tx = StateTransaction(state, "quiz:q2")
+        await tx.get_data()
+        await tx.flush()
+        assert ops == ["set_state", "get_data"] and tx.writes == 0
+
+    asyncio.run(main())
+
+
+def test_middleware_discards_changes_when_handler_fails():
+    middleware = StateTransactionMiddleware()
+    transitions = []
+    middleware.on_transition(lambda user_id, old, new: transitions.append((user_id, old, new)))
+
+    async def main() -> None:
+        state, _ = context(MemoryStorage())
+
+        async def failing(event, data):
+            await data["tx"].update_data(q1="a")
+            await data["tx"].set_state("quiz:q2")
+            raise RuntimeError("сбой")
+
+        async def answering(event, data):
+            await data["tx"].set_state("quiz:q2")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await middleware(failing, object(), {"state": state, "raw_state": "quiz:q1"})
+        assert await state.storage.get_state(KEY) is None
+        assert await state.storage.get_data(KEY) == {}
+        assert transitions == [] and middleware.stats.updates == 0
+
+        assert await middleware(answering, object(), {"state": state, "raw_state": "quiz:q1"}) == "ok"
+        assert await state.storage.get_state(KEY) == "quiz:q2"
+        assert transitions == [(1, "quiz:q1", "quiz:q2")]
+        assert (middleware.stats.reads, middleware.stats.writes) == (1, 1)
+
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+import static_messages
+from loadtest.fake_telegram import FakeBotAPI
+from quiz_graph import QUIZ_GRAPH
+from static_messages import QUESTION_MESSAGES, STATIC_MESSAGES, enable_fast_path
+
+
+class RecordingAPI(FakeBotAPI):
+    """FakeBotAPI, который запоминает параметры каждого sendMessage"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def result_for(self, method, params):
+        if method == "sendMessage":
+            self.sent.append(dict(params))
+        return super().result_for(method, params)
+
+
+def _payload(params: dict) -> dict:
+    """Параметры запроса; reply_markup — разобранным JSON"""
+    params = dict(params)
+    if "reply_markup" in params:
+        params["reply_markup"] = json.loads(params["reply_markup"])
+    return params
+
+
+def _send_all(fast: bool) -> list:
+    """Каждое статичное сообщение (и первый вопрос со своим текстом) через настоящую сессию aiogram"""
+    async def run() -> list:
+        api = RecordingAPI()
+        await api.start()
+        bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(api.url)))
+        enable_fast_path(fast)
+        try:
+            for message in STATIC_MESSAGES:
+                await bot(message.method(7))
+            first = QUESTION_MESSAGES[QUIZ_GRAPH.first.id]
+            await bot(first.method(7, "Отлично, <b>Анна</b>! Вопрос 1"))
+        finally:
+            enable_fast_path(False)
+            await bot.session.close()
+            await api.stop()
+        return api.sent
+
+    return asyncio.run(run())
+
+
+def test_fast_path_sends_the_same_payload_as_send_message():
+    normal = _send_all(fast=False)
+    fast = _send_all(fast=True)
+
+    assert len(fast) == len(STATIC_MESSAGES) + 1
+    assert [_payload(params) for params in fast] == [_payload(params) for params in normal]
+    assert fast[-1]["text"] == "Отлично, <b>Анна</b>! Вопрос 1"
+    assert "reply_markup" in fast[-1]
+
+
+def test_fast_path_reuses_the_prepared_message():
+    message = QUESTION_MESSAGES[QUIZ_GRAPH.first.id]
+    enable_fast_path()
+    try:
+        first, second = message.method(1), message.method(2)
+    finally:
+        enable_fast_path(False)
+
+    assert (first.chat_id, second.chat_id) == (1, 2)
+    assert first.reply_markup is second.reply_markup is message.markup_json
+    assert message.prepared.chat_id == 0
+    assert not static_messages._fast_path
@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+from supervisor import ChatLocks, chat_id_of
+
+
+def test_chat_locks_keep_order_after_release():
+    """Апдейт, пришедший сразу после release(), ждёт уже разбуженного"""
+    locks = ChatLocks()
+    events = []
+
+    async def handle(name: str, pause: int) -> None:
+        async with locks.hold(42):
+            events.append(f"{name}+")
+            for _ in range(pause):
+                await asyncio.sleep(0)
+            events.append(f"{name}-")
+
+    async def scenario() -> None:
+        first = asyncio.create_task(handle("a", 3))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(handle("b", 3))
+        # Ждём, пока a отпустит замок, а b ещё не успеет его захватить
+        while "a-" not in events:
+            await asyncio.sleep(0)
+        third = asyncio.create_task(handle("c", 0))
+        await asyncio.gather(first, second, third)
+
+    asyncio.run(scenario())
+    assert events == ["a+", "a-", "b+", "b-", "c+", "c-"]
+    assert len(locks) == 0
+
+
+def test_chat_id_of_callback_and_message():
+    message = {"update_id": 1, "message": {"chat": {"id": 7}, "from": {"id": 8}}}
+    callback = {"update_id": 2, "callback_query": {"from": {"id": 9}, "message": {"chat": {"id": 10}}}}
+    assert chat_id_of(message) == 7
+    assert chat_id_of(callback) == 10
+    assert chat_id_of({"update_id": 3}) == 3
+
+
+class Routed:
+    def __init__(self):
+        self.updates = []
+
+    def route(self, update):
+        self.updates.append(update)
+
+
+def poll_against(responses, seconds: float, monkeypatch) -> tuple:
+    """poll_updates против сервера, который отвечает responses по очереди (последний — повторяется)"""
+    from aiohttp import web
+
+    import supervisor
+
+    calls = []
+
+    async def get_updates(request):
+        calls.append(await request.json())
+        status, body = responses[min(len(calls), len(responses)) - 1]
+        return web.json_response(body, status=status)
+
+    async def delete_webhook(request):
+        return web.json_response({"ok": True})
+
+    async def scenario() -> Routed:
+        app = web.Application()
+        app.router.add_post("/bot1:T/getUpdates", get_updates)
+        app.router.add_post("/bot1:T/deleteWebhook", delete_webhook)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(supervisor.app, "TELEGRAM_API_URL", f"http://127.0.0.1:{port}")
+        monkeypatch.setattr(supervisor.app, "BOT_TOKEN", "1:T")
+
+        routed = Routed()
+        try:
+            await asyncio.wait_for(supervisor.poll_updates(routed), seconds)
+        except asyncio.TimeoutError:
+            pass
+        await runner.cleanup()
+        return routed
+
+    return asyncio.run(scenario()), calls
+
+
+def test_poll_backs_off_on_api_errors(monkeypatch):
+    """401/409 не крутят getUpdates в цикле без паузы"""
+    unauthorized = (401, {"ok": False, "error_code": 401, "description": "Unauthorized"})
+    routed, calls = poll_against([unauthorized], 0.5, monkeypatch)
+    assert len(calls) == 1 and routed.updates == []
+
+
+def test_poll_honours_retry_after(monkeypatch):
+    update = {"update_id": 5, "message": {"chat": {"id": 1}}}
+    responses = [
+        (200, {"ok": True, "result": [update]}),
+        (429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}),
+        (200, {"ok": True, "result": []}),
+    ]
+    routed, calls = poll_against(responses, 0.5, monkeypatch)
+    assert routed.updates == [update]
+    # После 429 — пауза retry_after, второй ответ был последним за полсекунды
+    assert [call["offset"] for call in calls] == [0, 6]
+
+
+def _flaky_worker(index, workers, queue):
+    """Вместо бота: первый запуск падает, потом ждёт sentinel и отдаёт апдейты в файл"""
+    import os
+
+    path = os.environ["SUPERVISOR_TEST_DIR"]
+    marker = os.path.join(path, f"crashed.{index}")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(3)
+    with open(os.path.join(path, f"worker.{index}"), "a") as f:
+        while (update := queue.get()) is not None:
+            f.write(f"{update['update_id']}\n")
+
+
+def test_spawner_restarts_crashed_workers(tmp_path, monkeypatch):
+    import supervisor
+
+    monkeypatch.setenv("SUPERVISOR_TEST_DIR", str(tmp_path))
+    monkeypatch.setattr(supervisor, "_worker_main", _flaky_worker)
+
+    sup = supervisor.Supervisor(2)
+    for update_id in range(5):
+        sup.route({"update_id": update_id, "message": {"chat": {"id": update_id}}})
+    sup.start()
+    deadline = time.monotonic() + 10
+    while sup.restarts < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    for update_id in range(5, 10):
+        sup.route({"update_id": update_id, "message": {"chat": {"id": update_id}}})
+    sup.stop(timeout=10)
+
+    assert not sup.spawner.is_alive() and sup.spawner.exitcode == 0
+    assert sup.restarts == 2
+    delivered = sorted(
+        int(line) for index in range(2) for line in (tmp_path / f"worker.{index}").read_text().split()
+    )
+    # Апдейты из очереди упавшего воркера достались перезапущенному
+    assert delivered == list(range(10))
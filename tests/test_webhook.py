@@ -0,0 +1,105 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestServer
+
+from webhook import BoundedRequestHandler, UpdateLimiter
+
+SECRET = "s3cret"
+
+
+def _message(update_id: int) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": update_id, "type": "private"},
+            "from": {"id": update_id, "is_bot": False, "first_name": "Тест"},
+            "text": "привет",
+        },
+    }
+
+
+def _scenario(max_concurrency: int, max_pending: int, updates: int):
+    """Хендлеры висят, пока не отпустим; (статусы ответов, максимум одновременных, обработано)"""
+    running = 0
+    peak = 0
+    handled = []
+
+    async def run() -> tuple:
+        nonlocal running, peak
+        release = asyncio.Event()
+        router = Router()
+
+        @router.message()
+        async def slow(message) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+            handled.append(message.message_id)
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        bot = Bot("42:TEST")
+        limiter = UpdateLimiter(max_concurrency=max_concurrency, max_pending=max_pending)
+        handler = BoundedRequestHandler(dispatcher=dp, bot=bot, secret_token=SECRET, limiter=limiter)
+
+        app = web.Application()
+        handler.register(app, path="/webhook")
+        server = TestServer(app)
+        await server.start_server()
+        try:
+            async with ClientSession() as client:
+                url = str(server.make_url("/webhook"))
+                headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+                statuses = []
+                for update_id in range(1, updates + 1):
+                    async with client.post(url, json=_message(update_id), headers=headers) as response:
+                        statuses.append(response.status)
+                    await asyncio.sleep(0)
+
+                async with client.post(url, json=_message(99)) as response:
+                    unauthorized = response.status
+
+                pending = limiter.pending
+                release.set()
+                await limiter.wait_closed()
+        finally:
+            await server.close()
+        return statuses, unauthorized, pending, limiter.rejected
+
+    return (*asyncio.run(run()), peak, sorted(handled))
+
+
+def test_webhook_bounds_running_and_pending_updates():
+    """Работают не больше max_concurrency, сверх max_pending — 503, принятые дообрабатываются"""
+    statuses, unauthorized, pending, rejected, peak, handled = _scenario(2, 3, 5)
+
+    assert statuses == [200, 200, 200, 503, 503]
+    assert unauthorized == 401
+    assert pending == 3
+    assert rejected == 2
+    assert peak == 2
+    assert handled == [1, 2, 3]
+
+
+def test_update_limiter_closes_rejected_work():
+    """Отказанная корутина закрывается, а не висит «never awaited»"""
+    async def run() -> tuple:
+        limiter = UpdateLimiter(max_concurrency=1, max_pending=1)
+        gate = asyncio.Event()
+        assert limiter.submit(gate.wait())
+        extra = gate.wait()
+        accepted = limiter.submit(extra)
+        gate.set()
+        await limiter.wait_closed()
+        return accepted, extra.cr_frame, limiter.pending
+
+    accepted, frame, pending = asyncio.run(run())
+    assert accepted is False
+    assert frame is None
+    assert pending == 0
@@ -0,0 +1,257 @@
+"""
+Воронка и статистика по зонам, которые обновляются на лету
+
+Каждый переход между состояниями QuizStates и каждый результат — это
+прибавление к счётчику (O(1)). /stats собирает ответ из счётчиков,
+поэтому время ответа не зависит от того, сколько людей прошло квиз.
+Счётчики периодически сохраняются в JSON-файл и поднимаются при старте.
+С supervisor у каждого воркера свой файл; /stats складывает их (combined).
+"""
+
+import asyncio
+import json
+import logging
+import os
+from collections import Counter
+from typing import Any, Dict, Optional, Tuple
+
+from config import Zone, ZONE_LABEL, ZONE_PRIORITY
+from quiz_graph import QUIZ_GRAPH
+
+logger = logging.getLogger(__name__)
+
+# Шаги воронки: /start, состояния QuizStates в порядке прохождения, результат
+FUNNEL_STEPS: Tuple[str, ...] = (
+    "start",
+    "waiting_for_name",
+    "waiting_for_niche",
+    *(question.state for question in QUIZ_GRAPH),
+    "show_result",
+)
+
+STEP_LABEL: Dict[str, str] = {
+    "start": "/start",
+    "waiting_for_name": "Имя",
+    "waiting_for_niche": "Ниша",
+    "question_perceived": "Вопрос perceived",
+    "show_result": "Результат",
+    **{
+        question.state: f"Вопрос {question.state.rpartition('_')[2]}"
+        for question in QUIZ_GRAPH if question.state != "question_perceived"
+    },
+}
+
+# Ниша из кнопок или «другое» (свой вариант) — чтобы разбивка не росла
+OTHER_NICHE = "другое"
+
+
+class FunnelStats:
+    """
+    Счётчики воронки, результатов и заявок
+
+    Args:
+        path: JSON-файл для сохранения (None — только в памяти)
+        known_niches: ниши, которые показываются отдельной строкой
+        checkpoint_interval: раз во сколько секунд сохранять
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        known_niches: Tuple[str, ...] = (),
+        checkpoint_interval: float = 60.0,
+    ):
+        self.path = path
+        self.known_niches = frozenset(known_niches)
+        self.checkpoint_interval = checkpoint_interval
+
+        self.reached: Counter = Counter()       # шаг -> сколько раз на него перешли
+        self.bottlenecks: Counter = Counter()   # зона -> результатов
+        self.twists = 0
+        self.confusion: Counter = Counter()     # (perceived, bottleneck) -> результатов
+        self.niches: Counter = Counter()        # ниша -> результатов
+        self.niche_bottlenecks: Counter = Counter()  # (ниша, зона) -> результатов
+        self.leads: Counter = Counter()         # consult | self -> нажатий
+
+        # Файлы счётчиков других воркеров supervisor (для combined)
+        self.peers: Tuple[str, ...] = ()
+
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+
+        if path and os.path.exists(path):
+            self._load(path)
+
+    # ---------- события ----------
+
+    def on_start(self) -> None:
+        """Команда /start"""
+        self.reached["start"] += 1
+        self._dirty = True
+
+    def on_transition(self, user_id: int, previous: Optional[str], state: Optional[str]) -> None:
+        """Переход между состояниями (слушатель StateTransactionMiddleware)"""
+        if state is None:
+            return
+        self.reached[state.rpartition(":")[2]] += 1
+        self._dirty = True
+
+    def on_result(self, result: Any, niche: Optional[str]) -> None:
+        """Результат диагностики (DiagnosticResult)"""
+        niche = niche if niche in self.known_niches else OTHER_NICHE
+
+        self.bottlenecks[result.bottleneck] += 1
+        self.twists += result.twist
+        self.confusion[(result.perceived, result.bottleneck)] += 1
+        self.niches[niche] += 1
+        self.niche_bottlenecks[(niche, result.bottleneck)] += 1
+        self._dirty = True
+
+    def on_lead(self, choice: str) -> None:
+        """Кнопка после результата: consult — заявка, self — сам(а)"""
+        self.leads[choice] += 1
+        self._dirty = True
+
+    # ---------- производные показатели ----------
+
+    @property
+    def results(self) -> int:
+        return sum(self.bottlenecks.values())
+
+    @property
+    def twist_rate(self) -> float:
+        return self.twists / self.results if self.results else 0.0
+
+    def funnel(self) -> Tuple[Tuple[str, int, float], ...]:
+        """(шаг, дошли, доля от предыдущего шага) по FUNNEL_STEPS"""
+        rows = []
+        previous = None
+        for step in FUNNEL_STEPS:
+            reached = self.reached[step]
+            rate = reached / previous if previous else 0.0
+            rows.append((step, reached, rate))
+            previous = reached
+        return tuple(rows)
+
+    # ---------- сохранение ----------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reached": dict(self.reached),
+            "bottlenecks": dict(self.bottlenecks),
+            "twists": self.twists,
+            "confusion": [[p, b, n] for (p, b), n in self.confusion.items()],
+            "niches": dict(self.niches),
+            "niche_bottlenecks": [[niche, b, n] for (niche, b), n in self.niche_bottlenecks.items()],
+            "leads": dict(self.leads),
+        }
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            self._add(json.load(f))
+
+    def _add(self, data: Dict[str, Any]) -> None:
+        """Прибавить счётчики из to_dict()"""
+        self.reached.update(data.get("reached", {}))
+        self.bottlenecks.update(data.get("bottlenecks", {}))
+        self.twists += data.get("twists", 0)
+        self.confusion.update({(p, b): n for p, b, n in data.get("confusion", [])})
+        self.niches.update(data.get("niches", {}))
+        self.niche_bottlenecks.update({(niche, b): n for niche, b, n in data.get("niche_bottlenecks", [])})
+        self.leads.update(data.get("leads", {}))
+
+    def combined(self) -> "FunnelStats":
+        """
+        Свои счётчики плюс последнее сохранение воркеров из peers
+
+        Без peers — сам объект.
+        """
+        if not self.peers:
+            return self
+
+        total = FunnelStats(known_niches=tuple(self.known_niches))
+        total._add(self.to_dict())
+        for path in self.peers:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    total._add(json.load(f))
+            except FileNotFoundError:
+                # Воркер ещё ничего не сохранил
+                continue
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Не удалось прочитать статистику {path}: {e}")
+        return total
+
+    def checkpoint(self) -> None:
+        """Сохранить счётчики, если что-то изменилось (атомарно, через временный файл)"""
+        if not self.path or not self._dirty:
+            return
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            try:
+                self.checkpoint()
+            except OSError as e:
+                logger.error(f"❌ Не удалось сохранить статистику: {e}")
+
+    async def start(self) -> None:
+        """Запустить периодическое сохранение (dp.startup)"""
+        if self.path and self._task is None:
+            self._task = asyncio.create_task(self._checkpoint_loop())
+
+    async def stop(self) -> None:
+        """Остановить и сохранить последнее состояние (dp.shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.checkpoint()
+
+
+def _zone(zone: Optional[Zone]) -> str:
+    return ZONE_LABEL.get(zone, "—") if zone else "—"
+
+
+def format_stats(stats: FunnelStats) -> str:
+    """Текст для /stats"""
+    lines = ["📊 <b>СТАТИСТИКА БОТА</b>", "", "<b>Воронка</b> (переходов, доля от прошлого шага):"]
+    for step, reached, rate in stats.funnel():
+        suffix = f" — {rate:.0%}" if step != FUNNEL_STEPS[0] else ""
+        lines.append(f"• {STEP_LABEL.get(step, step)}: {reached}{suffix}")
+
+    results = stats.results
+    lines += ["", f"✅ Результатов: {results}, твист: {stats.twist_rate:.0%}"]
+
+    if results:
+        lines += ["", "<b>Главный похититель:</b>"]
+        for zone, count in stats.bottlenecks.most_common():
+            lines.append(f"• {_zone(zone)}: {count} ({count / results:.0%})")
+
+        # Матрица: строки — что человек думает, столбцы — реальное узкое место
+        header = "думает \\ реально".ljust(17) + "".join(zone[:7].rjust(8) for zone in ZONE_PRIORITY)
+        rows = [header]
+        for perceived in (*ZONE_PRIORITY, None):
+            counts = [stats.confusion[(perceived, zone)] for zone in ZONE_PRIORITY]
+            if any(counts):
+                rows.append((perceived or "—")[:16].ljust(17) + "".join(str(n).rjust(8) for n in counts))
+        lines += ["", "<b>Думает vs реально:</b>", "<pre>" + "\n".join(rows) + "</pre>"]
+
+        lines += ["", "<b>По нишам:</b>"]
+        for niche, count in stats.niches.most_common():
+            top = max(ZONE_PRIORITY, key=lambda zone: stats.niche_bottlenecks[(niche, zone)])
+            lines.append(f"• {niche}: {count}, чаще всего — {_zone(top)}")
+
+    lines += [
+        "",
+        f"💰 Хотят разбор: {stats.leads['consult']}, сами: {stats.leads['self']}",
+    ]
+    if results:
+        lines.append(f"🎯 Конверсия результата в заявку: {stats.leads['consult'] / results:.0%}")
+
+    return "\n".join(lines)
@@ -0,0 +1,298 @@
+"""
+Метрики бота в текстовом формате Prometheus
+
+Свой маленький реестр без внешних зависимостей: счётчики, gauge
+и гистограммы с метками. Запись — прибавление к числу в словаре
+(в хендлере ничего не блокируется), текст собирается только когда
+Prometheus приходит на /metrics. Значения, которые дёшево посчитать
+в момент опроса (сессии, распределение по состояниям), задаются
+функцией-коллектором.
+
+    METRICS_PORT=9100  ->  http://127.0.0.1:9100/metrics
+"""
+
+import asyncio
+import bisect
+import logging
+import time
+from collections import Counter as _Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from utils.startup import STARTUP
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+# Границы корзин по умолчанию, секунды
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Общее для всех метрик: имя, описание, имена меток"""
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    """Только растёт"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """
+    Текущее значение
+
+    collect — функция, которая в момент опроса возвращает {метки: значение}
+    (тогда set() не нужен)
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def samples(self) -> Iterable[str]:
+        values = self.values
+        if self.collect is not None:
+            try:
+                values = self.collect()
+            except Exception:
+                logger.exception(f"Не удалось собрать {self.name}")
+                return
+        for labels, value in values.items():
+            yield f"{self.name}{_labels(self.label_names, labels)} {_number(value)}"
+
+
+class Histogram(Metric):
+    """Распределение (обычно длительностей в секундах) по корзинам"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> [счётчики корзин (последняя — +Inf), сумма]
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+class Registry:
+    """Набор метрик, которые отдаёт /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Метрика {metric.name} уже есть")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = (), collect=None) -> Gauge:
+        return self.register(Gauge(name, help, labels, collect))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---------- метрики бота ----------
+
+UPDATES = REGISTRY.counter("quiz_updates_total", "Апдейтов получено", ["type"])
+UPDATE_SECONDS = REGISTRY.histogram("quiz_update_seconds", "Обработка апдейта целиком (все middleware)", ["type"])
+
+HANDLER_SECONDS = REGISTRY.histogram("quiz_handler_seconds", "Время хендлера (с записью FSM)", ["handler"])
+HANDLER_ERRORS = REGISTRY.counter("quiz_handler_errors_total", "Исключения в хендлерах", ["handler", "error"])
+
+API_SECONDS = REGISTRY.histogram("telegram_api_seconds", "Запросы к Bot API (без ожидания лимитов)", ["method"])
+API_ERRORS = REGISTRY.counter("telegram_api_errors_total", "Ошибки запросов к Bot API", ["method", "error"])
+
+STORAGE_SECONDS = REGISTRY.histogram(
+    "fsm_storage_seconds", "Операции FSM-хранилища", ["op"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+LOOP_LAG = REGISTRY.gauge("event_loop_lag_seconds", "Последняя задержка event loop")
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    "event_loop_lag_distribution_seconds", "Задержки event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+STARTUP_SECONDS = REGISTRY.gauge(
+    "process_startup_phase_seconds", "Этапы запуска процесса: секунд от старта", ["phase"],
+    collect=lambda: {(phase,): seconds for phase, seconds in STARTUP.phases.items()},
+)
+
+
+# Задаётся в main.create_bots, когда экспертов несколько (tenants.py)
+TENANT_MEMORY = REGISTRY.gauge("quiz_tenant_memory_bytes", "Память на эксперта: строки и тексты в кэше", ["tenant"])
+
+
+def observe_storage(op: str, seconds: float) -> None:
+    """Наблюдатель для storage.instrumented.InstrumentedStorage"""
+    STORAGE_SECONDS.observe(seconds, op)
+
+
+# Считаются при опросе (storage_collectors)
+SESSIONS = REGISTRY.gauge("fsm_sessions", "Сессий FSM в памяти")
+USERS_BY_STATE = REGISTRY.gauge("quiz_users_by_state", "Пользователей в каждом состоянии квиза", ["state"])
+
+
+def storage_collectors(storage) -> None:
+    """
+    Сессии в памяти и распределение пользователей по QuizStates
+
+    Считается при опросе обходом хранилища — только для хранилищ
+    с session_states() (memory, bounded); в Redis обход ключей
+    на каждый опрос слишком дорог.
+    """
+    session_states = getattr(storage, "session_states", None)
+    if session_states is None:
+        SESSIONS.collect = USERS_BY_STATE.collect = None
+        return
+
+    def collect_sessions() -> Dict[LabelValues, float]:
+        return {(): len(session_states())}
+
+    def collect_states() -> Dict[LabelValues, float]:
+        states = _Counter(state.rpartition(":")[2] for state in session_states() if state)
+        return {(state,): count for state, count in states.items()}
+
+    SESSIONS.collect = collect_sessions
+    USERS_BY_STATE.collect = collect_states
+
+
+# ---------- задержка event loop ----------
+
+async def _watch_loop_lag(interval: float) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        LOOP_LAG.set(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+
+
+# ---------- HTTP ----------
+
+class MetricsServer:
+    """
+    aiohttp-сервер с /metrics и замером задержки event loop
+
+    Args:
+        host, port: где слушать (METRICS_HOST / METRICS_PORT)
+        registry: что отдавать
+        lag_interval: как часто мерить задержку event loop, секунды
+    """
+
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY, lag_interval: float = 0.5):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.lag_interval = lag_interval
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        body = self.registry.render()
+        logger.debug(f"/metrics за {(time.perf_counter() - started) * 1000:.1f} мс")
+        return web.Response(text=body, content_type="text/plain", charset="utf-8", headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        self._lag_task = asyncio.create_task(_watch_loop_lag(self.lag_interval))
+        logger.info(f"📈 Метрики: http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._lag_task is not None:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,357 @@
+"""
+Уведомления владельцу о заявках на разбор — сводкой, а не по одной
+
+Когда заявок мало, каждая уходит владельцу сразу. Если сообщение уже
+отправлялось меньше window секунд назад, заявки копятся и уходят одной
+сводкой по зонам (главный похититель из DiagnosticResult): по окончании
+окна или когда накопилось max_batch заявок. Так всплеск трафика не
+заваливает чат владельца и не съедает лимит исходящих сообщений.
+
+Заявки журналируются в JSON-строки ({"op": "add", ...} /
+{"op": "sent", "ids": [...], "chat_id": ...}) и переживают перезапуск:
+неотправленные уйдут сводкой после старта (оборванная падением строка
+журнала пропускается). Доставка учитывается по каждому
+чату: если отправка удалась не во все чаты, повтор уходит только туда,
+где заявок ещё нет.
+
+Заявка эксперта из tenants.py с admin_ids уходит его админам через его
+бота; остальные — в chat_ids уведомителя (владелец, OWNER_ID).
+"""
+
+import asyncio
+import html
+import itertools
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from aiogram import Bot
+
+from config import ZONE_LABEL, ZONE_PRIORITY
+from outbound import Priority, send_priority
+
+logger = logging.getLogger(__name__)
+
+# Сколько имён показывать в сводке на зону (остальные — числом)
+NAMES_PER_ZONE = 5
+
+
+def lead_event(user_id: int, username: Optional[str], session, result, expert: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Заявка для журнала из QuizSession и DiagnosticResult (result — None, если квиз не пройден)
+
+    expert — имя эксперта из tenants.py, когда в процессе их несколько
+    """
+    return {
+        "user_id": user_id,
+        "username": username,
+        "name": session.name,
+        "niche": session.niche,
+        "bottleneck": result.bottleneck if result else None,
+        "perceived": result.perceived if result else None,
+        "expert": expert,
+        "at": time.time(),
+    }
+
+
+class LeadNotifier:
+    """
+    Сводки заявок для владельца
+
+    Args:
+        chat_ids: кому отправлять заявки без своих получателей (см. notify)
+        path: журнал заявок (None — только в памяти)
+        window: сколько секунд копить заявки после отправленного сообщения
+        max_batch: сколько заявок отправлять сводкой, не дожидаясь конца окна
+    """
+
+    def __init__(
+        self,
+        chat_ids: Iterable[int],
+        path: Optional[str] = None,
+        window: float = 60.0,
+        max_batch: int = 20,
+    ):
+        self.chat_ids = tuple(chat_ids)
+        self.path = path
+        self.window = window
+        self.max_batch = max_batch
+
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        # id заявки -> чаты, куда она уже отправлена
+        self._delivered: Dict[int, Set[int]] = {}
+        self._ids = itertools.count(1)
+        self._sent_since_compact = 0
+        self._last_sent = float("-inf")     # time.monotonic() последней отправки
+
+        self._journal = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+        self._bots: Dict[int, Bot] = {}
+
+        self.sent_messages = 0
+        self.sent_leads = 0
+
+        if path:
+            self._load(path)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    # ---------- журнал ----------
+
+    def _load(self, path: str) -> None:
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Строка, оборванная падением посреди записи
+                        logger.warning(f"⚠️ {path}: повреждённая строка {number} пропущена")
+                        continue
+                    if record["op"] == "add":
+                        self._pending[record["id"]] = record
+                    elif "chat_id" in record:
+                        for lead_id in record["ids"]:
+                            self._delivered.setdefault(lead_id, set()).add(record["chat_id"])
+                    else:
+                        # Старый формат журнала: отправлено во все чаты
+                        for lead_id in record["ids"]:
+                            self._pending.pop(lead_id, None)
+
+        self._ids = itertools.count(max(self._pending, default=0) + 1)
+        self._drop_delivered()
+
+        # Переписываем журнал только с неотправленными заявками
+        self._compact()
+        if self._pending:
+            logger.info(f"🔔 Неотправленных уведомлений о заявках: {len(self._pending)}")
+
+    def _compact(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._pending.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            # Заявки, отправленные не во все чаты
+            by_chat: Dict[int, List[int]] = defaultdict(list)
+            for lead_id, chat_ids in self._delivered.items():
+                for chat_id in chat_ids:
+                    by_chat[chat_id].append(lead_id)
+            for chat_id, ids in by_chat.items():
+                f.write(json.dumps({"op": "sent", "ids": ids, "chat_id": chat_id}) + "\n")
+        os.replace(tmp_path, self.path)
+        self._journal = open(self.path, "a", encoding="utf-8")
+        self._sent_since_compact = 0
+
+    def _recipients(self, record: Dict[str, Any]) -> Tuple[int, ...]:
+        """Чаты заявки: админы эксперта или chat_ids уведомителя"""
+        return tuple(record.get("chat_ids") or self.chat_ids)
+
+    def _drop_delivered(self) -> int:
+        """Убрать заявки, отправленные во все их чаты; сколько убрали"""
+        done = [
+            lead_id for lead_id, record in self._pending.items()
+            if self._delivered.get(lead_id, set()) >= set(self._recipients(record))
+        ]
+        for lead_id in done:
+            self._pending.pop(lead_id)
+            self._delivered.pop(lead_id, None)
+        # Отметки о заявках, которых уже нет в журнале
+        for lead_id in [lead_id for lead_id in self._delivered if lead_id not in self._pending]:
+            del self._delivered[lead_id]
+        return len(done)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if self._journal is not None:
+            self._journal.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.flush()
+
+    # ---------- API для хендлеров ----------
+
+    def notify(self, event: Dict[str, Any], chat_ids: Iterable[int] = (), bot_id: Optional[int] = None) -> None:
+        """
+        Новая заявка (lead_event): сразу, если тихо, иначе — в сводку
+
+        chat_ids — админы эксперта, им пишет бот bot_id; пусто — chat_ids уведомителя
+        """
+        chat_ids = tuple(chat_ids)
+        if not chat_ids and not self.chat_ids:
+            # Уведомлять некого
+            return
+        record = {"op": "add", "id": next(self._ids), **event}
+        if chat_ids:
+            record["chat_ids"] = list(chat_ids)
+            record["bot_id"] = bot_id
+        self._pending[record["id"]] = record
+        self._write(record)
+
+        if self._bot is None:
+            # До старта только копим — отправим после start()
+            return
+
+        if len(self._pending) >= self.max_batch:
+            self._schedule(0)
+        elif len(self._pending) == 1 and time.monotonic() - self._last_sent >= self.window:
+            # Трафик низкий: одиночная заявка уходит без задержки
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(max(0.0, self._last_sent + self.window - time.monotonic()))
+
+    # ---------- отправка ----------
+
+    def _schedule(self, delay: float) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        self._timer = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        """Отправить в каждый чат одним сообщением заявки, которых там ещё нет"""
+        if not self._pending or self._bot is None:
+            return
+
+        # (бот, чат) -> заявки, которых там ещё нет
+        targets: Dict[Tuple[Optional[int], int], List[Dict[str, Any]]] = defaultdict(list)
+        # Чаты владельца — в порядке chat_ids
+        for chat_id in self.chat_ids:
+            targets[(None, chat_id)] = []
+        for record in self._pending.values():
+            for chat_id in self._recipients(record):
+                if chat_id not in self._delivered.get(record["id"], ()):
+                    targets[(record.get("bot_id"), chat_id)].append(record)
+        self._last_sent = time.monotonic()
+        failed = False
+
+        with send_priority(Priority.DEFAULT):
+            for (bot_id, chat_id), chat_records in targets.items():
+                if not chat_records:
+                    continue
+                bot = self._bots.get(bot_id, self._bot)
+                if len(chat_records) == 1:
+                    text = format_single(chat_records[0])
+                else:
+                    text = format_digest(chat_records)
+                try:
+                    await bot.send_message(chat_id, text, parse_mode="HTML")
+                except Exception:
+                    # Заявки остаются в журнале — повторим через окно (только в этот чат)
+                    logger.exception(f"Не удалось отправить уведомление о {len(chat_records)} заявках в чат {chat_id}")
+                    failed = True
+                    continue
+
+                ids = [record["id"] for record in chat_records]
+                for lead_id in ids:
+                    self._delivered.setdefault(lead_id, set()).add(chat_id)
+                self._write({"op": "sent", "ids": ids, "chat_id": chat_id})
+                self.sent_messages += 1
+
+        done = self._drop_delivered()
+        self.sent_leads += done
+
+        self._sent_since_compact += done
+        if self._journal is not None and self._sent_since_compact > 1000 + len(self._pending):
+            self._compact()
+
+        if failed:
+            self._schedule(self.window)
+            return
+
+        # Пока отправляли, могли прийти новые заявки
+        if self._pending and self._timer is None:
+            self._schedule(0 if len(self._pending) >= self.max_batch else self.window)
+
+    # ---------- жизненный цикл (startup/shutdown диспетчера) ----------
+
+    async def start(self, bot: Bot, bots: Optional[Sequence[Bot]] = None) -> None:
+        """bots — все боты процесса (aiogram передаёт их в startup при polling)"""
+        self._bot = bot
+        self._bots = {b.id: b for b in bots or (bot,)}
+        if self._pending:
+            # Заявки с прошлого запуска — сводкой сразу
+            self._schedule(0)
+
+    async def stop(self) -> None:
+        """Отправить то, что накопилось; неотправленное останется в журнале"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._timer is not None:
+            # Отправка не удалась — повторим после перезапуска
+            self._timer.cancel()
+            self._timer = None
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def __str__(self) -> str:
+        return f"сообщений: {self.sent_messages}, заявок в них: {self.sent_leads}, ждут: {self.pending}"
+
+
+# ---------- тексты ----------
+
+def _who(record: Dict[str, Any]) -> str:
+    name = html.escape(record.get("name") or "Без имени")
+    username = record.get("username")
+    return f"{name} (@{html.escape(username)})" if username else f'<a href="tg://user?id={record["user_id"]}">{name}</a>'
+
+
+def _expert(record: Dict[str, Any]) -> Optional[str]:
+    """Эксперт заявки (без DEFAULT_TENANT — при одном боте он не нужен)"""
+    expert = record.get("expert")
+    return expert if expert and expert != "default" else None
+
+
+def _zone(zone: Optional[str]) -> str:
+    return ZONE_LABEL.get(zone, "—") if zone else "—"
+
+
+def format_single(record: Dict[str, Any]) -> str:
+    """Одна заявка"""
+    lines = ["🔥 <b>Новая заявка на разбор</b>", "", f"👤 {_who(record)}"]
+    if _expert(record):
+        lines.append(f"🧑‍💼 Эксперт: {html.escape(record['expert'])}")
+    if record.get("niche"):
+        lines.append(f"💼 Ниша: {html.escape(record['niche'])}")
+    lines.append(f"🎯 Главный похититель: {_zone(record.get('bottleneck'))}")
+    if record.get("perceived") and record["perceived"] != record.get("bottleneck"):
+        lines.append(f"🤔 Думает, что проблема в: {_zone(record['perceived'])}")
+    return "\n".join(lines)
+
+
+def format_digest(records: List[Dict[str, Any]]) -> str:
+    """Сводка заявок по главному похитителю"""
+    by_zone: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    for record in records:
+        by_zone[record.get("bottleneck")].append(record)
+
+    minutes = max(1, round((records[-1]["at"] - records[0]["at"]) / 60))
+    lines = [f"🔥 <b>Заявок на разбор: {len(records)}</b> за ~{minutes} мин"]
+
+    order = sorted(by_zone, key=lambda zone: (-len(by_zone[zone]), zone not in ZONE_PRIORITY, zone or ""))
+    for zone in order:
+        zone_records = by_zone[zone]
+        lines += ["", f"🎯 <b>{_zone(zone)}</b> — {len(zone_records)}"]
+        for record in zone_records[:NAMES_PER_ZONE]:
+            expert = _expert(record)
+            lines.append(f"• {_who(record)} → {html.escape(expert)}" if expert else f"• {_who(record)}")
+        if len(zone_records) > NAMES_PER_ZONE:
+            lines.append(f"• …и ещё {len(zone_records) - NAMES_PER_ZONE}")
+
+    lines += ["", "Полный список — /export leads"]
+    return "\n".join(lines)
@@ -0,0 +1,179 @@
+"""
+Где хендлер проводит время: Bot API, FSM-хранилище или сам код
+
+На время хендлера в contextvar кладётся счётчик ожиданий. Запросы
+к Bot API (middlewares/profiling.py) и операции хранилища
+(storage/instrumented.py) прибавляют к нему своё время; остаток —
+собственный код хендлера (CPU). Итоги копятся по имени хендлера.
+
+Для поиска горячих мест по /profile N включается cProfile на время
+следующих N апдейтов; итог уходит админу файлом.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import tempfile
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# [секунд в Bot API, секунд в хранилище] для текущего хендлера
+_waits: ContextVar[Optional[List[float]]] = ContextVar("handler_waits", default=None)
+
+
+def record_api(seconds: float) -> None:
+    """Запрос к Bot API внутри текущего хендлера"""
+    waits = _waits.get()
+    if waits is not None:
+        waits[0] += seconds
+
+
+def record_storage(op: str, seconds: float) -> None:
+    """Наблюдатель для InstrumentedStorage"""
+    waits = _waits.get()
+    if waits is not None:
+        waits[1] += seconds
+
+
+class HandlerSplit:
+    """Суммы по одному хендлеру"""
+
+    __slots__ = ("calls", "wall", "api", "storage")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.api = 0.0
+        self.storage = 0.0
+
+    @property
+    def cpu(self) -> float:
+        return max(0.0, self.wall - self.api - self.storage)
+
+
+class Profiler:
+    """
+    Разбивка времени хендлеров и cProfile по запросу
+
+    Args:
+        top: сколько строк показывать в отчёте cProfile
+    """
+
+    def __init__(self, top: int = 40):
+        self.top = top
+        self.handlers: Dict[str, HandlerSplit] = {}
+
+        self._capture: Optional[cProfile.Profile] = None
+        self._remaining = 0         # сколько апдейтов ещё профилировать
+        self._captured = 0
+        self._started = 0.0
+        self.capture_chat_id: Optional[int] = None
+
+    # ---------- разбивка по хендлерам ----------
+
+    def begin(self) -> Tuple[float, object]:
+        """Начало хендлера: (время старта, токен contextvar)"""
+        return time.perf_counter(), _waits.set([0.0, 0.0])
+
+    def end(self, name: str, started: float, token) -> None:
+        """Конец хендлера: записать разбивку"""
+        wall = time.perf_counter() - started
+        api, storage = _waits.get()
+        _waits.reset(token)
+
+        split = self.handlers.get(name)
+        if split is None:
+            split = self.handlers[name] = HandlerSplit()
+        split.calls += 1
+        split.wall += wall
+        split.api += api
+        split.storage += storage
+
+    def format_split(self) -> str:
+        """Таблица для /profile: среднее время на вызов, мс"""
+        if not self.handlers:
+            return "Хендлеры ещё не вызывались"
+        rows = [f"{'хендлер':<22}{'вызовов':>8}{'всего':>8}{'API':>8}{'FSM':>8}{'CPU':>8}"]
+        for name, split in sorted(self.handlers.items(), key=lambda item: -item[1].wall):
+            n = split.calls
+            rows.append(
+                f"{name[:21]:<22}{n:>8}{split.wall / n * 1000:>8.2f}{split.api / n * 1000:>8.2f}"
+                f"{split.storage / n * 1000:>8.2f}{split.cpu / n * 1000:>8.2f}"
+            )
+        return "\n".join(rows)
+
+    # ---------- cProfile на N апдейтов ----------
+
+    @property
+    def capturing(self) -> bool:
+        return self._remaining > 0
+
+    def arm(self, updates: int, chat_id: int) -> None:
+        """Профилировать следующие updates апдейтов, отчёт — в chat_id"""
+        self.cancel()
+        self._remaining = updates
+        self._captured = 0
+        self.capture_chat_id = chat_id
+
+    def cancel(self) -> None:
+        if self._capture is not None:
+            self._capture.disable()
+            self._capture = None
+        self._remaining = 0
+
+    def capture_begin(self) -> None:
+        """Апдейт начался: включить cProfile, если он ещё не включён"""
+        if self._remaining <= 0 or self._capture is not None:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Уже работает другой профилировщик
+            logger.error(f"❌ cProfile не включился: {e}")
+            self._remaining = 0
+            return
+        self._capture = profile
+        self._started = time.perf_counter()
+
+    def capture_end(self) -> Optional[Tuple[str, str]]:
+        """
+        Апдейт закончился; после N-го — выключить cProfile
+
+        cProfile видит весь поток event loop, поэтому в отчёт попадают
+        и апдейты, которые шли параллельно.
+
+        Returns:
+            (путь к .txt, путь к .prof) после последнего апдейта, иначе None;
+            файлы удаляет вызывающий
+        """
+        if self._capture is None:
+            return None
+        self._captured += 1
+        self._remaining -= 1
+        if self._remaining > 0:
+            return None
+
+        profile, self._capture = self._capture, None
+        profile.disable()
+        elapsed = time.perf_counter() - self._started
+
+        fd, prof_path = tempfile.mkstemp(suffix=".prof")
+        os.close(fd)
+        profile.dump_stats(prof_path)
+
+        text = io.StringIO()
+        text.write(f"Апдейтов: {self._captured}, {elapsed:.3f} с\n\n")
+        stats = pstats.Stats(profile, stream=text)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stats.sort_stats("tottime").print_stats(self.top)
+
+        fd, text_path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text.getvalue())
+        return text_path, prof_path
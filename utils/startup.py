@@ -0,0 +1,156 @@
+"""
+Отчёт о запуске: сколько импортировался каждый модуль и когда обработан первый апдейт
+
+Отсчёт идёт от импорта этого модуля — main.py импортирует его первым
+и включает замер импортов (track_imports). До imports_done() каждый модуль,
+загружаемый из файла, замеряется (как python -X importtime: время
+с вложенными импортами и без них). Остальным модулям (метрики, воркеры
+supervisor, тесты) импорт utils.startup хук в sys.meta_path не ставит.
+Дальше отмечаются этапы: создание диспетчера, первый обработанный апдейт.
+
+    🚀 Импорты 812 мс: aiogram 590, aiohttp 120, pydantic 60, проект 31 ...
+    🚀 Первый апдейт обработан через 1.42 с после запуска
+"""
+
+import importlib.machinery
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Загрузчики модулей-файлов: у каждого модуля свой экземпляр
+_FILE_LOADERS = (
+    importlib.machinery.SourceFileLoader,
+    importlib.machinery.SourcelessFileLoader,
+    importlib.machinery.ExtensionFileLoader,
+)
+
+# Модули из этого каталога в отчёте складываются в «проект»
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+PROJECT = "проект"
+
+
+class _ImportTimer:
+    """
+    Finder в начале sys.meta_path: ищет spec у остальных finder'ов
+    и оборачивает exec_module загрузчика, чтобы замерить выполнение модуля
+    """
+
+    def __init__(self, report: "StartupReport"):
+        self.report = report
+        self._stack: List[float] = []     # время вложенных импортов для каждого уровня
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if isinstance(spec.loader, _FILE_LOADERS):
+                    self._wrap(spec.loader, name)
+                    path = spec.loader.path
+                    if path.startswith(PROJECT_DIR) and "site-packages" not in path:
+                        self.report.project.add(name)
+                return spec
+        return None
+
+    def _wrap(self, loader, name: str) -> None:
+        if "exec_module" in vars(loader):
+            return
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            self._stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                total = time.perf_counter() - started
+                nested = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += total
+                self.report.modules[name] = (total, total - nested)
+                # Дальше загрузчик не обёрнут (importlib.reload и т.п.)
+                vars(loader).pop("exec_module", None)
+
+        loader.exec_module = timed_exec_module
+
+
+class StartupReport:
+    """
+    Этапы запуска процесса и время импорта модулей
+
+    Все времена — секунды от импорта utils.startup (почти начало процесса)
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # модуль -> (с вложенными импортами, без них)
+        self.modules: Dict[str, Tuple[float, float]] = {}
+        self.project: Set[str] = set()
+        # этап -> секунд от старта
+        self.phases: Dict[str, float] = {}
+        self._timer: Optional[_ImportTimer] = None
+
+    def track_imports(self) -> None:
+        """Замерять импорты до imports_done() (finder в начале sys.meta_path)"""
+        if self._timer is None and "imports" not in self.phases:
+            self._timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._timer)
+
+    def mark(self, phase: str) -> float:
+        """Отметить этап (повторная отметка не перезаписывает первую)"""
+        if phase not in self.phases:
+            self.phases[phase] = time.perf_counter() - self.started
+        return self.phases[phase]
+
+    def reset(self) -> None:
+        """Считать этапы заново от текущего момента (воркер после fork)"""
+        self.started = time.perf_counter()
+        self.phases.clear()
+
+    def imports_done(self) -> None:
+        """Импорты закончились: снять finder и отметить этап"""
+        if self._timer is not None:
+            sys.meta_path.remove(self._timer)
+            self._timer = None
+        self.mark("imports")
+
+    def by_package(self) -> List[Tuple[str, float]]:
+        """Собственное время импорта, сложенное по верхнему пакету (модули бота — PROJECT), по убыванию"""
+        totals: Dict[str, float] = {}
+        for name, (_, own) in self.modules.items():
+            package = PROJECT if name in self.project else name.partition(".")[0]
+            totals[package] = totals.get(package, 0.0) + own
+        return sorted(totals.items(), key=lambda item: -item[1])
+
+    def slowest(self, top: int = 10) -> List[Tuple[str, float]]:
+        """Модули с самым долгим собственным временем импорта"""
+        return sorted(((name, own) for name, (_, own) in self.modules.items()), key=lambda item: -item[1])[:top]
+
+    def format_imports(self, top: int = 8) -> str:
+        packages = ", ".join(f"{name} {seconds * 1000:.0f}" for name, seconds in self.by_package()[:top])
+        total = self.phases.get("imports", time.perf_counter() - self.started)
+        return f"🚀 Импорты {total * 1000:.0f} мс, модулей {len(self.modules)}: {packages}"
+
+    def format_phases(self) -> str:
+        return ", ".join(f"{phase} {seconds:.2f} с" for phase, seconds in self.phases.items())
+
+
+STARTUP = StartupReport()
+
+
+if __name__ == '__main__':
+    # Отчёт об импорте бота без запуска: python -m utils.startup.
+    # Этот файл выполняется как __main__, а main.py импортирует свою копию
+    # utils.startup — замеряет она
+    import main  # noqa: F401
+    from utils.startup import STARTUP as report
+
+    print(report.format_imports())
+    print()
+    for name, own in report.slowest(25):
+        print(f"{own * 1000:>9.1f} мс  {name}")
@@ -0,0 +1,186 @@
+"""
+Режим webhook: aiohttp-сервер вместо long polling
+
+Telegram получает 200 сразу, апдейт обрабатывается в фоне.
+Одновременно выполняется не больше WEBHOOK_MAX_CONCURRENCY хендлеров,
+принятых и ещё не обработанных апдейтов — не больше WEBHOOK_MAX_PENDING.
+Сверх этого Telegram получает 503 и повторяет апдейт позже: очередь
+остаётся на его стороне, а не копится задачами в памяти процесса.
+
+Если ботов несколько (tenants.py), у каждого свой путь
+WEBHOOK_PATH/<bot_id>, а диспетчер и лимиты общие.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Dict, Sequence, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateLimiter:
+    """
+    Лимиты фоновой обработки апдейтов (один на процесс, общий для всех ботов)
+
+    Args:
+        max_concurrency: сколько хендлеров работает одновременно
+        max_pending: сколько апдейтов может быть принято и не обработано
+            (работают + ждут семафора); сверх этого submit отказывает
+    """
+
+    def __init__(self, max_concurrency: int = 100, max_pending: int = 1000):
+        self.max_pending = max(max_pending, max_concurrency)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self.rejected = 0
+
+    @property
+    def pending(self) -> int:
+        """Апдейтов принято, но ещё не обработано"""
+        return len(self._tasks)
+
+    @property
+    def full(self) -> bool:
+        return len(self._tasks) >= self.max_pending
+
+    def submit(self, work: Awaitable[None]) -> bool:
+        """Запустить work в фоне под семафором; False (и work закрыт) — очередь полна"""
+        if self.full:
+            self.rejected += 1
+            work.close()
+            return False
+        task = asyncio.create_task(self._run(work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, work: Awaitable[None]) -> None:
+        async with self._semaphore:
+            try:
+                await work
+            except Exception:
+                logger.exception("❌ Ошибка при обработке апдейта webhook")
+
+    async def wait_closed(self, *args: Any) -> None:
+        """Дождаться принятых апдейтов (подходит для app.on_shutdown)"""
+        if self._tasks:
+            logger.info(f"⏳ Дообрабатываем апдейтов webhook: {len(self._tasks)}")
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    SimpleRequestHandler, который отдаёт апдейты в UpdateLimiter
+
+    Переопределён только публичный handle: секрет проверяется как в
+    aiogram, при заполненной очереди — 503 без чтения тела.
+    """
+
+    def __init__(self, *args: Any, limiter: UpdateLimiter, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+
+    @property
+    def pending(self) -> int:
+        """Апдейтов принято, но ещё не обработано (по всем ботам лимитера)"""
+        return self.limiter.pending
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            return web.Response(body="Unauthorized", status=401)
+        if self.limiter.full:
+            self.limiter.rejected += 1
+            return web.Response(status=503, headers={"Retry-After": "1"})
+
+        update = await request.json(loads=bot.session.json_loads)
+        if not self.limiter.submit(self._feed_update(bot, update)):
+            return web.Response(status=503, headers={"Retry-After": "1"})
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def _feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        result = await self.dispatcher.feed_raw_update(bot=bot, update=update, **self.data)
+        # Хендлер может вернуть метод Bot API вместо вызова — выполняем его сами
+        if isinstance(result, TelegramMethod):
+            await self.dispatcher.silent_call_request(bot=bot, result=result)
+
+
+def webhook_paths(bots: Sequence[Bot]) -> Dict[int, str]:
+    """bot_id -> путь webhook: WEBHOOK_PATH для одного бота, WEBHOOK_PATH/<bot_id> для нескольких"""
+    path = os.getenv('WEBHOOK_PATH', '/webhook')
+    if len(bots) == 1:
+        return {bots[0].id: path}
+    return {bot.id: f"{path.rstrip('/')}/{bot.id}" for bot in bots}
+
+
+def create_webhook_app(dp: Dispatcher, *bots: Bot, **data: Any) -> web.Application:
+    """
+    aiohttp-приложение с webhook-обработчиком на каждого бота
+
+    Настройки из .env: WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONCURRENCY,
+    WEBHOOK_MAX_PENDING. Лимитер — в app["webhook_limiter"].
+    """
+    app = web.Application()
+    paths = webhook_paths(bots)
+    # Лимиты — на процесс, а не на бота
+    limiter = UpdateLimiter(
+        max_concurrency=int(os.getenv('WEBHOOK_MAX_CONCURRENCY', 100)),
+        max_pending=int(os.getenv('WEBHOOK_MAX_PENDING', 1000)),
+    )
+    app["webhook_limiter"] = limiter
+    # Раньше dp.shutdown из setup_application: принятые апдейты дообрабатываются
+    app.on_shutdown.append(limiter.wait_closed)
+
+    for bot in bots:
+        handler = BoundedRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=os.getenv('WEBHOOK_SECRET') or None,
+            limiter=limiter,
+            **data,
+        )
+        handler.register(app, path=paths[bot.id])
+    # startup получает всех ботов (DelayedScheduler доставляет каждым своим)
+    setup_application(app, dp, bot=bots[-1], bots=list(bots))
+
+    return app
+
+
+async def run_webhook(dp: Dispatcher, *bots: Bot) -> None:
+    """
+    Запустить webhook-сервер и зарегистрировать адрес в Telegram
+
+    WEBHOOK_URL — публичный адрес (https://example.com), без пути
+    WEBAPP_HOST / WEBAPP_PORT — где слушает сервер
+    """
+    app = create_webhook_app(dp, *bots)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+
+    host = os.getenv('WEBAPP_HOST', '0.0.0.0')
+    port = int(os.getenv('WEBAPP_PORT', 8080))
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"🌐 Webhook-сервер слушает {host}:{port}")
+
+    public_url = os.getenv('WEBHOOK_URL')
+    if public_url:
+        paths = webhook_paths(bots)
+        for bot in bots:
+            await bot.set_webhook(
+                url=public_url.rstrip('/') + paths[bot.id],
+                secret_token=os.getenv('WEBHOOK_SECRET') or None,
+            )
+        logger.info(f"✅ Webhook зарегистрирован в Telegram (ботов: {len(bots)})")
+
+    try:
+        # Работаем, пока процесс не остановят
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()